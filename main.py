@@ -2,6 +2,8 @@ import requests
 import json
 import plotly.graph_objects as go
 import config_demo
+from modular_bot.market_data_client import get_cached_prices
+from modular_bot.streaming import StreamingVwap
 from datetime import date
 from dateutil.relativedelta import relativedelta, MO
 from time import sleep
@@ -13,6 +15,10 @@ pd.set_option('display.max_columns', None)
 
 xst = ""
 cst = ""
+# VWAP over completed candles since the anchor Monday, kept between polls so only new candles are pushed
+vwap_stream = None
+vwap_anchor = None
+completed_candles = []
 
 
 def send_telegram_message(text):
@@ -70,6 +76,9 @@ def get_k_lines_and_map_to_df():
     today = date.today()
     last_monday = str(today + relativedelta(weekday=MO(-2)))
     print("getting data beginning from " + last_monday)
+    cached_prices = get_cached_prices("GBPUSD", "HOUR", last_monday + "T00:00:00", 500)
+    if cached_prices:
+        return pd.json_normalize(cached_prices)
     gbpusd = config_demo.gbpusd_url + last_monday + "T00:00:00&max=500"
 
     headers = {
@@ -211,6 +220,36 @@ def print_price_percent_from_vwap(dftc1):
     print("price is " + str(price) + "% from vwap")
 
 
+def to_bar(row):
+    return {'open': row['openPrice.bid'], 'high': row['highPrice.bid'], 'low': row['lowPrice.bid'],
+            'close': row['closePrice.bid'], 'volume': row['lastTradedVolume']}
+
+
+def update_vwap(df_obj):
+    """
+    Pushes candles completed since the last poll into the streaming VWAP and returns a VWAP
+    column for df_obj. Only the last three rows are filled, which is all the entry rules read.
+    """
+    global vwap_stream, vwap_anchor
+    anchor = df_obj['snapshotTimeUTC'].iloc[0]
+    if anchor != vwap_anchor:
+        # A new week moved the anchor Monday: start again from the first candle
+        vwap_stream, vwap_anchor = StreamingVwap(price='ohlc4'), anchor
+        completed_candles.clear()
+    completed = df_obj.iloc[:-1]
+    if completed_candles:
+        completed = completed[completed['snapshotTimeUTC'] > completed_candles[-1][0]]
+    for _, row in completed.iterrows():
+        completed_candles.append((row['snapshotTimeUTC'], vwap_stream.push(to_bar(row))))
+    del completed_candles[:-2]
+
+    vwap = pd.Series(float('nan'), index=df_obj.index)
+    vwap.iloc[-1] = vwap_stream.peek(to_bar(df_obj.iloc[-1]))
+    for offset, (_, value) in enumerate(reversed(completed_candles), start=2):
+        vwap.iloc[-offset] = value
+    return vwap
+
+
 def do_the_thing():
     start_session()
 
@@ -219,11 +258,7 @@ def do_the_thing():
         df_obj = get_k_lines_and_map_to_df()
         if df_obj.empty:
             df_obj = get_k_lines_and_map_to_df()
-        tp = (df_obj['openPrice.bid'] + df_obj['highPrice.bid'] + df_obj['lowPrice.bid'] + df_obj[
-            'closePrice.bid']) / 4
-        tp = tp * df_obj['lastTradedVolume']
-        df_obj['vwap'] = tp.cumsum() / df_obj['lastTradedVolume'].cumsum()
-        # print_chart(df_obj)
+        df_obj['vwap'] = update_vwap(df_obj)
         df_to_calculate = df_obj.tail(3)
         # print_chart(df_to_calculate)
         if price_close_to_vwap(df_to_calculate) and price_above_vwap(df_to_calculate):
@@ -1,16 +1,20 @@
 # run_backtest.py
 import pandas as pd
-import pandas_ta as ta
 import numpy as np
 from datetime import datetime
 import time
 import os
+import pickle
 import matplotlib.pyplot as plt
 import mplfinance as mpf
 
 # --- Import your broker/data functions ---
 from modular_bot.api_client import fetch_all_data
+from modular_bot import indicators
+from modular_bot import segments
 from modular_bot.backtester import prepare_data
+from modular_bot.results_db import ResultsDatabase
+from modular_bot.tick_storage import load_candles, save_candles
 
 
 # --- Phase 1: Data Acquisition & Resampling ---
@@ -58,157 +62,250 @@ def calculate_indicators(df_4h, df_45m, trend_params, short_params, atr_len, adx
     print("Calculating indicators...")
 
     # Calculate 4-Hour Trend StochRSI
-    stoch_rsi_4h = ta.stochrsi(
+    df_4h['trend_srsi_k'], df_4h['trend_srsi_d'] = indicators.stochrsi(
         df_4h['close'],
         length=trend_params['stoch_len'],
         rsi_length=trend_params['rsi_len'],
         k=trend_params['k'],
         d=trend_params['d']
     )
-    if stoch_rsi_4h is not None and not stoch_rsi_4h.empty:
-        df_4h['trend_srsi_k'] = stoch_rsi_4h[
-            f'STOCHRSIk_{trend_params['stoch_len']}_{trend_params['rsi_len']}_{trend_params['k']}_{trend_params['d']}']
-        df_4h['trend_srsi_d'] = stoch_rsi_4h[
-            f'STOCHRSId_{trend_params['stoch_len']}_{trend_params['rsi_len']}_{trend_params['k']}_{trend_params['d']}']
-    else:
-        df_4h['trend_srsi_k'] = np.nan
-        df_4h['trend_srsi_d'] = np.nan
 
     # Calculate 45-Minute Short StochRSI
-    stoch_rsi_45m = ta.stochrsi(
+    df_45m['short_srsi_k'], df_45m['short_srsi_d'] = indicators.stochrsi(
         df_45m['close'],
         length=short_params['stoch_len'],
         rsi_length=short_params['rsi_len'],
         k=short_params['k'],
         d=short_params['d']
     )
-    if stoch_rsi_45m is not None and not stoch_rsi_45m.empty:
-        df_45m['short_srsi_k'] = stoch_rsi_45m[
-            f'STOCHRSIk_{short_params['stoch_len']}_{short_params['rsi_len']}_{short_params['k']}_{short_params['d']}']
-        df_45m['short_srsi_d'] = stoch_rsi_45m[
-            f'STOCHRSId_{short_params['stoch_len']}_{short_params['rsi_len']}_{short_params['k']}_{short_params['d']}']
-    else:
-        df_45m['short_srsi_k'] = np.nan
-        df_45m['short_srsi_d'] = np.nan
 
     # Calculate 45M ATR
-    df_45m['atr'] = ta.atr(df_45m['high'], df_45m['low'], df_45m['close'], length=atr_len)
+    df_45m['atr'] = indicators.atr(df_45m['high'], df_45m['low'], df_45m['close'], length=atr_len,
+                                   ta_compatible=True)
 
     # Calculate 4-Hour ADX
-    adx_4h = ta.adx(df_4h['high'], df_4h['low'], df_4h['close'], length=adx_len)
-    if adx_4h is not None and not adx_4h.empty:
-        df_4h['adx'] = adx_4h[f'ADX_{adx_len}']
-    else:
-        df_4h['adx'] = np.nan
+    df_4h['adx'] = indicators.adx(df_4h['high'], df_4h['low'], df_4h['close'], length=adx_len, ta_compatible=True)
 
     print("Indicator calculation complete.")
     return df_4h, df_45m
 
 
+def calculate_adx_thresholds(adx, params):
+    """
+    The ADX level the 4H trend must exceed on each bar: the fixed 'adx_threshold', or with
+    'adx_threshold_percentile' set, that percentile of the ADX over the previous
+    'adx_percentile_window' 4H bars. The bias cannot be set until the window is full.
+    """
+    percentile = params.get('adx_threshold_percentile')
+    if percentile is None:
+        return pd.Series(float(params['adx_threshold']), index=adx.index)
+    thresholds = indicators.rolling_quantile(adx.shift(1), params['adx_percentile_window'], percentile / 100)
+    return pd.Series(thresholds, index=adx.index).fillna(np.inf)
+
+
 # --- Phase 3: Backtest Loop ---
 
-def run_backtest_loop(df, params):
+def new_loop_state():
+    """The state of `run_backtest_loop` before the first bar: flat, no trades."""
+    return {
+        'position': 0,
+        'entry_price': 0.0,
+        'stop_loss_price': 0.0,
+        'initial_stop_loss_price': 0.0,
+        'take_profit_price': 0.0,
+        'entry_timestamp': None,
+        'entry_avwap': np.nan,
+        'entry_trend_srsi_k': np.nan,
+        'entry_short_srsi_k': np.nan,
+        'entry_adx': np.nan,
+        'breakeven_trigger_price': 0.0,
+        'breakeven_stop_activated': False,
+        'trades': [],
+        'last_timestamp': None,
+        'last_close': None,
+    }
+
+
+def save_checkpoint(filepath, state, params, epic, data_filepath):
+    """Saves the loop state after a run, with the parameters, epic and data file it was run with."""
+    with open(filepath, 'wb') as f:
+        pickle.dump({'params': params, 'epic': epic, 'data_filepath': os.path.abspath(data_filepath),
+                     'state': state}, f)
+    print(f"Saved backtest checkpoint at {state['last_timestamp']} to {filepath}")
+
+
+def load_checkpoint(filepath, params, df, epic, data_filepath):
     """
-    Runs the main event-driven backtest.
-    'df' is the master 1-minute DataFrame with all indicator data merged.
+    Returns the loop state saved by an earlier run, so `run_backtest_loop` only processes the bars after it.
+
+    The checkpoint is only used if it was made with the same parameters, epic and data file and its last
+    bar is still in `df` unchanged; otherwise (or if there is none) a fresh state is returned and the whole
+    history is replayed.
+    Indicators only look back, so bars appended to the data do not change the rows the checkpoint has seen.
     """
-    print("Starting backtest loop...")
+    if not os.path.exists(filepath):
+        return new_loop_state()
+    with open(filepath, 'rb') as f:
+        checkpoint = pickle.load(f)
+    state = checkpoint['state']
+    last_timestamp = state['last_timestamp']
+    if last_timestamp is None:
+        pass
+    elif set(state) != set(new_loop_state()):
+        print("Checkpoint was made by an older version of the backtest loop. Replaying the full history.")
+    elif checkpoint['params'] != params:
+        print("Checkpoint was made with different parameters. Replaying the full history.")
+    elif (checkpoint.get('epic'), checkpoint.get('data_filepath')) != (epic, os.path.abspath(data_filepath)):
+        print("Checkpoint was made for another epic or data file. Replaying the full history.")
+    elif last_timestamp not in df.index or df.at[last_timestamp, 'close'] != state['last_close']:
+        print("Checkpoint does not match the data. Replaying the full history.")
+    else:
+        print(f"Resuming from checkpoint at {last_timestamp} ({len(state['trades'])} trades so far).")
+        return state
+    return new_loop_state()
 
-    # --- State variables ---
-    trade_bias = 0
 
-    # Anchors
-    lowest_price_during_setup = float('inf')
-    temp_anchor_low_timestamp = None
-    confirmed_anchor_low_timestamp = None
+def _confirmed_anchors(index, prices, setup, starts, confirmations, first_extreme):
+    """
+    The confirmed anchor timestamp on every bar, for one side of the strategy's anchor logic.
+
+    A setup window tracks the extreme price of its bars; it restarts where a setup starts and at the
+    first setup bar after a confirmation. A confirmation (only once a setup bar has been seen) takes
+    the first extreme of the latest window as the anchor, until the next confirmation.
+    """
+    last_setup_before = np.r_[-1, segments.last_true(setup)[:-1]]
+    confirmations = confirmations & (last_setup_before >= 0)
+    restarts = setup & (starts | (segments.last_true(confirmations) > last_setup_before) | (last_setup_before < 0))
+    window = np.where(setup, np.cumsum(restarts) - 1, -1)
+    extremes = first_extreme(prices, window)
+    latest_window = np.maximum.accumulate(window) if len(window) else window
+    anchor_position = np.where(confirmations, extremes[np.maximum(latest_window, 0)] if len(extremes) else -1, np.nan)
+    anchor_position = segments.forward_fill(anchor_position, initial=-1).astype(np.int64)
+    return pd.DatetimeIndex(index[np.maximum(anchor_position, 0)]).where(anchor_position >= 0)
+
+
+def regime_columns(df, params):
+    """
+    The trade bias, setup windows and confirmed anchors of the strategy, computed for all bars at
+    once from the first bar of `df`. None of them depends on the open position, so
+    `run_backtest_loop` reads the anchors from here and only manages the position bar by bar.
+
+    - Bias: turns long when the 4H stoch RSI crosses above os_level with ADX above its threshold,
+      and short on a cross below ob_level; a long bias ends on a cross above ob_level, a short one
+      on a cross below os_level.
+    - Setups: the 45M stoch RSI below os_level in a long bias, or above ob_level in a short one.
+    - Anchors: the lowest low (highest high) of the latest setup window, confirmed when the 45M
+      stoch RSI crosses back over the level in the same bias.
+
+    Returns a DataFrame with 'trade_bias', 'is_long_setup', 'is_short_setup', 'anchor_low_timestamp'
+    and 'anchor_high_timestamp' (NaT before the first confirmed anchor).
+    """
+    os_level, ob_level = params['os_level'], params['ob_level']
+    trend_k = df['trend_srsi_k'].to_numpy(dtype=float)
+    short_k = df['short_srsi_k'].to_numpy(dtype=float)
+    adx_threshold = df['adx_threshold'].to_numpy(dtype=float) if 'adx_threshold' in df.columns \
+        else params['adx_threshold']
+    with np.errstate(invalid='ignore'):
+        strong_trend = df['adx'].to_numpy(dtype=float) > adx_threshold
+
+        # --- Bias: set leaving an extreme with a strong ADX, cleared on reaching the opposite extreme ---
+        turns_long = segments.crossed_above(trend_k, os_level) & strong_trend
+        turns_short = segments.crossed_below(trend_k, ob_level) & strong_trend
+        trade_bias = segments.latch(np.where(turns_short, -1.0, np.where(turns_long, 1.0, np.nan)), {
+            1: segments.crossed_above(trend_k, ob_level) & ~turns_long,
+            -1: segments.crossed_below(trend_k, os_level) & ~turns_short,
+        })
+
+        # --- Setups and anchors ---
+        is_long_setup = (trade_bias == 1) & (short_k < os_level)
+        is_short_setup = (trade_bias == -1) & (short_k > ob_level)
+        previous_short_k = np.r_[np.nan, short_k[:-1]]
+        long_starts = previous_short_k >= os_level
+        short_starts = previous_short_k <= ob_level
+
+    anchor_low = _confirmed_anchors(df.index, df['low'].to_numpy(dtype=float), is_long_setup, long_starts,
+                                    segments.crossed_above(short_k, os_level) & (trade_bias == 1),
+                                    segments.segment_argmin)
+    anchor_high = _confirmed_anchors(df.index, df['high'].to_numpy(dtype=float), is_short_setup, short_starts,
+                                     segments.crossed_below(short_k, ob_level) & (trade_bias == -1),
+                                     segments.segment_argmax)
+    return pd.DataFrame({'trade_bias': trade_bias.astype(np.int64), 'is_long_setup': is_long_setup,
+                         'is_short_setup': is_short_setup, 'anchor_low_timestamp': anchor_low,
+                         'anchor_high_timestamp': anchor_high}, index=df.index)
+
+
+# Per-bar values of the bias/anchor/AVWAP logic, which the exit parameters do not affect
+SETUP_COLUMNS = ('long_avwap_active', 'short_avwap_active', 'avwap_low', 'avwap_high',
+                 'anchor_low_timestamp', 'anchor_high_timestamp')
+EXIT_PARAMS = ('sl_multiplier', 'tp_multiplier', 'breakeven_trigger_R')
+
+
+def run_backtest_loop(df, params, state=None, setups=None):
+    """
+    Runs the main event-driven backtest.
+    'df' is the master 1-minute DataFrame with all indicator data merged. It holds the whole history
+    also when resuming: the regimes (see `regime_columns`) and AVWAPs are computed from its first bar.
 
-    highest_price_during_setup = float('-inf')
-    temp_anchor_high_timestamp = None
-    confirmed_anchor_high_timestamp = None
+    'state' (see `new_loop_state` and `load_checkpoint`) is updated in place as the bars are processed.
+    A state from an earlier run resumes after its last bar, and the earlier trades are included in
+    the result, so a resumed run returns the same trades as a full run over the same data.
 
-    # --- AVWAP: REMOVED ROLLING SUM VARIABLES ---
+    'setups', if given, is a dict that gets a list per `SETUP_COLUMNS` key with that value on every
+    processed bar. These do not depend on the exit parameters (see `run_exit_sweep`).
+    """
+    print("Starting backtest loop...")
+    if state is None:
+        state = new_loop_state()
+    if setups is not None:
+        for column in SETUP_COLUMNS:
+            setups[column] = []
+
+    # --- State variables ---
     avwap_low = np.nan
     avwap_high = np.nan
 
     # Position
-    position = 0
-    entry_price = 0.0
-    stop_loss_price = 0.0
-    take_profit_price = 0.0
-    entry_timestamp = None
-
-    entry_avwap = np.nan
-    entry_trend_srsi_k = np.nan
-    entry_short_srsi_k = np.nan
-    entry_adx = np.nan
+    position = state['position']
+    entry_price = state['entry_price']
+    stop_loss_price = state['stop_loss_price']
+    initial_stop_loss_price = state['initial_stop_loss_price']
+    take_profit_price = state['take_profit_price']
+    entry_timestamp = state['entry_timestamp']
+
+    entry_avwap = state['entry_avwap']
+    entry_trend_srsi_k = state['entry_trend_srsi_k']
+    entry_short_srsi_k = state['entry_short_srsi_k']
+    entry_adx = state['entry_adx']
 
     # Break-Even State
-    breakeven_trigger_price = 0.0
-    breakeven_stop_activated = False
+    breakeven_trigger_price = state['breakeven_trigger_price']
+    breakeven_stop_activated = state['breakeven_stop_activated']
+
+    trades = state['trades']
 
-    trades = []
+    if 'adx_threshold' not in df.columns:
+        df = df.assign(adx_threshold=params['adx_threshold'])
 
-    df_prev = df.shift(1)
+    # --- STEP 1 for every bar at once: bias, setups and confirmed anchors (see `regime_columns`) ---
+    regimes = regime_columns(df, params)
+    anchor_lows = [None if pd.isna(t) else t for t in regimes['anchor_low_timestamp']]
+    anchor_highs = [None if pd.isna(t) else t for t in regimes['anchor_high_timestamp']]
+
+    # Skip the bars an earlier run already processed
+    start = 0 if state['last_timestamp'] is None else df.index.searchsorted(state['last_timestamp'], side='right')
+    if start:
+        print(f"Skipping {start} bars already processed; {len(df) - start} new bars.")
 
     # --- MAIN LOOP ---
-    for row, prev_row in zip(df.itertuples(), df_prev.itertuples()):
+    for i, row in enumerate(df.iloc[start:].itertuples(), start):
+        confirmed_anchor_low_timestamp = anchor_lows[i]
+        confirmed_anchor_high_timestamp = anchor_highs[i]
 
         # ==============================================================================
-        # STEP 1: UPDATE INDICATORS & STATE
+        # STEP 1: UPDATE AVWAP (the anchors come from the regime columns)
         # ==============================================================================
 
-        # --- 1a. Update Bias (4-Hour Logic) ---
-        if (prev_row.trend_srsi_k < params['os_level'] and
-                row.trend_srsi_k >= params['os_level'] and
-                row.adx > params['adx_threshold']):
-            trade_bias = 1
-
-        elif prev_row.trend_srsi_k < params['ob_level'] and row.trend_srsi_k >= params['ob_level']:
-            if trade_bias == 1: trade_bias = 0
-
-        if (prev_row.trend_srsi_k > params['ob_level'] and
-                row.trend_srsi_k <= params['ob_level'] and
-                row.adx > params['adx_threshold']):
-            trade_bias = -1
-
-        elif prev_row.trend_srsi_k > params['os_level'] and row.trend_srsi_k <= params['os_level']:
-            if trade_bias == -1: trade_bias = 0
-
-        # --- 1b. Update Setup & Anchors (45-Minute Logic) ---
-        is_long_setup = (trade_bias == 1 and row.short_srsi_k < params['os_level'])
-        is_short_setup = (trade_bias == -1 and row.short_srsi_k > params['ob_level'])
-
-        if (is_long_setup and (prev_row.short_srsi_k >= params['os_level'])):
-            lowest_price_during_setup = row.low
-            temp_anchor_low_timestamp = row.Index
-        if (is_short_setup and (prev_row.short_srsi_k <= params['ob_level'])):
-            highest_price_during_setup = row.high
-            temp_anchor_high_timestamp = row.Index
-
-        if is_long_setup:
-            if row.low < lowest_price_during_setup:
-                lowest_price_during_setup = row.low
-                temp_anchor_low_timestamp = row.Index
-        if is_short_setup:
-            if row.high > highest_price_during_setup:
-                highest_price_during_setup = row.high
-                temp_anchor_high_timestamp = row.Index
-
-        # --- Anchor Confirmation ---
-        if (prev_row.short_srsi_k < params['os_level'] and row.short_srsi_k >= params[
-            'os_level']) and trade_bias == 1 and temp_anchor_low_timestamp:
-            confirmed_anchor_low_timestamp = temp_anchor_low_timestamp
-            lowest_price_during_setup = float('inf')
-            # --- ROLLING SUMS REMOVED ---
-
-        if (prev_row.short_srsi_k > params['ob_level'] and row.short_srsi_k <= params[
-            'ob_level']) and trade_bias == -1 and temp_anchor_high_timestamp:
-            confirmed_anchor_high_timestamp = temp_anchor_high_timestamp
-            highest_price_during_setup = float('-inf')
-            # --- ROLLING SUMS REMOVED ---
-
-        # --- 1c. Update AVWAP (Cumulative Calculation) ---
-        # --- LOGIC ENTIRELY REBUILT ---
+        # --- 1. Update AVWAP (Cumulative Calculation) ---
         long_avwap_active = False
         short_avwap_active = False
 
@@ -252,6 +349,11 @@ def run_backtest_loop(df, params):
                     print(f"Warning: AVWAP slice failed at {row.Index}. {e}")
                     avwap_high = np.nan
 
+        if setups is not None:
+            for column, value in zip(SETUP_COLUMNS, (long_avwap_active, short_avwap_active, avwap_low, avwap_high,
+                                                     confirmed_anchor_low_timestamp, confirmed_anchor_high_timestamp)):
+                setups[column].append(value)
+
         # ==============================================================================
         # STEP 2: CHECK EXITS (Existing Positions)
         # ==============================================================================
@@ -265,14 +367,16 @@ def run_backtest_loop(df, params):
             if row.low <= stop_loss_price:
                 trades.append(('Long', entry_timestamp, row.Index, entry_price, stop_loss_price,
                                stop_loss_price, take_profit_price, confirmed_anchor_low_timestamp, 'low',
-                               entry_avwap, entry_trend_srsi_k, entry_short_srsi_k, entry_adx))
+                               entry_avwap, entry_trend_srsi_k, entry_short_srsi_k, entry_adx,
+                               initial_stop_loss_price))
                 position = 0
                 continue
 
             elif row.high >= take_profit_price:
                 trades.append(('Long', entry_timestamp, row.Index, entry_price, take_profit_price,
                                stop_loss_price, take_profit_price, confirmed_anchor_low_timestamp, 'low',
-                               entry_avwap, entry_trend_srsi_k, entry_short_srsi_k, entry_adx))
+                               entry_avwap, entry_trend_srsi_k, entry_short_srsi_k, entry_adx,
+                               initial_stop_loss_price))
                 position = 0
                 continue
 
@@ -280,7 +384,8 @@ def run_backtest_loop(df, params):
             elif not pd.isna(avwap_low) and row.close < avwap_low:
                 trades.append(('Long', entry_timestamp, row.Index, entry_price, row.close,
                                stop_loss_price, take_profit_price, confirmed_anchor_low_timestamp, 'low',
-                               entry_avwap, entry_trend_srsi_k, entry_short_srsi_k, entry_adx))
+                               entry_avwap, entry_trend_srsi_k, entry_short_srsi_k, entry_adx,
+                               initial_stop_loss_price))
                 position = 0
                 continue
 
@@ -294,14 +399,16 @@ def run_backtest_loop(df, params):
             if row.high >= stop_loss_price:
                 trades.append(('Short', entry_timestamp, row.Index, entry_price, stop_loss_price,
                                stop_loss_price, take_profit_price, confirmed_anchor_high_timestamp, 'high',
-                               entry_avwap, entry_trend_srsi_k, entry_short_srsi_k, entry_adx))
+                               entry_avwap, entry_trend_srsi_k, entry_short_srsi_k, entry_adx,
+                               initial_stop_loss_price))
                 position = 0
                 continue
 
             elif row.low <= take_profit_price:
                 trades.append(('Short', entry_timestamp, row.Index, entry_price, take_profit_price,
                                stop_loss_price, take_profit_price, confirmed_anchor_high_timestamp, 'high',
-                               entry_avwap, entry_trend_srsi_k, entry_short_srsi_k, entry_adx))
+                               entry_avwap, entry_trend_srsi_k, entry_short_srsi_k, entry_adx,
+                               initial_stop_loss_price))
                 position = 0
                 continue
 
@@ -309,7 +416,8 @@ def run_backtest_loop(df, params):
             elif not pd.isna(avwap_high) and row.close > avwap_high:
                 trades.append(('Short', entry_timestamp, row.Index, entry_price, row.close,
                                stop_loss_price, take_profit_price, confirmed_anchor_high_timestamp, 'high',
-                               entry_avwap, entry_trend_srsi_k, entry_short_srsi_k, entry_adx))
+                               entry_avwap, entry_trend_srsi_k, entry_short_srsi_k, entry_adx,
+                               initial_stop_loss_price))
                 position = 0
                 continue
 
@@ -325,6 +433,7 @@ def run_backtest_loop(df, params):
                     entry_price = avwap_low
                     stop_distance = row.atr * params['sl_multiplier']
                     stop_loss_price = entry_price - stop_distance
+                    initial_stop_loss_price = stop_loss_price
                     take_profit_price = entry_price + (stop_distance * params['tp_multiplier'])
                     entry_timestamp = row.Index
 
@@ -342,6 +451,7 @@ def run_backtest_loop(df, params):
                     entry_price = avwap_high
                     stop_distance = row.atr * params['sl_multiplier']
                     stop_loss_price = entry_price + stop_distance
+                    initial_stop_loss_price = stop_loss_price
                     take_profit_price = entry_price - (stop_distance * params['tp_multiplier'])
                     entry_timestamp = row.Index
 
@@ -353,10 +463,156 @@ def run_backtest_loop(df, params):
                     breakeven_trigger_price = entry_price - (stop_distance * params['breakeven_trigger_R'])
                     breakeven_stop_activated = False
 
+    state.update({
+        'position': position,
+        'entry_price': entry_price,
+        'stop_loss_price': stop_loss_price,
+        'initial_stop_loss_price': initial_stop_loss_price,
+        'take_profit_price': take_profit_price,
+        'entry_timestamp': entry_timestamp,
+        'entry_avwap': entry_avwap,
+        'entry_trend_srsi_k': entry_trend_srsi_k,
+        'entry_short_srsi_k': entry_short_srsi_k,
+        'entry_adx': entry_adx,
+        'breakeven_trigger_price': breakeven_trigger_price,
+        'breakeven_stop_activated': breakeven_stop_activated,
+    })
+    if len(df) > start:
+        state['last_timestamp'] = df.index[-1]
+        state['last_close'] = df['close'].iloc[-1]
+
     print(f"Backtest loop complete. Found {len(trades)} trades.")
     return trades
 
 
+def simulate_exit_grid(df, setups, exit_grid):
+    """
+    Re-runs only the position management of `run_backtest_loop` for every row of `exit_grid`
+    (a DataFrame with the `EXIT_PARAMS` columns), reusing the per-bar `setups` it recorded.
+
+    The K parameter sets are held as length-K arrays and advanced together, and bars where every set
+    is flat and there is no entry are skipped, so the cost barely grows with K.
+    Returns one trade list per row, in the same format as `run_backtest_loop`.
+    """
+    sl_multiplier = exit_grid['sl_multiplier'].to_numpy(dtype=float)
+    tp_multiplier = exit_grid['tp_multiplier'].to_numpy(dtype=float)
+    breakeven_r = exit_grid['breakeven_trigger_R'].to_numpy(dtype=float)
+    k = len(exit_grid)
+
+    high, low, close, atr = (df[c].to_numpy(dtype=float) for c in ('high', 'low', 'close', 'atr'))
+    avwap_low = np.asarray(setups['avwap_low'], dtype=float)
+    avwap_high = np.asarray(setups['avwap_high'], dtype=float)
+
+    # Entries exactly as in STEP 3: the long branch takes precedence whenever its AVWAP is defined
+    long_ready = np.asarray(setups['long_avwap_active'], dtype=bool) & ~np.isnan(avwap_low)
+    short_ready = ~long_ready & np.asarray(setups['short_avwap_active'], dtype=bool) & ~np.isnan(avwap_high)
+    with np.errstate(invalid='ignore'):
+        long_entry = long_ready & ~np.isnan(atr) & (low <= avwap_low) & (avwap_low <= high)
+        short_entry = short_ready & ~np.isnan(atr) & (low <= avwap_high) & (avwap_high <= high)
+    entry_bars = np.flatnonzero(long_entry | short_entry)
+
+    position = np.zeros(k, dtype=np.int8)
+    entry_price = np.zeros(k)
+    stop_loss = np.zeros(k)
+    initial_stop_loss = np.zeros(k)
+    take_profit = np.zeros(k)
+    breakeven_trigger = np.zeros(k)
+    breakeven_active = np.zeros(k, dtype=bool)
+    entry_bar = np.zeros(k, dtype=np.int64)
+    # (bar, combinations, directions, entry bars, entry prices, exit prices, stop losses, take profits,
+    #  initial stop losses)
+    exits = []
+
+    i = entry_bars[0] if len(entry_bars) else len(df)
+    while i < len(df):
+        is_long, is_short = position == 1, position == -1
+
+        # --- STEP 2: breakeven, then stop loss, take profit and AVWAP exits ---
+        triggered = is_long & ~breakeven_active & (high[i] >= breakeven_trigger)
+        triggered |= is_short & ~breakeven_active & (low[i] <= breakeven_trigger)
+        stop_loss[triggered] = entry_price[triggered]
+        breakeven_active |= triggered
+
+        hit_stop = (is_long & (low[i] <= stop_loss)) | (is_short & (high[i] >= stop_loss))
+        hit_target = ~hit_stop & ((is_long & (high[i] >= take_profit)) | (is_short & (low[i] <= take_profit)))
+        avwap_exit = np.zeros(k, dtype=bool)
+        if not np.isnan(avwap_low[i]) and close[i] < avwap_low[i]:
+            avwap_exit |= is_long
+        if not np.isnan(avwap_high[i]) and close[i] > avwap_high[i]:
+            avwap_exit |= is_short
+        closed = hit_stop | hit_target | avwap_exit
+        if closed.any():
+            exit_price = np.where(hit_stop, stop_loss, np.where(hit_target, take_profit, close[i]))
+            combinations = np.flatnonzero(closed)
+            exits.append((i, combinations, position[combinations], entry_bar[combinations],
+                          entry_price[combinations], exit_price[combinations], stop_loss[combinations],
+                          take_profit[combinations], initial_stop_loss[combinations]))
+            position[closed] = 0
+
+        # --- STEP 3: entries for the sets that were already flat at the start of the bar ---
+        if long_entry[i] or short_entry[i]:
+            flat = (position == 0) & ~closed
+            direction = 1 if long_entry[i] else -1
+            price = avwap_low[i] if direction == 1 else avwap_high[i]
+            stop_distance = atr[i] * sl_multiplier[flat]
+            position[flat] = direction
+            entry_price[flat] = price
+            stop_loss[flat] = price - direction * stop_distance
+            initial_stop_loss[flat] = stop_loss[flat]
+            take_profit[flat] = price + direction * (stop_distance * tp_multiplier[flat])
+            breakeven_trigger[flat] = price + direction * (stop_distance * breakeven_r[flat])
+            breakeven_active[flat] = False
+            entry_bar[flat] = i
+
+        if position.any():
+            i += 1
+        else:
+            # Everyone is flat: jump to the next bar with an entry
+            next_entry = np.searchsorted(entry_bars, i, side='right')
+            i = entry_bars[next_entry] if next_entry < len(entry_bars) else len(df)
+
+    index = df.index
+    trend_k, short_k, adx = (df[c].to_numpy() for c in ('trend_srsi_k', 'short_srsi_k', 'adx'))
+    trades = [[] for _ in range(k)]
+    for i, *closed_trades in exits:
+        for c, direction, e, entry, exit_price, stop, target, initial_stop in zip(*closed_trades):
+            is_long = direction == 1
+            trades[c].append(('Long' if is_long else 'Short', index[e], index[i], entry, exit_price, stop, target,
+                              setups['anchor_low_timestamp' if is_long else 'anchor_high_timestamp'][i],
+                              'low' if is_long else 'high', entry, trend_k[e], short_k[e], adx[e], initial_stop))
+    return trades
+
+
+def run_exit_sweep(df, params, exit_grid):
+    """
+    Backtests every combination of exit parameters in `exit_grid` (a dict of lists, e.g.
+    {'sl_multiplier': [0.5, 1.0], 'tp_multiplier': [3, 5], 'breakeven_trigger_R': [1.0]}).
+
+    The bias, anchor and AVWAP logic runs once; only the position management is repeated, for all
+    combinations at once. Returns a DataFrame with one row per combination and its results, and the
+    trade lists in the same order.
+    """
+    grid = pd.MultiIndex.from_product([exit_grid.get(p, [params[p]]) for p in EXIT_PARAMS],
+                                      names=EXIT_PARAMS).to_frame(index=False)
+    setups = {}
+    run_backtest_loop(df, params, setups=setups)
+    print(f"Simulating {len(grid)} exit parameter combinations...")
+    all_trades = simulate_exit_grid(df, setups, grid)
+
+    results = []
+    for trades in all_trades:
+        pnl = np.array([t[4] - t[3] if t[0] == 'Long' else t[3] - t[4] for t in trades])
+        gross_loss = -pnl[pnl < 0].sum()
+        results.append({
+            'trades': len(trades),
+            'win_rate': (pnl > 0).mean() * 100 if len(trades) else 0.0,
+            'net_pnl': pnl.sum(),
+            'profit_factor': pnl[pnl > 0].sum() / gross_loss if gross_loss > 0 else np.inf,
+        })
+    grid = grid.join(pd.DataFrame(results))
+    return grid, all_trades
+
+
 # --- Phase 4: Performance Analysis & Charting ---
 def generate_trade_chart(trade_data, full_df, trade_number, context_bars=50, post_bars=20):
     """Generates and saves a candlestick chart for a single trade."""
@@ -459,7 +715,7 @@ def analyze_and_plot_results(trades, initial_capital, df_master):
     new_columns = [
         'Type', 'EntryTime', 'ExitTime', 'EntryPrice', 'ExitPrice',
         'StopLoss', 'TakeProfit', 'AnchorTime', 'AVWAPType',
-        'EntryAVWAP', 'EntryTrendSRSI_K', 'EntryShortSRSI_K', 'EntryADX'
+        'EntryAVWAP', 'EntryTrendSRSI_K', 'EntryShortSRSI_K', 'EntryADX', 'InitialStopLoss'
     ]
     trade_df = pd.DataFrame(trades, columns=new_columns)
 
@@ -507,6 +763,7 @@ def analyze_and_plot_results(trades, initial_capital, df_master):
     print(f"Avg. Win / Avg. Loss: {avg_rr:.2f} : 1")
     print(f"Average Win:        {avg_win:.2f}")
     print(f"Average Loss:       {avg_loss:.2f}")
+    return trade_df
 
 
 # --- Main Execution ---
@@ -517,7 +774,10 @@ def main():
         'epic': 'J225',
         'start_date': datetime(2025, 11, 2),  # Start date to "prime" indicators
         'end_date': datetime(2025, 11, 13),  # Your original end date
-        'data_filepath': 'data_1m.csv'
+        # A .npz path reads and writes the tick-encoded store (see `tick_storage`) instead of CSV
+        'data_filepath': 'data_1m.csv',
+        # Loop state saved after each run; the next run only processes candles appended since then
+        'checkpoint_filepath': 'data_1m.checkpoint.pkl'
     }
 
     pine_script_inputs = {
@@ -530,15 +790,22 @@ def main():
         'trend_params': {'k': 3, 'd': 3, 'rsi_len': 14, 'stoch_len': 21},
         'short_params': {'k': 3, 'd': 3, 'rsi_len': 14, 'stoch_len': 14},
         'adx_len': 14,
-        'adx_threshold': 20
+        'adx_threshold': 20,
+        # Set to e.g. 70 to require ADX above its 70th percentile instead of the fixed threshold
+        'adx_threshold_percentile': None,
+        'adx_percentile_window': 60
     }
 
+    # Set to sweep the exit parameters instead of a single run, e.g.
+    # {'sl_multiplier': [0.5, 1.0, 1.5], 'tp_multiplier': [3, 5, 8], 'breakeven_trigger_R': [0.5, 1.0]}
+    exit_grid = None
+
     initial_capital = 1000000
 
     # --- Phase 1: Get Data ---
     # ... (code is unchanged from your file) ...
     try:
-        df_1m = pd.read_csv(backtest_params['data_filepath'], index_col='datetime', parse_dates=True)
+        df_1m = load_candles(backtest_params['data_filepath'])
         print(f"Successfully loaded 1M data from {backtest_params['data_filepath']}")
     except FileNotFoundError:
         print(f"{backtest_params['data_filepath']} not found. Fetching from API...")
@@ -553,7 +820,7 @@ def main():
             return
 
         df_1m = prepare_data(all_candle_data)
-        df_1m.to_csv(backtest_params['data_filepath'])
+        save_candles(df_1m, backtest_params['data_filepath'], epic=backtest_params['epic'])
         print(f"Data saved to {backtest_params['data_filepath']} for future use.")
 
     if df_1m.empty:
@@ -572,6 +839,7 @@ def main():
         pine_script_inputs['atr_len'],
         pine_script_inputs['adx_len']
     )
+    df_4h['adx_threshold'] = calculate_adx_thresholds(df_4h['adx'], pine_script_inputs)
 
     # --- Phase 3: Merge Data & Run Backtest ---
     print("Merging dataframes for backtest loop...")
@@ -590,10 +858,40 @@ def main():
 
     print(f"Master DataFrame created. Shape: {df_master.shape}. Running backtest...")
 
-    trades = run_backtest_loop(df_master, pine_script_inputs)
+    if exit_grid:
+        sweep_results, _ = run_exit_sweep(df_master, pine_script_inputs, exit_grid)
+        print("\n--- Exit Parameter Sweep ---")
+        print(sweep_results.sort_values('net_pnl', ascending=False).to_string(index=False))
+        return
+
+    state = load_checkpoint(backtest_params['checkpoint_filepath'], pine_script_inputs, df_master,
+                            backtest_params['epic'], backtest_params['data_filepath'])
+    trades = run_backtest_loop(df_master, pine_script_inputs, state)
+    save_checkpoint(backtest_params['checkpoint_filepath'], state, pine_script_inputs, backtest_params['epic'],
+                    backtest_params['data_filepath'])
 
     # --- Phase 4: Analyze Results ---
-    analyze_and_plot_results(trades, initial_capital, df_master)
+    trade_df = analyze_and_plot_results(trades, initial_capital, df_master)
+
+    # --- Phase 5: Record the run in the results database ---
+    if trade_df is not None:
+        results_df = trade_df.rename(columns={
+            'Type': 'direction', 'EntryTime': 'entry_time', 'ExitTime': 'exit_time',
+            'EntryPrice': 'entry_price', 'ExitPrice': 'exit_price', 'InitialStopLoss': 'initial_stop_loss',
+            'TakeProfit': 'take_profit', 'P&L': 'pnl'
+        })
+        params = {
+            'strategy': {k: v for k, v in pine_script_inputs.items() if not isinstance(v, dict)},
+            'trend_params': pine_script_inputs['trend_params'],
+            'short_params': pine_script_inputs['short_params'],
+        }
+        # The P&L is in price points per unit (there is no position sizing), so no balance is recorded
+        # and the balance-based metrics are left empty rather than mixing points with currency
+        with ResultsDatabase('results.db') as results_db:
+            run_id = results_db.add_run('AvwapStochRsi', backtest_params['epic'], results_df, params=params,
+                                        initial_balance=None, start_date=backtest_params['start_date'],
+                                        end_date=backtest_params['end_date'])
+        print(f"Run recorded in results.db with id {run_id}")
 
 
 if __name__ == "__main__":
@@ -2,9 +2,10 @@
 
 import json
 import requests
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 
 from modular_bot import config
+from modular_bot.market_data_client import get_cached_prices
 
 API_BASE_URL = "https://demo-api-capital.backend-capital.com"
 API_HEADERS = {
@@ -12,6 +13,9 @@ API_HEADERS = {
     'Content-Type': 'application/json'
 }
 
+# The longest stretch without candles in a covered range: a weekend plus a holiday
+MAX_CANDLE_GAP = timedelta(days=4)
+
 xst = ""
 cst = ""
 
@@ -36,11 +40,30 @@ def start_session():
         text = str(response1.status_code) + " returned from method: start_session" + "\ntrying again..."
         print(text)
 
+
+def _covers(prices, start_date, end_date):
+    """Whether candles start and end within MAX_CANDLE_GAP of start_date and end_date (or now, if sooner)."""
+    def naive(moment):
+        return moment.replace(tzinfo=None)
+
+    first = datetime.fromisoformat(prices[0]['snapshotTimeUTC'].replace('Z', ''))
+    last = datetime.fromisoformat(prices[-1]['snapshotTimeUTC'].replace('Z', ''))
+    end = min(naive(end_date), naive(datetime.now(timezone.utc)))
+    return naive(first) - naive(start_date) <= MAX_CANDLE_GAP and end - naive(last) <= MAX_CANDLE_GAP
+
+
 # --- 2. Chunked Data Fetching Function ---
 def fetch_all_data(epic, start_date, end_date, resolution="MINUTE_15"):
     """
     Fetches all 15-minute data in chunks between a start and end date.
     """
+    cached_prices = get_cached_prices(epic, resolution, start_date, to_date=end_date)
+    if cached_prices and _covers(cached_prices, start_date, end_date):
+        print(f"Loaded {len(cached_prices)} candles for {epic} from the local market data cache.")
+        return cached_prices
+    if cached_prices:
+        print(f"The local market data cache does not cover {start_date} to {end_date} for {epic}; using the API.")
+
     all_prices = []
     current_date = start_date
     start_session()
@@ -90,4 +113,37 @@ def fetch_all_data(epic, start_date, end_date, resolution="MINUTE_15"):
             break
 
     print(f"Total candles fetched: {len(all_prices)}")
-    return all_prices
\ No newline at end of file
+    return all_prices
+
+
+def fetch_prices(epic, resolution="MINUTE_15", from_date=None, max_candles=1000):
+    """
+    Fetches one page of candles using the current session, starting a new session if
+    there is none or the current one has expired. Returns None if the request fails.
+    """
+    if not xst:
+        start_session()
+
+    url = f"{API_BASE_URL}/api/v1/prices/{epic}?resolution={resolution}&max={max_candles}"
+    if from_date is not None:
+        url += f"&from={from_date}"
+
+    for attempt in range(2):
+        SESH_HEADERS = {
+            'X-SECURITY-TOKEN': xst,
+            'CST': cst
+        }
+        try:
+            response = requests.get(url, headers=SESH_HEADERS)
+        except requests.exceptions.RequestException as e:
+            print(f"An API error occurred: {e}")
+            return None
+
+        if response.status_code == 200:
+            return response.json().get('prices', [])
+        if response.status_code == 401 and attempt == 0:
+            print("Session expired, starting a new one...")
+            start_session()
+            continue
+        print(str(response.status_code) + " returned from method: fetch_prices")
+        return None
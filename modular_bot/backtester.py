@@ -1,7 +1,15 @@
 # backtester.py
+import os
+import pickle
+from bisect import bisect_right
+from concurrent.futures import ProcessPoolExecutor
+
 import pandas as pd
 import numpy as np
 
+from modular_bot import indicators
+from modular_bot.touch_index import TouchIndex, first_of
+
 
 def print_trade_summary(trade_info):
     """Prints a formatted summary of a single trade to the console."""
@@ -56,93 +64,159 @@ def prepare_data(price_list):
 
 def _calculate_atr(df, period=14):
     """Helper to calculate ATR."""
-    high_low = df['high'] - df['low']
-    high_close = (df['high'] - df['close'].shift()).abs()
-    low_close = (df['low'] - df['close'].shift()).abs()
-    tr = pd.concat([high_low, high_close, low_close], axis=1).max(axis=1)
-    return tr.ewm(alpha=1 / period, adjust=False).mean()
-
-
-def calculate_indicators(df, fast_ma=20, slow_ma=50, long_term_ma=200, adx_period=14):
-    """Calculates EMA, ATR, and ADX indicators."""
-    print(f"Calculating indicators: EMA({fast_ma}, {slow_ma}, {long_term_ma}), ADX({adx_period}), ATR(14)...")
-    df[f'EMA_{fast_ma}'] = df['close'].ewm(span=fast_ma, adjust=False).mean()
-    df[f'EMA_{slow_ma}'] = df['close'].ewm(span=slow_ma, adjust=False).mean()
-    df[f'EMA_{long_term_ma}'] = df['close'].ewm(span=long_term_ma, adjust=False).mean()
-    df['ATRr_14'] = _calculate_atr(df, period=14)
-    plus_dm = (df['high'] - df['high'].shift()).where(
-        (df['high'] - df['high'].shift()) > (df['low'].shift() - df['low']), 0)
-    minus_dm = (df['low'].shift() - df['low']).where(
-        (df['low'].shift() - df['low']) > (df['high'] - df['high'].shift()), 0)
-    plus_di = 100 * (plus_dm.ewm(alpha=1 / adx_period, adjust=False).mean() / df['ATRr_14'])
-    minus_di = 100 * (minus_dm.ewm(alpha=1 / adx_period, adjust=False).mean() / df['ATRr_14'])
-    dx = 100 * (abs(plus_di - minus_di) / (plus_di + minus_di))
-    df[f'ADX_{adx_period}'] = dx.ewm(alpha=1 / adx_period, adjust=False).mean()
-    df.dropna(inplace=True)
-    print("Indicators calculated and NaN rows dropped.")
-    return df
+    return pd.Series(indicators.atr(df['high'], df['low'], df['close'], length=period), index=df.index)
 
 
-def run_backtest(df_with_signals, epic, initial_balance, risk_per_trade_percent=2.0, risk_reward_ratio=1.5,
-                 trailing_stop_atr_multiplier=2.5):
+def _complete_mask(df, columns=None):
+    complete = np.ones(len(df), dtype=bool)
+    for column in (df.columns if columns is None else columns):
+        complete &= pd.notna(df[column].to_numpy())
+    return complete
+
+
+def complete_rows(df, columns=None):
     """
-    Backtesting engine with risk-based position sizing.
+    Positions of the rows that have no NaN in any column (or in `columns`). When those are all the
+    rows after the indicator warm-up this is a slice, so `df.iloc[rows]` is a view instead of a copy.
     """
-    all_trades = []
-    current_balance = initial_balance
-    in_trade = False
-    trade_details = {}
+    complete = _complete_mask(df, columns)
+    first = int(complete.argmax()) if complete.any() else len(df)
+    if complete[first:].all():
+        return slice(first, None)
+    return np.flatnonzero(complete)
 
-    for candle in df_with_signals.itertuples():
-        if in_trade:
-            exit_price = 0
-            if trade_details['direction'] == 'LONG':
-                new_trailing_stop = candle.high - (candle.ATRr_14 * trailing_stop_atr_multiplier)
-                trade_details['current_stop_loss'] = max(trade_details['current_stop_loss'], new_trailing_stop)
-                if candle.high >= trade_details['take_profit']:
-                    exit_price = trade_details['take_profit']
-                elif candle.low <= trade_details['current_stop_loss']:
-                    exit_price = trade_details['current_stop_loss']
+
+def calculate_indicators(df, fast_ma=20, slow_ma=50, long_term_ma=200, adx_period=14, columns=None):
+    """
+    Adds indicator columns to `df` and returns the rows where none of them is NaN any more.
+
+    By default these are EMA(fast, slow, long-term), ATR(14) and ADX. Pass `columns`
+    (e.g. `strategy.required_indicators()`) to calculate only what a strategy reads.
+    The result is a view of `df` that skips the warm-up rows, not a copy.
+    """
+    if columns is None:
+        columns = [f'EMA_{fast_ma}', f'EMA_{slow_ma}', f'EMA_{long_term_ma}', 'ATRr_14', f'ADX_{adx_period}']
+    print(f"Calculating indicators: {', '.join(columns)}...")
+    indicators.compute_indicators(df, columns)
+    print("Indicators calculated and NaN rows skipped.")
+    return df.iloc[complete_rows(df)]
+
+
+class IntrabarResolver:
+    """
+    Decides which of the take profit and the stop loss was hit first when a candle reaches both,
+    by walking the lower-timeframe (e.g. 1m) bars inside that candle.
+
+    The base bars are found by binary search on their timestamps, so each lookup costs
+    O(log n) plus the base bars in one candle, and nothing is done for unambiguous candles.
+    """
+
+    def __init__(self, base_df, bar_duration):
+        if not base_df.index.is_monotonic_increasing:
+            raise ValueError("The lower-timeframe data must be sorted by time.")
+        self.times = base_df.index.asi8
+        self.high = base_df['high'].to_numpy()
+        self.low = base_df['low'].to_numpy()
+        self.bar_duration = pd.Timedelta(bar_duration).value
+        self.ambiguous_bars = 0
+        self.resolved_bars = 0
+
+    def take_profit_first(self, timestamp, direction, take_profit, stop_loss):
+        """True if the base bars in the candle starting at `timestamp` reach the take profit first."""
+        self.ambiguous_bars += 1
+        start = np.searchsorted(self.times, timestamp.value, side='left')
+        end = np.searchsorted(self.times, timestamp.value + self.bar_duration, side='left')
+        for j in range(start, end):
+            if direction == 'LONG':
+                hit_take_profit, hit_stop_loss = self.high[j] >= take_profit, self.low[j] <= stop_loss
+            else:
+                hit_take_profit, hit_stop_loss = self.low[j] <= take_profit, self.high[j] >= stop_loss
+            if hit_take_profit != hit_stop_loss:
+                self.resolved_bars += 1
+                return hit_take_profit
+            if hit_take_profit:
+                break
+        # Both hit inside one base bar, or no base data: keep the candle-level order
+        return True
+
+
+class Position:
+    """
+    The open trade, balance and trade ledger of one strategy, advanced one candle at a time
+    with risk-based position sizing and an ATR trailing stop. With an `intrabar` resolver, candles
+    that reach both the take profit and the stop loss are settled from lower-timeframe data.
+    Subclasses can override `position_size` to change or limit the sizing.
+    """
+
+    def __init__(self, epic, initial_balance, risk_per_trade_percent=2.0, risk_reward_ratio=1.5,
+                 trailing_stop_atr_multiplier=2.5, intrabar=None, verbose=True):
+        self.epic = epic
+        self.balance = initial_balance
+        self.risk_per_trade_percent = risk_per_trade_percent
+        self.risk_reward_ratio = risk_reward_ratio
+        self.trailing_stop_atr_multiplier = trailing_stop_atr_multiplier
+        self.intrabar = intrabar
+        self.verbose = verbose
+        self.trades = []
+        self.trade = None
+
+    def position_size(self, entry_price, risk_per_unit):
+        """Units that risk `risk_per_trade_percent` of the balance. A size of 0 skips the signal."""
+        monetary_risk = self.balance * (self.risk_per_trade_percent / 100.0)
+        return monetary_risk / risk_per_unit
+
+    def update(self, timestamp, high, low, close, atr, signal, stop_loss_price):
+        """Manages the open trade on this candle, then opens a new one if there is a signal and no trade."""
+        trade = self.trade
+        if trade is not None:
+            if trade['direction'] == 'LONG':
+                new_trailing_stop = high - (atr * self.trailing_stop_atr_multiplier)
+                trade['current_stop_loss'] = max(trade['current_stop_loss'], new_trailing_stop)
+                hit_take_profit, hit_stop_loss = high >= trade['take_profit'], low <= trade['current_stop_loss']
             else:  # SHORT
-                new_trailing_stop = candle.low + (candle.ATRr_14 * trailing_stop_atr_multiplier)
-                trade_details['current_stop_loss'] = min(trade_details['current_stop_loss'], new_trailing_stop)
-                if candle.low <= trade_details['take_profit']:
-                    exit_price = trade_details['take_profit']
-                elif candle.high >= trade_details['current_stop_loss']:
-                    exit_price = trade_details['current_stop_loss']
+                new_trailing_stop = low + (atr * self.trailing_stop_atr_multiplier)
+                trade['current_stop_loss'] = min(trade['current_stop_loss'], new_trailing_stop)
+                hit_take_profit, hit_stop_loss = low <= trade['take_profit'], high >= trade['current_stop_loss']
+
+            if hit_take_profit and hit_stop_loss and self.intrabar is not None:
+                hit_take_profit = self.intrabar.take_profit_first(timestamp, trade['direction'], trade['take_profit'],
+                                                                  trade['current_stop_loss'])
+            exit_price = 0
+            if hit_take_profit:
+                exit_price = trade['take_profit']
+            elif hit_stop_loss:
+                exit_price = trade['current_stop_loss']
 
             if exit_price > 0:
-                in_trade = False
-                price_change = (exit_price - trade_details['entry_price']) if trade_details[
-                                                                                  'direction'] == 'LONG' else (
-                            trade_details['entry_price'] - exit_price)
-                pnl = price_change * trade_details['units']
-                current_balance += pnl
-                trade_details.update({'exit_time': candle.Index, 'exit_price': exit_price, 'pnl': pnl})
-                all_trades.append(trade_details.copy())
-                print_trade_summary(trade_details)
-                trade_details = {}
-
-        if not in_trade and candle.signal != 0:
-            in_trade = True
-            entry_price = candle.close
-            initial_stop_loss = candle.stop_loss_price
-            direction = 'LONG' if candle.signal == 1 else 'SHORT'
+                price_change = (exit_price - trade['entry_price']) if trade['direction'] == 'LONG' else (
+                        trade['entry_price'] - exit_price)
+                pnl = price_change * trade['units']
+                self.balance += pnl
+                trade.update({'exit_time': timestamp, 'exit_price': exit_price, 'pnl': pnl})
+                self.trades.append(trade)
+                if self.verbose:
+                    print_trade_summary(trade)
+                self.trade = None
+
+        if self.trade is None and signal != 0:
+            entry_price = close
+            initial_stop_loss = stop_loss_price
+            direction = 'LONG' if signal == 1 else 'SHORT'
 
             risk_per_unit = abs(entry_price - initial_stop_loss)
             if risk_per_unit == 0:
-                in_trade = False
-                continue
+                return
 
             # --- Position Sizing Calculation ---
-            monetary_risk = current_balance * (risk_per_trade_percent / 100.0)
-            units_to_trade = monetary_risk / risk_per_unit
+            units_to_trade = self.position_size(entry_price, risk_per_unit)
+            if units_to_trade == 0:
+                return
 
-            take_profit_distance = risk_per_unit * risk_reward_ratio
+            take_profit_distance = risk_per_unit * self.risk_reward_ratio
             take_profit = entry_price + take_profit_distance if direction == 'LONG' else entry_price - take_profit_distance
 
-            trade_details = {
-                'epic': epic, 'date': candle.Index.date(), 'entry_time': candle.Index,
+            self.trade = {
+                'epic': self.epic, 'date': timestamp.date(), 'entry_time': timestamp,
                 'entry_price': entry_price, 'direction': direction,
                 'initial_stop_loss': initial_stop_loss,
                 'current_stop_loss': initial_stop_loss,
@@ -150,4 +224,446 @@ def run_backtest(df_with_signals, epic, initial_balance, risk_per_trade_percent=
                 'units': units_to_trade
             }
 
-    return all_trades
+
+def _candle_arrays(df, signals):
+    if not signals.index.equals(df.index):
+        raise ValueError("The signals must share the data's index.")
+    return (df['high'].to_numpy(), df['low'].to_numpy(), df['close'].to_numpy(), df['ATRr_14'].to_numpy(),
+            signals['signal'].to_numpy(), signals['stop_loss_price'].to_numpy())
+
+
+def _candle_columns(df, signals):
+    return zip(*_candle_arrays(df, signals))
+
+
+def _exit_indexes(high, low, atr, trailing_stop_atr_multiplier):
+    """TouchIndexes over the levels that can close a trade or move its trailing stop."""
+    return {
+        'high': TouchIndex(high), 'low': TouchIndex(low),
+        'long_trail': TouchIndex(high - (atr * trailing_stop_atr_multiplier)),
+        'short_trail': TouchIndex(low + (atr * trailing_stop_atr_multiplier)),
+    }
+
+
+def _next_trade_event(trade, start, indexes):
+    """
+    The first candle from `start` on where the open trade can exit or its trailing stop can move
+    (the number of candles if there is none). `Position.update` leaves the trade unchanged on the
+    candles before it, and ignores their signals, so they can be skipped.
+    """
+    stop_loss, take_profit = trade['current_stop_loss'], trade['take_profit']
+    high, low = indexes['high'], indexes['low']
+    if start >= len(high.values):
+        return start
+    if trade['direction'] == 'LONG':
+        trail = indexes['long_trail']
+        # Stepping is cheaper than searching while the stop trails on every candle
+        if high.values[start] >= take_profit or low.values[start] <= stop_loss or trail.values[start] > stop_loss:
+            return start
+        # The stop moving is usually the nearest event, and it bounds the other two searches
+        event = first_of(trail.first_at_or_above(start, np.nextafter(stop_loss, np.inf)), len(high.values))
+        event = first_of(high.first_at_or_above(start, take_profit, event), event)
+        event = first_of(low.first_at_or_below(start, stop_loss, event), event)
+    else:
+        trail = indexes['short_trail']
+        if low.values[start] <= take_profit or high.values[start] >= stop_loss or trail.values[start] < stop_loss:
+            return start
+        event = first_of(trail.first_at_or_below(start, np.nextafter(stop_loss, -np.inf)), len(high.values))
+        event = first_of(low.first_at_or_below(start, take_profit, event), event)
+        event = first_of(high.first_at_or_above(start, stop_loss, event), event)
+    return event
+
+
+def _event_arrays(timestamps, events):
+    """
+    Dense 'signal' and 'stop_loss_price' arrays over `timestamps` from sparse events (see
+    `BaseStrategy.signal_events`). Events on candles that are not in `timestamps` are dropped.
+    """
+    bars = timestamps.get_indexer(events.index)
+    kept = bars >= 0
+    signal = np.zeros(len(timestamps), dtype=events['signal'].dtype)
+    stop_loss_price = np.zeros(len(timestamps))
+    signal[bars[kept]] = events['signal'].to_numpy()[kept]
+    stop_loss_price[bars[kept]] = events['stop_loss_price'].to_numpy(dtype=float)[kept]
+    return pd.DataFrame({'signal': signal, 'stop_loss_price': stop_loss_price}, index=timestamps)
+
+
+def _replay(position, timestamps, candles, start, stop, indexes, records, offset=0, synced=None, signal_bars=None):
+    """
+    Steps `position` over candles[start:stop], skipping the candles inside a trade where nothing can
+    happen. With `signal_bars` (the sorted positions of the non-zero signals), the candles between
+    signals are skipped too while flat. Every trade opened is appended to `records` as [entry bar,
+    exit bar or None, trade], with bars counted from `offset`. With `synced(bar)`, stops after the
+    first bar where it returns True and returns that bar; otherwise returns None.
+    """
+    high, low, close, atr, signal, stop_loss_price = candles
+    i = start
+    while True:
+        if position.trade is None and signal_bars is not None:
+            # A flat position only changes on a signal candle
+            next_signal = np.searchsorted(signal_bars, i)
+            i = signal_bars[next_signal] if next_signal < len(signal_bars) else stop
+        if i >= stop:
+            break
+        trade, closed_trades = position.trade, len(position.trades)
+        position.update(timestamps[i], high[i], low[i], close[i], atr[i], signal[i], stop_loss_price[i])
+        if len(position.trades) > closed_trades:
+            records[-1][1] = offset + i
+        if position.trade is not None and position.trade is not trade:
+            records.append([offset + i, None, position.trade])
+        if synced is not None and synced(offset + i):
+            return offset + i
+        i += 1
+        if position.trade is not None:
+            i = min(_next_trade_event(position.trade, i, indexes), stop)
+    return None
+
+
+def _intrabar_resolver(df, intrabar_df):
+    if intrabar_df is None:
+        return None
+    # Candles are labelled by their open time; the smallest gap between them is the bar length
+    gaps = np.diff(df.index.asi8)
+    bar_duration = gaps[gaps > 0].min() if (gaps > 0).any() else 0
+    return IntrabarResolver(intrabar_df, bar_duration)
+
+
+def _print_intrabar_summary(intrabar):
+    if intrabar is not None:
+        print(f"Intrabar data settled {intrabar.resolved_bars} of {intrabar.ambiguous_bars} candles "
+              f"that reached both the take profit and the stop loss.")
+
+
+def _signal_candles(timestamps, candles, stop):
+    """The timestamps, signals and stop losses of the signal candles before `stop`."""
+    bars = np.flatnonzero(candles[4][:stop])
+    return timestamps.asi8[bars], candles[4][bars], candles[5][bars]
+
+
+def _load_checkpoint(filepath, params, timestamps, candles):
+    """
+    The Position state saved by an earlier `run_backtest` and the candle to resume from, or (None, 0)
+    when there is no checkpoint or it was made with other parameters, candles or signals.
+    Indicators and signals only look back, so candles appended to the data leave the earlier ones unchanged.
+    """
+    if filepath is None or not os.path.exists(filepath):
+        return None, 0
+    with open(filepath, 'rb') as f:
+        checkpoint = pickle.load(f)
+    last = timestamps.searchsorted(checkpoint['last_timestamp'])
+    if checkpoint['params'] != params:
+        print("Checkpoint was made with different parameters. Replaying the full history.")
+    elif (last == len(timestamps) or timestamps[last] != checkpoint['last_timestamp']
+          or candles[2][last] != checkpoint['last_close']):
+        print("Checkpoint does not match the data. Replaying the full history.")
+    elif not all(np.array_equal(a, b) for a, b in zip(_signal_candles(timestamps, candles, last + 1),
+                                                      checkpoint['signal_candles'])):
+        print("Checkpoint was made with other signals. Replaying the full history.")
+    else:
+        state = checkpoint['position']
+        print(f"Resuming from checkpoint at {checkpoint['last_timestamp']} ({len(state['trades'])} trades so far).")
+        return state, last + 1
+    return None, 0
+
+
+def _save_checkpoint(filepath, params, position, timestamps, candles):
+    """Saves the Position state after the last candle, with what `_load_checkpoint` checks before resuming."""
+    with open(filepath, 'wb') as f:
+        pickle.dump({'params': params, 'last_timestamp': timestamps[-1], 'last_close': candles[2][-1],
+                     'signal_candles': _signal_candles(timestamps, candles, len(timestamps)),
+                     'position': {'balance': position.balance, 'trade': position.trade, 'trades': position.trades}},
+                    f)
+    print(f"Saved backtest checkpoint at {timestamps[-1]} to {filepath}")
+
+
+def run_backtest(df_with_signals, epic, initial_balance, risk_per_trade_percent=2.0, risk_reward_ratio=1.5,
+                 trailing_stop_atr_multiplier=2.5, signals=None, intrabar_df=None, events=None, checkpoint=None):
+    """
+    Backtesting engine with risk-based position sizing.
+
+    `signals` is the output of `strategy.generate_signals()` for the same rows as `df_with_signals`;
+    a ValueError is raised when its index differs.
+    When it is None, the 'signal' and 'stop_loss_price' columns of `df_with_signals` are used.
+    Candles are read column by column, so the data is never joined or copied.
+
+    `events` is the sparse alternative to `signals`: the output of `strategy.signal_events()`, with
+    one row per signal candle, matched to `df_with_signals` by timestamp. Events on candles that are
+    not in `df_with_signals` (e.g. in the indicator warm-up) are ignored.
+
+    `intrabar_df` is optional lower-timeframe data (e.g. 1m candles) for the same epic. Candles
+    that reach both exit levels are then settled by whichever the 1m bars reached first,
+    instead of always taking the take profit.
+
+    While a trade is open, the candles on which it cannot exit and its stop cannot move are skipped
+    with first-touch searches (see `TouchIndex`), so a long trade costs O(log n) instead of its length.
+    While flat, the simulation jumps from one signal candle to the next, so the number of candles it
+    visits grows with the signals and trades rather than with the data.
+
+    `checkpoint` is the path of a checkpoint file. The balance, open trade and trades after the last
+    candle are saved to it, and a later run with the same parameters, over the same candles plus newly
+    appended ones, resumes from it and only simulates the new candles. The trades are the same as a
+    full run's; pass the full data and signals, as the signal candles already seen are checked.
+    """
+    if events is not None:
+        signals = _event_arrays(df_with_signals.index, events)
+    elif signals is None:
+        signals = df_with_signals
+    intrabar = _intrabar_resolver(df_with_signals, intrabar_df)
+    position = Position(epic, initial_balance, risk_per_trade_percent, risk_reward_ratio,
+                        trailing_stop_atr_multiplier, intrabar)
+    candles = _candle_arrays(df_with_signals, signals)
+    params = {'epic': epic, 'initial_balance': initial_balance, 'risk_per_trade_percent': risk_per_trade_percent,
+              'risk_reward_ratio': risk_reward_ratio, 'trailing_stop_atr_multiplier': trailing_stop_atr_multiplier,
+              'intrabar': intrabar_df is not None}
+    state, start = _load_checkpoint(checkpoint, params, df_with_signals.index, candles)
+    if state is not None:
+        position.balance, position.trade, position.trades = state['balance'], state['trade'], state['trades']
+    indexes = _exit_indexes(candles[0], candles[1], candles[3], trailing_stop_atr_multiplier)
+    # A trade carried over from the checkpoint needs a record for its exit to be written to
+    records = [[None, None, position.trade]] if position.trade is not None else []
+    _replay(position, df_with_signals.index, candles, start, len(df_with_signals), indexes, records,
+            signal_bars=np.flatnonzero(candles[4]))
+    _print_intrabar_summary(intrabar)
+    if checkpoint is not None and len(df_with_signals):
+        _save_checkpoint(checkpoint, params, position, df_with_signals.index, candles)
+    return position.trades
+
+
+def run_multi_backtest(df, epic, initial_balance, strategies, intrabar_df=None):
+    """
+    Backtests several strategies over one shared dataset in a single pass over the candles.
+
+    `strategies` is a list of `(strategy, risk_params)` pairs, where every strategy was created on `df`
+    and `risk_params` holds `run_backtest`'s risk keyword arguments for it. The union of the indicator
+    columns they read is calculated once. Each strategy only trades the rows where its own columns are
+    complete, as if it had been run on its own, and returns its own trade ledger, in the given order.
+    `intrabar_df` settles candles that reach both exit levels, as in `run_backtest`.
+    """
+    for strategy, _ in strategies:
+        if strategy.df is not df:
+            raise ValueError(f"{strategy.__class__.__name__} was not created on the shared DataFrame.")
+
+    columns = ['ATRr_14']  # the trailing stop reads it for every strategy
+    for strategy, _ in strategies:
+        columns += [c for c in strategy.required_indicators() if c not in columns]
+    calculate_indicators(df, columns=columns)
+
+    timestamps = df.index
+    intrabar = _intrabar_resolver(df, intrabar_df)
+    runs = []
+    for strategy, risk_params in strategies:
+        signals = strategy.generate_signals()
+        own_columns = ['open', 'high', 'low', 'close', 'ATRr_14'] + strategy.required_indicators()
+        tradable = _complete_mask(df, own_columns)
+        runs.append((Position(epic, initial_balance, **risk_params, intrabar=intrabar), tradable,
+                     _candle_columns(df, signals)))
+
+    print(f"\n--- Backtesting {len(runs)} strategies in one pass over {len(df)} candles ---")
+    for i, timestamp in enumerate(timestamps):
+        for position, tradable, candles in runs:
+            candle = next(candles)
+            if tradable[i]:
+                position.update(timestamp, *candle)
+    _print_intrabar_summary(intrabar)
+    return [position.trades for position, _, _ in runs]
+
+
+BATCH_PARAMS = {'risk_per_trade_percent': 2.0, 'risk_reward_ratio': 1.5, 'trailing_stop_atr_multiplier': 2.5}
+
+
+def run_backtest_batch(df_with_signals, epic, initial_balance, param_grid, signals=None):
+    """
+    Runs `run_backtest` for every combination in `param_grid` at once, e.g.
+    {'risk_reward_ratio': [1, 1.5, 2], 'trailing_stop_atr_multiplier': [2, 3, 999], 'atr_multiplier': [1, 2]}.
+
+    Keys missing from the grid take `run_backtest`'s defaults. With 'atr_multiplier' the initial stop of every
+    signal is recalculated the way MaCrossStrategy sets it (the signal candle's low minus, or high plus,
+    ATRr_14 times the multiplier); without it the signals' 'stop_loss_price' is used.
+
+    The K combinations are held as length-K arrays and advanced together bar by bar, and bars where
+    nobody is in a trade and there is no signal are skipped. Trades are the same as K separate
+    `run_backtest` calls but are not printed. Returns a DataFrame with one row per combination and
+    its results, and the trade lists in the same order.
+    """
+    if signals is None:
+        signals = df_with_signals
+    unknown = set(param_grid) - set(BATCH_PARAMS) - {'atr_multiplier'}
+    if unknown:
+        raise ValueError(f"Unknown batch parameters: {', '.join(sorted(unknown))}")
+    names = list(BATCH_PARAMS) + (['atr_multiplier'] if 'atr_multiplier' in param_grid else [])
+    grid = pd.MultiIndex.from_product([param_grid.get(name, [BATCH_PARAMS.get(name)]) for name in names],
+                                      names=names).to_frame(index=False)
+    k = len(grid)
+    risk_percent, risk_reward, trailing = (grid[name].to_numpy(dtype=float) for name in BATCH_PARAMS)
+
+    timestamps = df_with_signals.index
+    high, low, close, atr = (df_with_signals[c].to_numpy(dtype=float) for c in ('high', 'low', 'close', 'ATRr_14'))
+    signal = signals['signal'].to_numpy()
+    signal_stop = signals['stop_loss_price'].to_numpy(dtype=float)
+    signal_bars = np.flatnonzero(signal != 0)
+
+    in_trade = np.zeros(k, dtype=bool)
+    direction = np.zeros(k)
+    entry_price, initial_stop, current_stop = np.zeros(k), np.zeros(k), np.zeros(k)
+    take_profit, units, entry_bar = np.zeros(k), np.zeros(k), np.zeros(k, dtype=np.int64)
+    balance = np.full(k, float(initial_balance))
+    trades = [[] for _ in range(k)]
+
+    i = signal_bars[0] if len(signal_bars) else len(df_with_signals)
+    while i < len(df_with_signals):
+        if in_trade.any():
+            is_long, is_short = in_trade & (direction == 1), in_trade & (direction == -1)
+            # Trail the stop the way max()/min() do in Position.update
+            long_trail = high[i] - (atr[i] * trailing)
+            short_trail = low[i] + (atr[i] * trailing)
+            current_stop = np.where(is_long & (long_trail > current_stop), long_trail, current_stop)
+            current_stop = np.where(is_short & (short_trail < current_stop), short_trail, current_stop)
+
+            hit_target = (is_long & (high[i] >= take_profit)) | (is_short & (low[i] <= take_profit))
+            hit_stop = ~hit_target & ((is_long & (low[i] <= current_stop)) | (is_short & (high[i] >= current_stop)))
+            exit_price = np.where(hit_target, take_profit, current_stop)
+            closed = (hit_target | hit_stop) & (exit_price > 0)
+            if closed.any():
+                pnl = np.where(direction == 1, exit_price - entry_price, entry_price - exit_price) * units
+                balance = np.where(closed, balance + pnl, balance)
+                for c in np.flatnonzero(closed):
+                    e = entry_bar[c]
+                    trades[c].append({
+                        'epic': epic, 'date': timestamps[e].date(), 'entry_time': timestamps[e],
+                        'entry_price': entry_price[c], 'direction': 'LONG' if direction[c] == 1 else 'SHORT',
+                        'initial_stop_loss': initial_stop[c], 'current_stop_loss': current_stop[c],
+                        'take_profit': take_profit[c], 'units': units[c],
+                        'exit_time': timestamps[i], 'exit_price': exit_price[c], 'pnl': pnl[c]
+                    })
+                in_trade &= ~closed
+
+        if signal[i] != 0:
+            if 'atr_multiplier' in grid:
+                distance = atr[i] * grid['atr_multiplier'].to_numpy(dtype=float)
+                stop = low[i] - distance if signal[i] == 1 else high[i] + distance
+            else:
+                stop = np.full(k, signal_stop[i])
+            risk_per_unit = np.abs(close[i] - stop)
+            opening = ~in_trade & (risk_per_unit != 0)
+            side = 1.0 if signal[i] == 1 else -1.0
+            take_profit_distance = risk_per_unit * risk_reward
+            with np.errstate(divide='ignore', invalid='ignore'):
+                new_units = balance * (risk_percent / 100.0) / risk_per_unit
+            in_trade |= opening
+            direction = np.where(opening, side, direction)
+            entry_price = np.where(opening, close[i], entry_price)
+            initial_stop = np.where(opening, stop, initial_stop)
+            current_stop = np.where(opening, stop, current_stop)
+            take_profit = np.where(opening, close[i] + side * take_profit_distance, take_profit)
+            units = np.where(opening, new_units, units)
+            entry_bar = np.where(opening, i, entry_bar)
+
+        if in_trade.any():
+            i += 1
+        else:
+            # Nobody is in a trade: jump to the next signal
+            next_signal = np.searchsorted(signal_bars, i, side='right')
+            i = signal_bars[next_signal] if next_signal < len(signal_bars) else len(df_with_signals)
+
+    results = []
+    for ledger, final_balance in zip(trades, balance):
+        pnl = np.array([t['pnl'] for t in ledger])
+        results.append({'trades': len(ledger), 'win_rate': (pnl > 0).mean() * 100 if len(ledger) else 0.0,
+                        'net_pnl': pnl.sum(), 'final_balance': final_balance})
+    return grid.join(pd.DataFrame(results)), trades
+
+
+def _simulate_shard(args):
+    """Worker task: replays one shard (with its warm-up candles) from a flat position and returns its records."""
+    epic, initial_balance, risk_params, timestamps, candles, offset = args
+    position = Position(epic, initial_balance, verbose=False, **risk_params)
+    indexes = _exit_indexes(candles[0], candles[1], candles[3], risk_params['trailing_stop_atr_multiplier'])
+    records = []
+    _replay(position, timestamps, candles, 0, len(timestamps), indexes, records, offset,
+            signal_bars=np.flatnonzero(candles[4]))
+    return records
+
+
+def _open_entry(records, entry_bars, bar):
+    """The entry bar of the trade open after `bar` in a list of records, or None when flat."""
+    latest = bisect_right(entry_bars, bar) - 1
+    if latest >= 0 and (records[latest][1] is None or records[latest][1] > bar):
+        return records[latest][0]
+    return None
+
+
+def run_backtest_sharded(df_with_signals, epic, initial_balance, risk_per_trade_percent=2.0, risk_reward_ratio=1.5,
+                         trailing_stop_atr_multiplier=2.5, signals=None, shard='W', warmup_bars=500, processes=None):
+    """
+    `run_backtest` split into time shards (`shard` is 'D', 'W' or a length such as '12h') that run in
+    parallel in a process pool. Returns the same trades as the serial run, without printing them.
+
+    When a trade opens and closes does not depend on the balance, only its units and P&L do. So each
+    shard is replayed on its own from a flat position, starting `warmup_bars` candles early so it has
+    usually fallen into step with the real run by its first candle. The shards are then stitched in
+    order. Where the position carried over a boundary differs from the shard's own, the candles are
+    re-simulated from the boundary until both runs hold the same position, and the shard's trades are
+    adopted from there. Units and P&L are finally recalculated from the running balance.
+    """
+    if signals is None:
+        signals = df_with_signals
+    risk_params = {'risk_per_trade_percent': risk_per_trade_percent, 'risk_reward_ratio': risk_reward_ratio,
+                   'trailing_stop_atr_multiplier': trailing_stop_atr_multiplier}
+    timestamps = df_with_signals.index
+    candles = _candle_arrays(df_with_signals, signals)
+    periods = indicators.period_segments(timestamps, shard)
+    starts = np.flatnonzero(np.r_[True, periods[1:] != periods[:-1]]) if len(periods) else np.array([], dtype=int)
+    ends = np.r_[starts[1:], len(timestamps)]
+    tasks = []
+    for start, end in zip(starts, ends):
+        first = max(start - warmup_bars, 0)
+        tasks.append((epic, initial_balance, risk_params, timestamps[first:end],
+                      tuple(column[first:end] for column in candles), first))
+    print(f"Backtesting {len(tasks)} shards of {len(timestamps)} candles...")
+    if processes == 1:
+        shard_records = list(map(_simulate_shard, tasks))
+    else:
+        with ProcessPoolExecutor(max_workers=processes) as pool:
+            shard_records = list(pool.map(_simulate_shard, tasks))
+
+    # --- Stitch: the records of the real run, shard by shard ---
+    indexes = _exit_indexes(candles[0], candles[1], candles[3], trailing_stop_atr_multiplier)
+    records = []
+    resimulated_candles = 0
+    for start, end, own_records in zip(starts, ends, shard_records):
+        own_entries = [record[0] for record in own_records]
+
+        def synced(bar):
+            real_entry = records[-1][0] if records and records[-1][1] is None else None
+            return real_entry == _open_entry(own_records, own_entries, bar)
+
+        synced_bar = start - 1
+        if not synced(synced_bar):
+            # Re-simulate from the real position until the shard's own run holds the same one
+            position = Position(epic, initial_balance, verbose=False, **risk_params)
+            position.trade = records[-1][2] if records and records[-1][1] is None else None
+            synced_bar = _replay(position, timestamps, candles, start, end, indexes, records, synced=synced)
+            resimulated_candles += (end if synced_bar is None else synced_bar + 1) - start
+            if synced_bar is None:
+                continue
+        # Both runs agree from here on; the shard's record of a trade they share has its exit
+        shared_entry = _open_entry(own_records, own_entries, synced_bar)
+        if shared_entry is not None:
+            records.pop()
+        records += [record for record in own_records if record[0] > synced_bar or record[0] == shared_entry]
+
+    trades = []
+    balance = initial_balance
+    for _, exit_bar, trade in records:
+        if exit_bar is None:
+            continue
+        # The sizing and P&L of Position.update, with the real balance
+        units = balance * (risk_per_trade_percent / 100.0) / abs(trade['entry_price'] - trade['initial_stop_loss'])
+        price_change = (trade['exit_price'] - trade['entry_price']) if trade['direction'] == 'LONG' else (
+                trade['entry_price'] - trade['exit_price'])
+        pnl = price_change * units
+        balance += pnl
+        trades.append({**trade, 'units': units, 'pnl': pnl})
+    print(f"Sharded backtest complete: {len(trades)} trades, {resimulated_candles} candles re-simulated at "
+          f"shard boundaries. Final balance: £{balance:,.2f}")
+    return trades
@@ -0,0 +1,145 @@
+# data_quality.py
+import os
+
+import numpy as np
+import pandas as pd
+
+REQUIRED_COLUMNS = ['open', 'high', 'low', 'close', 'volume']
+PRICE_COLUMNS = ['open', 'high', 'low', 'close']
+REPORT_COLUMNS = ['issue', 'start', 'end', 'bars']
+
+
+def _index_as_ns(index):
+    """Returns a DatetimeIndex as int64 nanoseconds, whatever unit it was parsed with."""
+    return pd.DatetimeIndex(index).as_unit('ns').asi8
+
+
+def _flag_ranges(issue, mask, index):
+    """Groups consecutive flagged rows into (issue, start, end, bars) records."""
+    if not mask.any():
+        return []
+    padded = np.concatenate(([False], mask, [False]))
+    edges = np.flatnonzero(padded[1:] != padded[:-1])
+    starts, ends = edges[0::2], edges[1::2] - 1
+    return [
+        {'issue': issue, 'start': index[s], 'end': index[e], 'bars': int(e - s + 1)}
+        for s, e in zip(starts, ends)
+    ]
+
+
+def infer_bar_interval(df):
+    """Infers the bar interval as the median positive spacing between timestamps."""
+    if len(df) < 2:
+        return None
+    diffs = np.diff(_index_as_ns(df.index))
+    diffs = diffs[diffs > 0]
+    if len(diffs) == 0:
+        return None
+    return pd.Timedelta(int(np.median(diffs)), unit='ns')
+
+
+def scan_data_quality(df, bar_interval=None, spike_threshold=12.0):
+    """
+    Scans a candle DataFrame for data-quality problems in a single vectorized pass.
+
+    Detects missing columns, NaNs, non-positive prices, duplicate and out-of-order
+    timestamps, gaps, zero-range bars, inconsistent OHLC values, zero volume and
+    close-to-close spikes (measured in robust standard deviations of the returns).
+
+    Returns a DataFrame with one row per anomaly: issue, start, end and bar count.
+    For gaps, start/end are the bars either side and 'bars' is the missing bar count.
+    """
+    records = []
+    if df.empty:
+        return pd.DataFrame(records, columns=REPORT_COLUMNS)
+
+    index = df.index
+    first, last = index[0], index[-1]
+    for col in REQUIRED_COLUMNS:
+        if col not in df.columns:
+            records.append({'issue': f'missing_column:{col}', 'start': first, 'end': last, 'bars': len(df)})
+
+    present = [c for c in REQUIRED_COLUMNS if c in df.columns]
+    values = {c: df[c].to_numpy(dtype=float) for c in present}
+
+    # --- Per-row value checks ---
+    for col in present:
+        records += _flag_ranges(f'nan:{col}', np.isnan(values[col]), index)
+    for col in [c for c in PRICE_COLUMNS if c in values]:
+        records += _flag_ranges(f'non_positive:{col}', values[col] <= 0, index)
+
+    if all(c in values for c in PRICE_COLUMNS):
+        o, h, l, c = (values[col] for col in PRICE_COLUMNS)
+        records += _flag_ranges('zero_range', h == l, index)
+        invalid = (h < l) | (h < np.maximum(o, c)) | (l > np.minimum(o, c))
+        records += _flag_ranges('invalid_ohlc', invalid, index)
+
+    if 'volume' in values:
+        records += _flag_ranges('zero_volume', values['volume'] == 0, index)
+
+    # --- Timestamp checks ---
+    ts = _index_as_ns(index)
+    diffs = np.diff(ts)
+    records += _flag_ranges('duplicate_timestamp', np.asarray(index.duplicated(keep='first')), index)
+    records += _flag_ranges('out_of_order', np.concatenate(([False], diffs < 0)), index)
+
+    interval = bar_interval if bar_interval is not None else infer_bar_interval(df)
+    if interval is not None:
+        step = pd.Timedelta(interval).value
+        gap_positions = np.flatnonzero(diffs > step)
+        records += [
+            {'issue': 'gap', 'start': index[i], 'end': index[i + 1], 'bars': int(diffs[i] // step - 1)}
+            for i in gap_positions
+        ]
+
+    # --- Spike check on close-to-close log returns ---
+    if 'close' in values and len(df) > 2:
+        with np.errstate(divide='ignore', invalid='ignore'):
+            returns = np.diff(np.log(values['close']))
+        finite = np.isfinite(returns)
+        if finite.any():
+            median = np.median(returns[finite])
+            scale = 1.4826 * np.median(np.abs(returns[finite] - median))
+            if scale > 0:
+                spikes = finite & (np.abs(returns - median) > spike_threshold * scale)
+                records += _flag_ranges('spike', np.concatenate(([False], spikes)), index)
+
+    report = pd.DataFrame(records, columns=REPORT_COLUMNS)
+    return report.sort_values(['start', 'issue'], kind='stable').reset_index(drop=True)
+
+
+def summarise_report(report):
+    """Returns the anomaly count, affected bars and covered time range per issue type."""
+    if report.empty:
+        return pd.DataFrame(columns=['occurrences', 'bars', 'first_seen', 'last_seen'])
+    return report.groupby('issue').agg(
+        occurrences=('bars', 'size'),
+        bars=('bars', 'sum'),
+        first_seen=('start', 'min'),
+        last_seen=('end', 'max'),
+    )
+
+
+def scan_data_directory(directory='data', bar_interval=None, spike_threshold=12.0):
+    """Scans every cached CSV dataset in a directory and returns one combined report."""
+    reports = []
+    for file_name in sorted(os.listdir(directory)):
+        if not file_name.endswith('.csv'):
+            continue
+        df = pd.read_csv(os.path.join(directory, file_name), index_col='datetime', parse_dates=True)
+        report = scan_data_quality(df, bar_interval=bar_interval, spike_threshold=spike_threshold)
+        report.insert(0, 'dataset', file_name)
+        reports.append(report)
+    if not reports:
+        return pd.DataFrame(columns=['dataset'] + REPORT_COLUMNS)
+    return pd.concat(reports, ignore_index=True)
+
+
+def print_data_quality_report(report, name='dataset'):
+    """Prints a per-issue summary of a data-quality report to the console."""
+    if report.empty:
+        print(f"Data quality check passed for {name}: no anomalies found.")
+        return
+    print(f"\n--- Data Quality Report: {name} ---")
+    print(summarise_report(report).to_string())
+    print("------------------------------------\n")
@@ -1,9 +1,60 @@
 # filters.py
+import weakref
+from datetime import time
+
+import numpy as np
 import pandas as pd
 
+from modular_bot.indicators import rolling_quantile
+
+# Packed filter masks per DataFrame: {id(df): {filter cache key: (fingerprint, packed bits)}}.
+# A DataFrame's entry is dropped when it is garbage collected.
+_mask_cache = {}
+_PRICE_COLUMNS = ['open', 'high', 'low', 'close']
+
+
+def _masks_for(df):
+    key = id(df)
+    if key not in _mask_cache:
+        _mask_cache[key] = {}
+        weakref.finalize(df, _mask_cache.pop, key, None)
+    return _mask_cache[key]
+
+
+def _fingerprint(df, columns):
+    """
+    A cheap identity of the data a mask reads: the length, the last timestamp, the index object and
+    its buffer, and the buffers of the columns. Appending rows, replacing the index or assigning a new
+    column changes it; editing values inside an existing buffer does not.
+    """
+    index = (id(df.index), np.asarray(df.index).__array_interface__['data'][0])
+    buffers = tuple((c, df[c].to_numpy().__array_interface__['data'][0]) for c in columns if c in df.columns)
+    return len(df), df.index[-1] if len(df) else None, index, buffers
+
+
+def clear_mask_cache():
+    """Forgets every cached mask, e.g. after changing values inside a DataFrame's columns in place."""
+    _mask_cache.clear()
+
+
+def pack_mask(passes) -> np.ndarray:
+    """Packs a boolean array into bits (8 bars per byte) so masks combine with bitwise operations."""
+    return np.packbits(np.asarray(passes, dtype=bool))
+
+
+def unpack_mask(packed: np.ndarray, length: int) -> np.ndarray:
+    return np.unpackbits(packed, count=length).astype(bool)
+
 
 class BaseFilter:
-    """A blueprint for all filter modules."""
+    """
+    A blueprint for all filter modules.
+
+    Filters combine with `&`, `|` and `~` into AndFilter, OrFilter and NotFilter. `mask(df)`
+    caches each filter's result as packed bits keyed by its parameters and the DataFrame,
+    so a parameter sweep only computes the masks whose parameters changed. A cached mask is
+    recomputed when the DataFrame grows or a column the filter reads is replaced.
+    """
 
     def apply(self, df: pd.DataFrame) -> pd.Series:
         """
@@ -13,21 +64,160 @@ class BaseFilter:
         """
         raise NotImplementedError("You must implement the apply method!")
 
+    def required_indicators(self) -> list[str]:
+        """Returns the indicator columns the filter reads, e.g. ['ADX_14']."""
+        return []
+
     def get_params(self) -> dict:
         """Returns the filter's parameters as a dictionary."""
         raise NotImplementedError("You must implement the get_params method!")
 
+    def cache_key(self) -> tuple:
+        """Identifies the filter's mask: its class and parameters."""
+        params = self.get_params()
+        return (self.__class__.__name__,) + tuple(sorted((k, repr(v)) for k, v in params.items() if k != 'name'))
+
+    def mask(self, df: pd.DataFrame) -> np.ndarray:
+        """Returns the filter's result as packed bits, computed once per parameters and DataFrame."""
+        masks = _masks_for(df)
+        key = self.cache_key()
+        fingerprint = _fingerprint(df, _PRICE_COLUMNS + self.required_indicators())
+        if key not in masks or masks[key][0] != fingerprint:
+            masks[key] = (fingerprint, self._compute_mask(df))
+        return masks[key][1]
+
+    def _compute_mask(self, df: pd.DataFrame) -> np.ndarray:
+        return pack_mask(self.apply(df))
+
+    def __and__(self, other):
+        return AndFilter(self, other)
+
+    def __or__(self, other):
+        return OrFilter(self, other)
+
+    def __invert__(self):
+        return NotFilter(self)
+
+    def __repr__(self):
+        params = ", ".join(f"{k}={v}" for k, v in self.get_params().items() if k != 'name')
+        return f"{self.__class__.__name__}({params})"
+
+
+class _CombinedFilter(BaseFilter):
+    """Base for filters computed from other filters' packed masks."""
+
+    def apply(self, df: pd.DataFrame) -> pd.Series:
+        return pd.Series(unpack_mask(self.mask(df), len(df)), index=df.index)
+
+    def get_params(self) -> dict:
+        return {'name': self.__class__.__name__, 'expression': repr(self)}
+
+
+class AndFilter(_CombinedFilter):
+    """Passes where every filter passes. Stops evaluating filters once the result is all False."""
+
+    def __init__(self, *filters: BaseFilter):
+        # Nested ANDs are flattened so a & b & c is a single short-circuiting pass
+        self.filters = []
+        for f in filters:
+            self.filters.extend(f.filters if isinstance(f, AndFilter) else [f])
+
+    def cache_key(self) -> tuple:
+        return ('AndFilter',) + tuple(f.cache_key() for f in self.filters)
+
+    def _compute_mask(self, df: pd.DataFrame) -> np.ndarray:
+        result = pack_mask(np.ones(len(df), dtype=bool))
+        for f in self.filters:
+            result = result & f.mask(df)
+            if not result.any():
+                break
+        return result
+
+    def required_indicators(self) -> list[str]:
+        return list(dict.fromkeys(c for f in self.filters for c in f.required_indicators()))
+
+    def __repr__(self):
+        return "(" + " & ".join(repr(f) for f in self.filters) + ")"
+
+
+class OrFilter(_CombinedFilter):
+    """Passes where any filter passes. Stops evaluating filters once the result is all True."""
+
+    def __init__(self, *filters: BaseFilter):
+        self.filters = []
+        for f in filters:
+            self.filters.extend(f.filters if isinstance(f, OrFilter) else [f])
+
+    def cache_key(self) -> tuple:
+        return ('OrFilter',) + tuple(f.cache_key() for f in self.filters)
+
+    def _compute_mask(self, df: pd.DataFrame) -> np.ndarray:
+        all_true = pack_mask(np.ones(len(df), dtype=bool))
+        result = np.zeros_like(all_true)
+        for f in self.filters:
+            result = result | f.mask(df)
+            if np.array_equal(result, all_true):
+                break
+        return result
+
+    def required_indicators(self) -> list[str]:
+        return list(dict.fromkeys(c for f in self.filters for c in f.required_indicators()))
+
+    def __repr__(self):
+        return "(" + " | ".join(repr(f) for f in self.filters) + ")"
+
+
+class NotFilter(_CombinedFilter):
+    """Passes where the wrapped filter does not."""
+
+    def __init__(self, f: BaseFilter):
+        self.filter = f
+
+    def cache_key(self) -> tuple:
+        return ('NotFilter', self.filter.cache_key())
+
+    def _compute_mask(self, df: pd.DataFrame) -> np.ndarray:
+        result = ~self.filter.mask(df)
+        # Clear the padding bits after the last bar so all-False checks stay exact
+        if len(df) % 8:
+            result[-1] &= (0xFF << (8 - len(df) % 8)) & 0xFF
+        return result
+
+    def required_indicators(self) -> list[str]:
+        return self.filter.required_indicators()
+
+    def __repr__(self):
+        return f"~{self.filter!r}"
+
+
 class AdxFilter(BaseFilter):
     """
     A regime filter based on the Average Directional Index (ADX).
     It passes only when the market is considered to be trending.
+
+    The threshold is either fixed (`adx_threshold`) or adaptive: with `threshold_percentile`
+    set, ADX must be above that percentile of its own values over the previous
+    `percentile_window` bars, so the same filter suits SPY, J225 and GBPUSD.
     """
 
-    def __init__(self, adx_period: int = 14, adx_threshold: int = 25):
+    def __init__(self, adx_period: int = 14, adx_threshold: int = 25, threshold_percentile: float = None,
+                 percentile_window: int = 500):
+        if threshold_percentile is not None and not 0 <= threshold_percentile <= 100:
+            raise ValueError(f"threshold_percentile must be between 0 and 100, got {threshold_percentile}.")
         self.adx_period = adx_period
         self.adx_threshold = adx_threshold
+        self.threshold_percentile = threshold_percentile
+        self.percentile_window = percentile_window
         self.adx_col = f'ADX_{self.adx_period}'
 
+    def thresholds(self, df: pd.DataFrame) -> pd.Series:
+        """Returns the ADX threshold for every bar; NaN while the percentile window is warming up."""
+        if self.threshold_percentile is None:
+            return pd.Series(float(self.adx_threshold), index=df.index)
+        previous_adx = df[self.adx_col].shift(1)
+        return pd.Series(rolling_quantile(previous_adx, self.percentile_window, self.threshold_percentile / 100),
+                         index=df.index)
+
     def apply(self, df: pd.DataFrame) -> pd.Series:
         """
         Returns a boolean Series that is True wherever ADX is above the threshold.
@@ -35,14 +225,112 @@ class AdxFilter(BaseFilter):
         if self.adx_col not in df.columns:
             raise ValueError(f"ADX column '{self.adx_col}' not found in DataFrame. Ensure it's calculated first.")
 
-        print(f"Applying ADX Filter (ADX > {self.adx_threshold})...")
-        return df[self.adx_col] > self.adx_threshold
+        if self.threshold_percentile is None:
+            print(f"Applying ADX Filter (ADX > {self.adx_threshold})...")
+        else:
+            print(f"Applying ADX Filter (ADX > its {self.threshold_percentile}th percentile "
+                  f"over {self.percentile_window} bars)...")
+        return df[self.adx_col] > self.thresholds(df)
+
+    def required_indicators(self) -> list[str]:
+        return [self.adx_col]
 
     def get_params(self) -> dict:
         """Returns the filter's parameters for reporting."""
-        return {
+        params = {
             'name': self.__class__.__name__,
             'adx_period': self.adx_period,
             'adx_threshold': self.adx_threshold
         }
+        if self.threshold_percentile is not None:
+            params['threshold_percentile'] = self.threshold_percentile
+            params['percentile_window'] = self.percentile_window
+        return params
 
+
+class TimeOfDayFilter(BaseFilter):
+    """
+    Passes for bars whose timestamp (in the index's timezone) is within [start, end).
+    A window with start after end wraps past midnight, e.g. 22:00 to 02:00.
+    """
+
+    def __init__(self, start='08:00', end='16:30'):
+        self.start = start if isinstance(start, time) else time.fromisoformat(start)
+        self.end = end if isinstance(end, time) else time.fromisoformat(end)
+
+    def apply(self, df: pd.DataFrame) -> pd.Series:
+        seconds = df.index.hour * 3600 + df.index.minute * 60 + df.index.second
+        start = self.start.hour * 3600 + self.start.minute * 60 + self.start.second
+        end = self.end.hour * 3600 + self.end.minute * 60 + self.end.second
+        if start <= end:
+            passes = (seconds >= start) & (seconds < end)
+        else:
+            passes = (seconds >= start) | (seconds < end)
+        return pd.Series(passes, index=df.index)
+
+    def get_params(self) -> dict:
+        return {
+            'name': self.__class__.__name__,
+            'start': self.start.isoformat(),
+            'end': self.end.isoformat()
+        }
+
+
+class VolatilityFilter(BaseFilter):
+    """Passes when ATR as a percentage of the close is within [min_atr_percent, max_atr_percent]."""
+
+    def __init__(self, atr_period: int = 14, min_atr_percent: float = None, max_atr_percent: float = None):
+        self.atr_period = atr_period
+        self.min_atr_percent = min_atr_percent
+        self.max_atr_percent = max_atr_percent
+        self.atr_col = f'ATRr_{self.atr_period}'
+
+    def apply(self, df: pd.DataFrame) -> pd.Series:
+        if self.atr_col not in df.columns:
+            raise ValueError(f"ATR column '{self.atr_col}' not found in DataFrame. Ensure it's calculated first.")
+        atr_percent = df[self.atr_col] / df['close'] * 100
+        passes = atr_percent.notna()
+        if self.min_atr_percent is not None:
+            passes &= atr_percent >= self.min_atr_percent
+        if self.max_atr_percent is not None:
+            passes &= atr_percent <= self.max_atr_percent
+        return passes
+
+    def required_indicators(self) -> list[str]:
+        return [self.atr_col]
+
+    def get_params(self) -> dict:
+        return {
+            'name': self.__class__.__name__,
+            'atr_period': self.atr_period,
+            'min_atr_percent': self.min_atr_percent,
+            'max_atr_percent': self.max_atr_percent
+        }
+
+
+class TrendFilter(BaseFilter):
+    """Passes when the close is above (direction='up') or below (direction='down') its EMA."""
+
+    def __init__(self, ema_period: int = 200, direction: str = 'up'):
+        if direction not in ('up', 'down'):
+            raise ValueError(f"direction must be 'up' or 'down', got '{direction}'.")
+        self.ema_period = ema_period
+        self.direction = direction
+        self.ema_col = f'EMA_{self.ema_period}'
+
+    def apply(self, df: pd.DataFrame) -> pd.Series:
+        if self.ema_col not in df.columns:
+            raise ValueError(f"EMA column '{self.ema_col}' not found in DataFrame. Ensure it's calculated first.")
+        if self.direction == 'up':
+            return df['close'] > df[self.ema_col]
+        return df['close'] < df[self.ema_col]
+
+    def required_indicators(self) -> list[str]:
+        return [self.ema_col]
+
+    def get_params(self) -> dict:
+        return {
+            'name': self.__class__.__name__,
+            'ema_period': self.ema_period,
+            'direction': self.direction
+        }
@@ -0,0 +1,557 @@
+# indicators.py
+"""
+Fused NumPy indicator kernels used in place of pandas_ta and chained pandas operations.
+VWAPs (daily, weekly, session and event anchored) are grouped cumulative sums over the
+whole history.
+
+Every function takes array-likes (Series or ndarrays) and returns float64 ndarrays
+aligned with the input. Recursive smoothers (EMA, Wilder/RMA) are evaluated as a
+blocked linear recurrence, and rolling min/max combine doubling spans, so no step
+allocates per-bar Python objects.
+
+Two conventions are supported where they differ:
+- the backtester's own formulas (pandas `ewm(adjust=False)` seeded from the first bar), and
+- pandas_ta's (`ta_compatible=True`): RMA is `ewm(alpha=1/length, min_periods=length)`
+  with adjust=True, the first true range is NaN and directional movement must be positive.
+"""
+import datetime
+import math
+import re
+
+import numpy as np
+import pandas as pd
+
+# Largest growth allowed for decay**-k inside one block of the recurrence kernel
+_MAX_BLOCK_GROWTH = 1e6
+
+
+def _as_float_array(values):
+    return np.asarray(values, dtype=float)
+
+
+def _linear_recurrence(x, decay):
+    """
+    Computes y[t] = decay * y[t-1] + x[t] (with y[-1] = 0) along the last axis of a NaN-free
+    array. A 2-D input (one series per row) evaluates several series in one pass.
+
+    The series is cut into blocks short enough that decay**-k stays well conditioned. Each
+    block is solved with a scaled cumulative sum and then offset by the carry from earlier blocks.
+    """
+    n = x.shape[-1]
+    if n == 0 or decay == 0.0:
+        return x.astype(float)
+
+    block = max(1, min(n, int(math.log(_MAX_BLOCK_GROWTH) / -math.log(decay))))
+    blocks = -(-n // block)
+    y = np.zeros(x.shape[:-1] + (blocks * block,))
+    y[..., :n] = x
+    y = y.reshape(x.shape[:-1] + (blocks, block))
+
+    powers = decay ** np.arange(block + 1)
+    y /= powers[:block]
+    np.cumsum(y, axis=-1, out=y)
+    y *= powers[:block]
+
+    # Block j starts from carry[j] = sum over i < j of decay_block**(j-1-i) * end[i]. decay_block is
+    # at most 1/_MAX_BLOCK_GROWTH, so only the last few block ends are above float precision.
+    ends = y[..., -1]
+    decay_block = decay ** block
+    carries = np.zeros(ends.shape)
+    terms = min(blocks - 1, int(math.ceil(math.log(1e-18) / math.log(decay_block))) if decay_block > 0 else 1)
+    for lag in range(1, terms + 1):
+        carries[..., lag:] += decay_block ** (lag - 1) * ends[..., :-lag]
+    y += carries[..., None] * powers[1:]
+    return y.reshape(x.shape[:-1] + (blocks * block,))[..., :n]
+
+
+def _ewm_weight_sums(n, decay):
+    """Closed form of the adjust=True denominator, 1 + decay + ... + decay**t."""
+    limit = 1.0 / (1.0 - decay)
+    sums = np.full(n, limit)
+    # decay**(t+1) drops below float precision after a few hundred bars; only the start needs work
+    head = min(n, int(40 / -math.log(decay)) + 1) if decay > 0 else min(n, 1)
+    sums[:head] = (1.0 - decay ** np.arange(1, head + 1)) * limit
+    return sums
+
+
+def _leading_nan_count(x):
+    """Returns how many leading NaNs x has, or None if NaNs also appear after the first value."""
+    valid = ~np.isnan(x)
+    if not valid.any():
+        return len(x)
+    first = int(valid.argmax())
+    return first if valid[first:].all() else None
+
+
+def ewm_mean(values, alpha, adjust=False, min_periods=0):
+    """
+    Exponentially weighted mean matching `Series.ewm(alpha=alpha, adjust=adjust, min_periods=min_periods).mean()`.
+
+    A 2-D input (one series per row) smooths every row in one pass. Leading NaNs are skipped
+    like pandas does; series with NaNs after their first value fall back to pandas, so results
+    always match.
+    """
+    x = _as_float_array(values)
+    if x.ndim == 2:
+        starts = {_leading_nan_count(row) for row in x}
+        if len(starts) > 1 or None in starts:
+            return np.vstack([ewm_mean(row, alpha, adjust, min_periods) for row in x])
+        start = starts.pop()
+    else:
+        start = _leading_nan_count(x)
+        if start is None:
+            return pd.Series(x).ewm(alpha=alpha, adjust=adjust, min_periods=min_periods).mean().to_numpy()
+
+    out = np.full(x.shape, np.nan)
+    valid = x[..., start:]
+    if valid.shape[-1] == 0:
+        return out
+    decay = 1.0 - alpha
+    if adjust:
+        result = _linear_recurrence(valid, decay)
+        result /= _ewm_weight_sums(valid.shape[-1], decay)
+    else:
+        inputs = alpha * valid
+        inputs[..., 0] = valid[..., 0]
+        result = _linear_recurrence(inputs, decay)
+    if min_periods > 1:
+        result[..., :min_periods - 1] = np.nan
+    out[..., start:] = result
+    return out
+
+
+def ema(close, span):
+    """EMA matching `close.ewm(span=span, adjust=False).mean()`."""
+    return ewm_mean(close, 2.0 / (span + 1.0), adjust=False)
+
+
+def rma(values, length, ta_compatible=False):
+    """Wilder smoothing (RMA). The default matches the backtester; ta_compatible matches pandas_ta."""
+    if ta_compatible:
+        return ewm_mean(values, 1.0 / length, adjust=True, min_periods=length)
+    return ewm_mean(values, 1.0 / length, adjust=False)
+
+
+def sma(values, length):
+    """Simple moving average matching `Series.rolling(length).mean()` (NaN until the window is full)."""
+    x = _as_float_array(values)
+    out = np.full(len(x), np.nan)
+    if len(x) >= length:
+        windows = len(x) - length + 1
+        total = x[:windows].copy()
+        for offset in range(1, length):
+            total += x[offset:offset + windows]
+        out[length - 1:] = total / length
+    return out
+
+
+def _rolling_extreme(x, window, combine):
+    """
+    Rolling max/min over complete windows. The extremes of spans of 1, 2, 4, ... bars are built by
+    doubling, and two overlapping spans cover each window: log2(window) whole-array passes, which for
+    indicator-sized windows beats an O(n) algorithm that works on window-sized rows.
+    `combine` (np.maximum or np.minimum) propagates NaN, so a NaN anywhere in a window makes it NaN,
+    like pandas' rolling min/max.
+    """
+    n = len(x)
+    out = np.full(n, np.nan)
+    if n < window:
+        return out
+    span, extremes = 1, x
+    while span * 2 <= window:
+        # extremes[i] becomes the extreme of x[i:i + 2 * span]
+        extremes = combine(extremes[:-span], extremes[span:])
+        span *= 2
+    out[window - 1:] = combine(extremes[:n - window + 1], extremes[window - span:])
+    return out
+
+
+def rolling_max(values, window):
+    """Rolling maximum matching `Series.rolling(window).max()`."""
+    return _rolling_extreme(_as_float_array(values), window, np.maximum)
+
+
+def rolling_min(values, window):
+    """Rolling minimum matching `Series.rolling(window).min()`."""
+    return _rolling_extreme(_as_float_array(values), window, np.minimum)
+
+
+def rolling_quantile(values, window, quantile):
+    """
+    Rolling quantile matching `Series.rolling(window).quantile(quantile)` with linear interpolation.
+
+    pandas keeps each window in a skiplist (O(log window) per bar), so this never re-sorts a
+    window. `streaming.RollingQuantile` gives the same values one bar at a time.
+    """
+    return pd.Series(_as_float_array(values)).rolling(window).quantile(quantile).to_numpy()
+
+
+def true_range(high, low, close, ta_compatible=False):
+    """True range. The first bar is high - low, or NaN with ta_compatible (as in pandas_ta)."""
+    high, low, close = _as_float_array(high), _as_float_array(low), _as_float_array(close)
+    prev_close = np.concatenate(([np.nan], close[:-1]))
+    tr = np.fmax(high - low, np.fmax(np.abs(high - prev_close), np.abs(low - prev_close)))
+    if ta_compatible and len(tr):
+        tr[0] = np.nan
+    return tr
+
+
+def atr(high, low, close, length=14, ta_compatible=False, tr=None):
+    """Average true range: Wilder smoothing of the true range."""
+    if tr is None:
+        tr = true_range(high, low, close, ta_compatible=ta_compatible)
+    return rma(tr, length, ta_compatible=ta_compatible)
+
+
+def directional_movement(high, low, ta_compatible=False):
+    """Returns (+DM, -DM). pandas_ta also requires the winning move to be positive."""
+    high, low = _as_float_array(high), _as_float_array(low)
+    up = np.concatenate(([np.nan], high[1:] - high[:-1]))
+    down = np.concatenate(([np.nan], low[:-1] - low[1:]))
+    with np.errstate(invalid='ignore'):
+        plus_wins, minus_wins = up > down, down > up
+        if ta_compatible:
+            plus_wins &= up > 0
+            minus_wins &= down > 0
+    plus_dm, minus_dm = np.where(plus_wins, up, 0.0), np.where(minus_wins, down, 0.0)
+    if ta_compatible and len(plus_dm):
+        plus_dm[0] = minus_dm[0] = np.nan
+    return plus_dm, minus_dm
+
+
+def _adx_from_smoothed(atr_values, plus_smoothed, minus_smoothed, length, ta_compatible):
+    with np.errstate(divide='ignore', invalid='ignore'):
+        plus_di = 100 * plus_smoothed / atr_values
+        minus_di = 100 * minus_smoothed / atr_values
+        dx = 100 * np.abs(plus_di - minus_di) / (plus_di + minus_di)
+    dx[~np.isfinite(dx)] = np.nan
+    return rma(dx, length, ta_compatible)
+
+
+def adx(high, low, close, length=14, ta_compatible=False, atr_values=None):
+    """
+    Average directional index.
+
+    The default reproduces `backtester.calculate_indicators` (DI smoothed with the ATR's Wilder
+    smoothing); ta_compatible reproduces `pandas_ta.adx`. Pass atr_values to reuse an ATR
+    that has already been computed with the same convention and length.
+    """
+    plus_dm, minus_dm = directional_movement(high, low, ta_compatible=ta_compatible)
+    if atr_values is None:
+        tr = true_range(high, low, close, ta_compatible=ta_compatible)
+        # ATR and both DMs share one smoothing pass when they start on the same bar
+        atr_values, plus_smoothed, minus_smoothed = rma(np.vstack((tr, plus_dm, minus_dm)), length, ta_compatible)
+    else:
+        plus_smoothed, minus_smoothed = rma(np.vstack((plus_dm, minus_dm)), length, ta_compatible)
+    return _adx_from_smoothed(atr_values, plus_smoothed, minus_smoothed, length, ta_compatible)
+
+
+def rsi(close, length=14):
+    """
+    RSI matching `pandas_ta.rsi` (RMA of gains and losses).
+
+    Both RMAs share their adjust=True weights, which cancel in gains / (gains + losses), and
+    gains + losses is the RMA of the absolute change. So RSI is the ratio of two raw recurrences
+    (one pass), with no weight sums and no separate loss series.
+    """
+    close = _as_float_array(close)
+    diff = np.diff(close)
+    start = _leading_nan_count(diff)
+    if start is not None:
+        valid = diff[start:]
+        moves = np.empty((2, len(valid)))
+        np.maximum(valid, 0.0, out=moves[0])
+        np.abs(valid, out=moves[1])
+        gain_sum, move_sum = _linear_recurrence(moves, 1.0 - 1.0 / length)
+        out = np.full(len(close), np.nan)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            np.divide(gain_sum, move_sum, out=out[start + 1:])
+        out *= 100
+        # The first change is on bar 1, and the RMAs need `length` changes
+        out[:start + length] = np.nan
+        return out
+
+    # NaNs inside the series: pandas' ewm skips them, which only the RMA path reproduces
+    change = np.concatenate(([np.nan], diff))
+    gains = np.where(change < 0, 0.0, change)
+    losses = np.where(change > 0, 0.0, change)
+    gain_avg, loss_avg = rma(np.vstack((gains, losses)), length, ta_compatible=True)
+    loss_avg = np.abs(loss_avg)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return 100 * gain_avg / (gain_avg + loss_avg)
+
+
+def stochrsi(close, length=14, rsi_length=14, k=3, d=3, rsi_values=None):
+    """
+    Stochastic RSI matching `pandas_ta.stochrsi`. Returns (k_line, d_line), i.e. the
+    STOCHRSIk_{length}_{rsi_length}_{k}_{d} and STOCHRSId_... columns.
+    """
+    rsi_ = rsi(close, rsi_length) if rsi_values is None else _as_float_array(rsi_values)
+    stoch = rolling_min(rsi_, length)
+    rsi_range = rolling_max(rsi_, length)
+    # In place: rsi_range = highest - lowest, stoch = 100 * (rsi - lowest) / rsi_range
+    rsi_range -= stoch
+    if (rsi_range == 0).any():
+        # pandas_ta's non_zero_range nudges the whole series when any range is zero
+        rsi_range += np.finfo(float).eps
+    np.subtract(rsi_, stoch, out=stoch)
+    stoch *= 100
+    stoch /= rsi_range
+    k_line = sma(stoch, k)
+    return k_line, sma(k_line, d)
+
+
+# --- VWAP family ---
+_QUARTER_HOUR_NS = 900_000_000_000
+_DAY_NS = 96 * _QUARTER_HOUR_NS
+# 1970-01-01 was a Thursday; shifting by three days makes weeks start on Monday 00:00
+_WEEK_OFFSET_NS = 3 * _DAY_NS
+_UNIT_NS = {'s': 1_000_000_000, 'ms': 1_000_000, 'us': 1_000, 'ns': 1}
+
+
+def typical_price(df, price='ohlc4'):
+    """The price a VWAP averages: 'ohlc4' (as in main.py), 'hlc3' (as in pandas_ta) or a column name."""
+    if price == 'ohlc4':
+        return (_as_float_array(df['open']) + _as_float_array(df['high'])
+                + _as_float_array(df['low']) + _as_float_array(df['close'])) / 4
+    if price == 'hlc3':
+        return (_as_float_array(df['high']) + _as_float_array(df['low']) + _as_float_array(df['close'])) / 3
+    return _as_float_array(df[price])
+
+
+def _index_ns(index):
+    """Epoch nanoseconds (UTC) of a DatetimeIndex, scaling the raw integers instead of converting units."""
+    index = pd.DatetimeIndex(index)
+    return index.asi8 * _UNIT_NS[index.unit]
+
+
+def _utc_offsets(utc_ns, tz):
+    return _index_ns(pd.to_datetime(utc_ns, utc=True).tz_convert(tz).tz_localize(None)) - utc_ns
+
+
+def _wall_clock_ns(index):
+    """Nanoseconds of local wall-clock time, so days and weeks follow the index's timezone."""
+    index = pd.DatetimeIndex(index)
+    utc = _index_ns(index)
+    if index.tz is None:
+        return utc
+    if not len(utc) or not index.is_monotonic_increasing:
+        return _index_ns(index.tz_localize(None))
+    # UTC offsets change a couple of times a year, on a quarter hour. Find the days whose offset
+    # changes, locate each change to the quarter hour, and shift the runs of bars in between.
+    days = np.arange(utc[0] // _DAY_NS, utc[-1] // _DAY_NS + 2) * _DAY_NS
+    day_offsets = _utc_offsets(days, index.tz)
+    changed_days = days[:-1][day_offsets[1:] != day_offsets[:-1]]
+    points = np.union1d(days, (changed_days[:, None] + np.arange(1, 96) * _QUARTER_HOUR_NS).ravel())
+    offsets = _utc_offsets(points, index.tz)
+    changes = np.flatnonzero(offsets[1:] != offsets[:-1]) + 1
+    lengths = np.diff(np.concatenate(([0], np.searchsorted(utc, points[changes]), [len(utc)])))
+    return utc + np.repeat(offsets[np.concatenate(([0], changes))], lengths)
+
+
+def period_segments(index, period='D'):
+    """Segment ids that change at every calendar period: 'D', 'W' (weeks from Monday) or a fixed length like '4h'."""
+    wall = _wall_clock_ns(index)
+    if period == 'W':
+        return (wall + _WEEK_OFFSET_NS) // (7 * _DAY_NS)
+    return wall // pd.Timedelta('1D' if period == 'D' else period).value
+
+
+def _time_of_day_ns(value):
+    """Nanoseconds since midnight for a datetime.time or an 'HH:MM' / 'HH:MM:SS' string."""
+    if isinstance(value, datetime.time):
+        value = value.strftime('%H:%M:%S')
+    return pd.Timedelta(value if value.count(':') == 2 else value + ':00').value
+
+
+def session_segments(index, start, end=None):
+    """
+    Segment ids for a daily session starting at `start` (e.g. '08:00'). Bars at or after `end`
+    and before the next start get -1, i.e. no VWAP.
+    """
+    wall = _wall_clock_ns(index)
+    start_ns = _time_of_day_ns(start)
+    since_start = wall - start_ns
+    segments = since_start // _DAY_NS
+    if end is not None:
+        length_ns = (_time_of_day_ns(end) - start_ns) % _DAY_NS
+        segments[since_start % _DAY_NS >= length_ns] = -1
+    return segments
+
+
+def event_segments(index, events):
+    """Segment ids that restart at each event timestamp. Bars before the first event get -1."""
+    index = pd.DatetimeIndex(index)
+    events = pd.DatetimeIndex(events)
+    if index.tz is not None and events.tz is None:
+        events = events.tz_localize(index.tz)
+    return np.searchsorted(np.sort(_index_ns(events)), _index_ns(index), side='right') - 1
+
+
+def segmented_vwap(price, volume, segments, with_std=False):
+    """
+    VWAP restarting wherever `segments` changes value, for the whole history in one pass.
+
+    Uses one cumulative sum per input and subtracts the running total before each segment start.
+    Prices are centred on the segment's first price first, so the sums stay small and the
+    variance (for bands) does not cancel catastrophically. Rows in segment -1, or with NaN
+    price or volume, get NaN; NaN rows are skipped like pandas' grouped cumsum does.
+    Returns the VWAP, or (vwap, volume-weighted standard deviation) with with_std.
+    """
+    price, volume = _as_float_array(price), _as_float_array(volume)
+    segments = np.asarray(segments)
+    n = len(price)
+    if n == 0:
+        return (np.array([]), np.array([])) if with_std else np.array([])
+
+    starts = np.ones(n, dtype=bool)
+    starts[1:] = segments[1:] != segments[:-1]
+    start_rows = np.flatnonzero(starts)
+    lengths = np.diff(np.append(start_rows, n))
+
+    missing = np.isnan(price) | np.isnan(volume)
+    has_missing = missing.any()
+    if has_missing:
+        price = np.where(missing, np.nanmean(price) if not missing.all() else 0.0, price)
+        volume = np.where(missing, 0.0, volume)
+    reference = np.repeat(price[start_rows], lengths)
+    deviation = price - reference
+
+    def segment_cumsum(x):
+        total = np.cumsum(x)
+        total -= np.repeat(total[start_rows] - x[start_rows], lengths)
+        return total
+
+    # Bars with no volume yet in their segment come out as 0/0 = NaN
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cum_volume = segment_cumsum(volume)
+        weighted_deviation = volume * deviation
+        mean_deviation = segment_cumsum(weighted_deviation)
+        mean_deviation /= cum_volume
+        vwap = reference + mean_deviation
+        if with_std:
+            weighted_deviation *= deviation
+            variance = segment_cumsum(weighted_deviation)
+            variance /= cum_volume
+            variance -= mean_deviation ** 2
+            std = np.sqrt(np.maximum(variance, 0.0))
+
+    outputs = [vwap, std] if with_std else [vwap]
+    outside = segments[start_rows] == -1
+    if outside.any():
+        invalid = np.repeat(outside, lengths)
+        for output in outputs:
+            output[invalid] = np.nan
+    if has_missing:
+        for output in outputs:
+            output[missing] = np.nan
+    return (vwap, std) if with_std else vwap
+
+
+def _anchor_segments(index, anchor, session_end=None):
+    if isinstance(anchor, datetime.time) or (isinstance(anchor, str) and ':' in anchor):
+        return session_segments(index, anchor, session_end)
+    if isinstance(anchor, str):
+        return period_segments(index, anchor)
+    return event_segments(index, anchor)
+
+
+def vwap(df, anchor='D', price='ohlc4', session_end=None):
+    """
+    VWAP of a DataFrame with a DatetimeIndex and a 'volume' column.
+
+    `anchor` picks where it restarts: 'D' (each day), 'W' (each Monday), a fixed period such
+    as '4h', a session start time such as '08:00' (with an optional session_end), or a list
+    of event timestamps (e.g. swing lows) to anchor at.
+    """
+    segments = _anchor_segments(df.index, anchor, session_end)
+    return segmented_vwap(typical_price(df, price), df['volume'], segments)
+
+
+def vwap_bands(df, anchor='D', price='ohlc4', session_end=None, num_std=(1, 2)):
+    """VWAP with standard-deviation bands: columns VWAP, VWAP_upper_k and VWAP_lower_k for each k in num_std."""
+    segments = _anchor_segments(df.index, anchor, session_end)
+    center, std = segmented_vwap(typical_price(df, price), df['volume'], segments, with_std=True)
+    bands = {'VWAP': center}
+    for k in num_std:
+        bands[f'VWAP_upper_{k}'] = center + k * std
+        bands[f'VWAP_lower_{k}'] = center - k * std
+    return pd.DataFrame(bands, index=df.index)
+
+
+# --- Indicator dependency graph ---
+# Columns use pandas_ta's names, which the strategies and filters already read. TR, DM, DMs_{n}
+# (smoothed directional movement) and STOCHRSI_{l}_{r}_{k}_{d} (both lines) are shared sub-results.
+_COLUMN_PATTERN = re.compile(r'([A-Za-z]+)((?:_\d+)*)')
+
+
+def _indicator_node(name, df, ta_compatible):
+    """Returns the dependencies of an indicator column and a function computing it from their values."""
+    if name in ('VWAP_D', 'VWAP_W'):
+        return [], lambda: vwap(df, anchor=name[-1])
+    match = _COLUMN_PATTERN.fullmatch(name)
+    prefix, params = (match.group(1), [int(p) for p in match.group(2).split('_')[1:]]) if match else (None, [])
+
+    if prefix == 'EMA' and len(params) == 1:
+        return [], lambda: ema(df['close'], params[0])
+    if prefix == 'TR' and not params:
+        return [], lambda: true_range(df['high'], df['low'], df['close'], ta_compatible)
+    if prefix == 'ATRr' and len(params) == 1:
+        return ['TR'], lambda tr: rma(tr, params[0], ta_compatible)
+    if prefix == 'DM' and not params:
+        return [], lambda: np.vstack(directional_movement(df['high'], df['low'], ta_compatible))
+    if prefix == 'DMs' and len(params) == 1:
+        return ['DM'], lambda dm: rma(dm, params[0], ta_compatible)
+    if prefix == 'ADX' and len(params) == 1:
+        n = params[0]
+        return [f'ATRr_{n}', f'DMs_{n}'], lambda atr_values, dms: _adx_from_smoothed(atr_values, *dms, n, ta_compatible)
+    if prefix == 'RSI' and len(params) == 1:
+        return [], lambda: rsi(df['close'], params[0])
+    if prefix == 'STOCHRSI' and len(params) == 4:
+        return [f'RSI_{params[1]}'], lambda rsi_values: np.vstack(stochrsi(None, *params, rsi_values=rsi_values))
+    if prefix in ('STOCHRSIk', 'STOCHRSId') and len(params) == 4:
+        line = 0 if prefix == 'STOCHRSIk' else 1
+        return ['STOCHRSI' + match.group(2)], lambda lines: lines[line]
+    raise ValueError(f"Unknown indicator column '{name}'. Supported: EMA_n, ATRr_n, ADX_n, RSI_n, TR, VWAP_D, "
+                     f"VWAP_W, STOCHRSIk_length_rsi_k_d and STOCHRSId_length_rsi_k_d.")
+
+
+def required_sub_results(columns):
+    """Lists every node the graph evaluates for `columns`, dependencies first."""
+    order = []
+
+    def visit(name):
+        if name in order:
+            return
+        for dependency in _indicator_node(name, None, False)[0]:
+            visit(dependency)
+        order.append(name)
+
+    for column in columns:
+        visit(column)
+    return order
+
+
+def compute_indicators(df, columns, ta_compatible=False):
+    """
+    Adds the requested indicator columns to df in place and returns it.
+
+    Only the requested columns and what they depend on are computed, each sub-result once:
+    ATRr_14 and ADX_14 share one true range, and every ADX reuses the ATR of the same length.
+    Columns that df already has are left as they are and reused as inputs.
+    """
+    results = {}
+
+    def resolve(name):
+        if name not in results:
+            if name in df.columns:
+                results[name] = _as_float_array(df[name])
+            else:
+                dependencies, kernel = _indicator_node(name, df, ta_compatible)
+                results[name] = kernel(*[resolve(d) for d in dependencies])
+        return results[name]
+
+    for column in columns:
+        if column not in df.columns:
+            df[column] = resolve(column)
+    return df
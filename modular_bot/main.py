@@ -4,10 +4,12 @@ from datetime import datetime
 
 import pandas as pd
 
-import api_client
-from backtester import prepare_data, calculate_indicators, run_backtest
-from strategies import MaCrossStrategy
-from filters import AdxFilter
+from modular_bot import api_client
+from modular_bot.backtester import prepare_data, run_backtest, complete_rows
+from modular_bot.data_quality import scan_data_quality, print_data_quality_report
+from modular_bot.results_db import ResultsDatabase
+from modular_bot.strategies import MaCrossStrategy
+from modular_bot.filters import AdxFilter
 from modular_bot.reports import reporting
 
 if __name__ == "__main__":
@@ -70,42 +72,41 @@ if __name__ == "__main__":
             print(f"Data saved to {data_filepath} for future use.")
 
     if not df.empty:
-        # 2. Calculate indicators
-        df_with_indicators = calculate_indicators(
+        # 1b. Check the dataset for gaps, bad bars and missing columns before using it
+        print_data_quality_report(scan_data_quality(df), name=data_filename)
+
+        # 2. Create filter and strategy instances. They declare the indicator columns they
+        # read, and only those are calculated when signals are generated.
+        print("\n--- Setting up Strategy and Filters ---")
+        adx_filter = AdxFilter(adx_threshold=filter_params['adx_threshold'])
+        strategy = MaCrossStrategy(
             df,
             fast_ma=strategy_params['fast_ma'],
             slow_ma=strategy_params['slow_ma'],
-            long_term_ma=strategy_params['trend_period']
+            trend_period=strategy_params['trend_period'],
+            filters=[adx_filter]
         )
 
-        if not df_with_indicators.empty:
-            # 3. Create filter and strategy instances
-            print("\n--- Setting up Strategy and Filters ---")
-            adx_filter = AdxFilter(adx_threshold=filter_params['adx_threshold'])
-            strategy = MaCrossStrategy(
-                df_with_indicators,
-                fast_ma=strategy_params['fast_ma'],
-                slow_ma=strategy_params['slow_ma'],
-                trend_period=strategy_params['trend_period'],
-                filters=[adx_filter]
-            )
-
-            # 4. Generate final signals
-            signal_data = strategy.generate_signals()
-            df_with_signals = df_with_indicators.join(signal_data)
+        # 3. Generate final signals as sparse events. The backtest matches them to the rows after the
+        # indicator warm-up by timestamp and jumps between them while flat.
+        signal_events = strategy.signal_events()
+        rows = complete_rows(strategy.df)
+        df_with_indicators = strategy.df.iloc[rows]
 
-            # 5. Run the backtest
+        if not df_with_indicators.empty:
+            # 4. Run the backtest
             print("\n--- Starting Backtest Engine with Risk-Based Sizing ---")
             trade_results = run_backtest(
-                df_with_signals,
+                df_with_indicators,
                 backtest_params['epic'],
                 backtest_params['initial_balance'],
                 risk_per_trade_percent=risk_params['risk_per_trade_percent'],
                 risk_reward_ratio=risk_params['risk_reward_ratio'],
-                trailing_stop_atr_multiplier=risk_params['trailing_stop_atr_multiplier']
+                trailing_stop_atr_multiplier=risk_params['trailing_stop_atr_multiplier'],
+                events=signal_events
             )
 
-            # 6. Analyze and Report Results
+            # 5. Analyze and Report Results
             if trade_results:
                 results_df = pd.DataFrame(trade_results)
                 # --- Generate Report ---
@@ -123,5 +124,10 @@ if __name__ == "__main__":
                 report_filepath = os.path.join('reports', report_filename)
                 reporting.generate_report(report_data, report_filepath)
 
+                # --- Record the run so it can be queried against earlier runs ---
+                with ResultsDatabase(os.path.join('reports', 'results.db')) as results_db:
+                    run_id = results_db.add_report(report_data)
+                print(f"Run recorded in reports/results.db with id {run_id}")
+
             else:
                 print("\nNo trades were executed during the backtest period.")
\ No newline at end of file
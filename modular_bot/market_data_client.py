@@ -0,0 +1,41 @@
+# market_data_client.py
+import time
+from datetime import datetime
+
+import requests
+
+CACHE_URL = "http://127.0.0.1:8765"
+BACKFILL_WAIT_SECONDS = 2
+
+
+def get_cached_prices(epic, resolution, from_date=None, max_candles=None, to_date=None, timeout=10):
+    """
+    Fetches candles from the local market data cache (see market_data_server.py).
+
+    Returns the same list of price dicts as the Capital.com prices endpoint, or None if the
+    cache is not running, so callers can fall back to calling the API themselves. While the cache
+    is backfilling the range, asks again every BACKFILL_WAIT_SECONDS rather than paging the API too.
+    """
+    params = {'resolution': resolution}
+    if from_date is not None:
+        params['from'] = from_date.isoformat() if isinstance(from_date, datetime) else from_date
+    if to_date is not None:
+        params['to'] = to_date.isoformat() if isinstance(to_date, datetime) else to_date
+    if max_candles is not None:
+        params['max'] = max_candles
+    waiting = False
+    while True:
+        try:
+            response = requests.get(f"{CACHE_URL}/prices/{epic}", params=params, timeout=timeout)
+        except requests.exceptions.RequestException:
+            return None
+        if response.status_code != 200:
+            print(str(response.status_code) + " returned from the market data cache")
+            return None
+        reply = response.json()
+        if reply.get('complete', True):
+            return reply['prices']
+        if not waiting:
+            print(f"Waiting for the market data cache to backfill {epic} {resolution}...")
+            waiting = True
+        time.sleep(BACKFILL_WAIT_SECONDS)
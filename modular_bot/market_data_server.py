@@ -0,0 +1,268 @@
+# market_data_server.py
+"""
+A long-running local market-data cache shared by all bots and backtests.
+
+The daemon owns the broker session, keeps candles per epic/resolution in memory
+(persisted under data/cache/), polls the API once per interval for every epic that
+has been requested, and serves range queries on localhost in the same JSON shape
+as the Capital.com prices endpoint, plus a 'complete' flag that is false while the
+range is still being backfilled:
+
+    GET http://127.0.0.1:8765/prices/GBPUSD?resolution=HOUR&from=2025-11-03T00:00:00&max=500
+
+Run it from the repository root with:  python -m modular_bot.market_data_server
+"""
+import json
+import os
+import threading
+from bisect import bisect_left, bisect_right, insort
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+from modular_bot import api_client
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+CACHE_DIR = os.path.join('data', 'cache')
+PAGE_SIZE = 1000
+
+
+class CandleCache:
+    """
+    Candles per (epic, resolution) keyed by snapshotTimeUTC, backed by JSON files on disk.
+
+    Each key is stored in partitions, one file per day for minute resolutions and one per month
+    otherwise, under data/cache/<epic>_<resolution>/. A merge only rewrites the partitions it touched,
+    so a poll costs one small file however long the history is.
+    """
+
+    def __init__(self, cache_dir=CACHE_DIR):
+        self.cache_dir = cache_dir
+        self.candles = {}
+        self.times = {}
+        self.lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _key_dir(self, key):
+        epic, resolution = key
+        return os.path.join(self.cache_dir, f"{epic}_{resolution}")
+
+    @staticmethod
+    def _partition(key, snapshot_time):
+        """'2025-11-03' for minute resolutions, '2025-11' otherwise."""
+        return snapshot_time[:10] if key[1].startswith('MINUTE') else snapshot_time[:7]
+
+    def _load(self, key):
+        """Loads a key's partitions from disk the first time it is used."""
+        if key in self.candles:
+            return
+        self.candles[key] = {}
+        key_dir = self._key_dir(key)
+        if os.path.isdir(key_dir):
+            for name in sorted(os.listdir(key_dir)):
+                with open(os.path.join(key_dir, name)) as f:
+                    self.candles[key].update((p['snapshotTimeUTC'], p) for p in json.load(f))
+            print(f"Loaded {len(self.candles[key])} cached candles for {key[0]} {key[1]}.")
+        self.times[key] = sorted(self.candles[key])
+
+    def _write_partition(self, key, partition):
+        times = self.times[key]
+        # '~' sorts after every character of a timestamp, so this is the end of the partition
+        start, end = bisect_left(times, partition), bisect_left(times, partition + '~')
+        os.makedirs(self._key_dir(key), exist_ok=True)
+        with open(os.path.join(self._key_dir(key), f"{partition}.json"), 'w') as f:
+            json.dump([self.candles[key][t] for t in times[start:end]], f)
+
+    def merge(self, key, prices):
+        """Adds or replaces candles (the still-forming last candle is replaced) and persists their partitions."""
+        with self.lock:
+            self._load(key)
+            candles, times = self.candles[key], self.times[key]
+            changed = set()
+            for price in prices:
+                snapshot_time = price['snapshotTimeUTC']
+                if snapshot_time not in candles:
+                    if not times or snapshot_time > times[-1]:
+                        times.append(snapshot_time)
+                    else:
+                        insort(times, snapshot_time)
+                candles[snapshot_time] = price
+                changed.add(self._partition(key, snapshot_time))
+            for partition in changed:
+                self._write_partition(key, partition)
+
+    def first_and_last(self, key):
+        with self.lock:
+            self._load(key)
+            if not self.times[key]:
+                return None, None
+            return self.times[key][0], self.times[key][-1]
+
+    def query(self, key, from_date=None, to_date=None, max_candles=None):
+        """Returns candles with from_date <= snapshotTimeUTC <= to_date, oldest first."""
+        with self.lock:
+            self._load(key)
+            times = self.times[key]
+            start = bisect_left(times, from_date) if from_date is not None else 0
+            end = bisect_right(times, to_date) if to_date is not None else len(times)
+            if max_candles is not None:
+                end = min(end, start + max_candles)
+            return [self.candles[key][t] for t in times[start:end]]
+
+
+class MarketDataService:
+    """
+    Fills the cache from the broker on demand and keeps every requested key up to date.
+
+    Backfills run in a background thread per key, so a request for a long range returns at once
+    (marked incomplete) and the client asks again until it is done. The upstream lock is held per
+    page, so the poller keeps other keys up to date during a backfill.
+    """
+
+    def __init__(self, cache, poll_interval=30):
+        self.cache = cache
+        self.poll_interval = poll_interval
+        self.upstream_lock = threading.Lock()
+        self.polled = set()
+        self.backfills = {}  # key -> its running backfill thread
+        self.failed = {}  # key -> the error of its last backfill
+        self.covered_from = {}  # key -> the earliest from_date backfilled, which may precede its first candle
+        self.backfill_lock = threading.Lock()
+        self._stop = threading.Event()
+
+    def _fetch_forward(self, key, from_date, stop_at=None):
+        """Pages forward from from_date until the API runs out of candles or stop_at is reached."""
+        epic, resolution = key
+        current = from_date
+        while True:
+            with self.upstream_lock:
+                prices = api_client.fetch_prices(epic, resolution, from_date=current, max_candles=PAGE_SIZE)
+            if prices is None:
+                raise ConnectionError(f"fetching {epic} {resolution} from {current} failed")
+            if not prices:
+                break
+            self.cache.merge(key, prices)
+            last = prices[-1]['snapshotTimeUTC']
+            if len(prices) < PAGE_SIZE or last == current or (stop_at is not None and last >= stop_at):
+                break
+            current = last
+
+    def _needs_backfill(self, key, from_date):
+        cached_first, _ = self.cache.first_and_last(key)
+        covered_from = min(filter(None, (cached_first, self.covered_from.get(key))), default=None)
+        return from_date is not None and (covered_from is None or from_date < covered_from)
+
+    def _backfill(self, key, from_date):
+        """Fetches candles before the cached range, up to where the cache already starts, then polls the key."""
+        try:
+            if self._needs_backfill(key, from_date):
+                cached_first, _ = self.cache.first_and_last(key)
+                self._fetch_forward(key, from_date, stop_at=cached_first)
+                # The API has nothing between from_date and the first candle (e.g. a weekend)
+                self.covered_from[key] = min(filter(None, (from_date, self.covered_from.get(key))))
+            if key not in self.polled:
+                # First request since start-up: bring any candles loaded from disk up to date
+                self.poll(key)
+        except Exception as e:
+            print(f"Backfilling {key[0]} {key[1]} failed: {e}")
+            self.failed[key] = str(e)
+
+    def start_backfill(self, key, from_date):
+        """
+        Starts a backfill of the key from from_date in the background, unless one is running or none
+        is needed. Returns True while the key is being backfilled.
+        """
+        with self.backfill_lock:
+            running = self.backfills.get(key)
+            if running is not None and running.is_alive():
+                return True
+            if not self._needs_backfill(key, from_date) and key in self.polled:
+                return False
+            self.backfills[key] = threading.Thread(target=self._backfill, args=(key, from_date), daemon=True)
+            self.backfills[key].start()
+            return True
+
+    def poll(self, key):
+        """Fetches everything from the last cached candle onwards, replacing the forming candle."""
+        _, cached_last = self.cache.first_and_last(key)
+        self._fetch_forward(key, cached_last)
+        self.polled.add(key)
+
+    def get_prices(self, epic, resolution, from_date=None, to_date=None, max_candles=None):
+        """
+        Returns (prices, complete). `complete` is False while the requested range is still being
+        backfilled; the prices are then only what is cached so far. Raises ConnectionError when the
+        last backfill of the key failed.
+        """
+        key = (epic, resolution)
+        if key in self.failed:
+            raise ConnectionError(self.failed.pop(key))
+        complete = not self.start_backfill(key, from_date)
+        return self.cache.query(key, from_date, to_date, max_candles), complete
+
+    def run_poller(self):
+        """Polls every cached key once per interval, so N bots cost one upstream request per epic."""
+        while not self._stop.wait(self.poll_interval):
+            for key in list(self.polled):
+                try:
+                    self.poll(key)
+                except Exception as e:
+                    print(f"Polling {key[0]} {key[1]} failed: {e}")
+
+    def stop(self):
+        self._stop.set()
+
+
+def _make_handler(service):
+    class PricesHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            url = urlparse(self.path)
+            parts = url.path.strip('/').split('/')
+            if len(parts) != 2 or parts[0] != 'prices':
+                self.send_error(404, "Use /prices/<EPIC>?resolution=...&from=...&to=...&max=...")
+                return
+            query = {k: v[0] for k, v in parse_qs(url.query).items()}
+            try:
+                max_candles = int(query['max']) if 'max' in query else None
+            except ValueError:
+                self.send_error(400, "'max' must be an integer")
+                return
+            try:
+                prices, complete = service.get_prices(parts[1], query.get('resolution', 'MINUTE'),
+                                                      query.get('from'), query.get('to'), max_candles)
+            except ConnectionError as e:
+                self.send_error(503, f"Backfill failed: {e}")
+                return
+            body = json.dumps({'prices': prices, 'complete': complete}).encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return PricesHandler
+
+
+def serve(host=DEFAULT_HOST, port=DEFAULT_PORT, poll_interval=30, cache_dir=CACHE_DIR):
+    """Starts the poller thread and serves range queries until interrupted."""
+    service = MarketDataService(CandleCache(cache_dir), poll_interval=poll_interval)
+    poller = threading.Thread(target=service.run_poller, daemon=True)
+    poller.start()
+    server = ThreadingHTTPServer((host, port), _make_handler(service))
+    print(f"{datetime.now():%H:%M:%S} Market data cache serving on http://{host}:{port} "
+          f"(polling every {poll_interval}s)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("Shutting down market data cache.")
+    finally:
+        service.stop()
+        server.server_close()
+
+
+if __name__ == "__main__":
+    serve()
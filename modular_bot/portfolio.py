@@ -0,0 +1,163 @@
+# portfolio.py
+"""
+Backtests one strategy over several epics with a single shared account.
+
+Signals are generated per epic in worker processes. The simulation then merges the epics'
+events into one time-ordered stream with a heap. An epic only has events on its signal
+candles while it is flat, and on every candle while it holds a trade, so the cost grows with
+signals and time in the market rather than with the total number of candles.
+"""
+import heapq
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from modular_bot.backtester import Position, complete_rows
+from modular_bot.indicators import compute_indicators
+from modular_bot.shared_data import get_shared_dataset
+
+
+def _epic_candles(args):
+    """
+    Worker task: builds the strategy for one epic and returns the candles it can trade on,
+    as arrays. `data` is a DataFrame or the name of a published `SharedDataset`. The strategy adds
+    its columns to a shallow copy, so the caller's DataFrame is left as it is, in this process too.
+    """
+    epic, data, make_strategy = args
+    df = get_shared_dataset(data).to_frame() if isinstance(data, str) else data.copy(deep=False)
+    strategy = make_strategy(df)
+    signals = strategy.generate_signals()
+    compute_indicators(strategy.df, ['ATRr_14'])
+    rows = complete_rows(strategy.df, ['high', 'low', 'close', 'ATRr_14'] + strategy.required_indicators())
+    candles = strategy.df.iloc[rows]
+    return epic, {
+        'index': candles.index,
+        'high': candles['high'].to_numpy(dtype=float),
+        'low': candles['low'].to_numpy(dtype=float),
+        'close': candles['close'].to_numpy(dtype=float),
+        'atr': candles['ATRr_14'].to_numpy(dtype=float),
+        'signal': signals['signal'].to_numpy()[rows],
+        'stop_loss_price': signals['stop_loss_price'].to_numpy(dtype=float)[rows],
+    }
+
+
+class Portfolio:
+    """The shared balance, open positions and exposure limits of a portfolio backtest."""
+
+    def __init__(self, initial_balance, max_open_positions=None, max_epic_exposure_percent=None,
+                 max_total_exposure_percent=None):
+        self.balance = initial_balance
+        self.max_open_positions = max_open_positions
+        self.max_epic_exposure_percent = max_epic_exposure_percent
+        self.max_total_exposure_percent = max_total_exposure_percent
+        self.exposure = {}  # epic -> notional value (units x entry price) of its open trade
+        self.skipped_signals = 0
+
+    def position_size(self, epic, units, entry_price):
+        """Caps risk-based units to the exposure limits. Returns 0 when the signal has to be skipped."""
+        # Sizing only happens while the epic is flat, even if its last trade closed on this candle
+        self.exposure.pop(epic, None)
+        if self.max_open_positions is not None and len(self.exposure) >= self.max_open_positions:
+            units = 0
+        if self.max_epic_exposure_percent is not None:
+            units = min(units, self.balance * self.max_epic_exposure_percent / 100.0 / entry_price)
+        if self.max_total_exposure_percent is not None:
+            headroom = self.balance * self.max_total_exposure_percent / 100.0 - sum(self.exposure.values())
+            units = min(units, headroom / entry_price)
+        if units <= 0:
+            self.skipped_signals += 1
+            return 0
+        return units
+
+
+class PortfolioPosition(Position):
+    """A `Position` whose balance is the portfolio's and whose sizing respects the portfolio's limits."""
+
+    def __init__(self, portfolio, epic, **risk_params):
+        self.portfolio = portfolio
+        super().__init__(epic, portfolio.balance, verbose=False, **risk_params)
+
+    @property
+    def balance(self):
+        return self.portfolio.balance
+
+    @balance.setter
+    def balance(self, value):
+        self.portfolio.balance = value
+
+    def position_size(self, entry_price, risk_per_unit):
+        units = super().position_size(entry_price, risk_per_unit)
+        return self.portfolio.position_size(self.epic, units, entry_price)
+
+
+def run_portfolio_backtest(datasets, make_strategy, initial_balance, risk_per_trade_percent=2.0,
+                           risk_reward_ratio=1.5, trailing_stop_atr_multiplier=2.5, max_open_positions=None,
+                           max_epic_exposure_percent=None, max_total_exposure_percent=None, processes=None):
+    """
+    Backtests `make_strategy` over every epic in `datasets` with one shared account.
+
+    - `datasets` maps each epic to its candles: a DataFrame, or the name of a `SharedDataset`
+      that the workers attach to instead of receiving a pickled copy.
+    - `make_strategy(df)` returns a strategy for one epic's data. It runs in worker processes,
+      so it has to be picklable (a class, a module-level function or a `functools.partial`).
+    - Every trade risks `risk_per_trade_percent` of the portfolio balance, capped so no epic's
+      notional exceeds `max_epic_exposure_percent` of the balance and all open trades together
+      stay within `max_total_exposure_percent`. Signals beyond `max_open_positions` open trades
+      are skipped. Each epic holds at most one trade, as in `run_backtest`.
+    - `processes=1` generates the signals in this process.
+
+    Candles at the same time are processed in the order of `datasets`. Returns the closed trades of
+    all epics in the order they closed, in the same format as `run_backtest`.
+    """
+    epics = list(datasets)
+    tasks = [(epic, datasets[epic], make_strategy) for epic in epics]
+    print(f"Generating signals for {len(epics)} epics...")
+    if processes == 1:
+        candles = dict(map(_epic_candles, tasks))
+    else:
+        with ProcessPoolExecutor(max_workers=processes) as pool:
+            candles = dict(pool.map(_epic_candles, tasks))
+
+    portfolio = Portfolio(initial_balance, max_open_positions, max_epic_exposure_percent, max_total_exposure_percent)
+    positions = [PortfolioPosition(portfolio, epic, risk_per_trade_percent=risk_per_trade_percent,
+                                   risk_reward_ratio=risk_reward_ratio,
+                                   trailing_stop_atr_multiplier=trailing_stop_atr_multiplier) for epic in epics]
+    times = [candles[epic]['index'].asi8 for epic in epics]
+    signal_bars = [np.flatnonzero(candles[epic]['signal'] != 0) for epic in epics]
+
+    def next_event(order, bar):
+        """The next candle of an epic that can change anything: the next one in a trade, else its next signal."""
+        if positions[order].trade is not None:
+            following = bar + 1
+        else:
+            next_signal = np.searchsorted(signal_bars[order], bar, side='right')
+            following = signal_bars[order][next_signal] if next_signal < len(signal_bars[order]) else len(times[order])
+        if following < len(times[order]):
+            heapq.heappush(events, (times[order][following], order, following))
+
+    events = []
+    for order in range(len(epics)):
+        next_event(order, -1)
+
+    trades = []
+    processed = 0
+    while events:
+        _, order, bar = heapq.heappop(events)
+        processed += 1
+        position, epic_candles = positions[order], candles[epics[order]]
+        closed_trades = len(position.trades)
+        position.update(epic_candles['index'][bar], epic_candles['high'][bar], epic_candles['low'][bar],
+                        epic_candles['close'][bar], epic_candles['atr'][bar], epic_candles['signal'][bar],
+                        epic_candles['stop_loss_price'][bar])
+        trades += position.trades[closed_trades:]
+        if position.trade is not None:
+            portfolio.exposure[position.epic] = position.trade['units'] * position.trade['entry_price']
+        else:
+            portfolio.exposure.pop(position.epic, None)
+        next_event(order, bar)
+
+    total = sum(len(times[order]) for order in range(len(epics)))
+    print(f"Portfolio backtest complete: {len(trades)} trades over {len(epics)} epics, {processed} of {total} "
+          f"candles visited, {portfolio.skipped_signals} signals skipped by the limits. "
+          f"Final balance: £{portfolio.balance:,.2f}")
+    return trades
@@ -0,0 +1,224 @@
+# results_db.py
+import sqlite3
+import uuid
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id          TEXT PRIMARY KEY,
+    strategy        TEXT NOT NULL,
+    epic            TEXT NOT NULL,
+    start_date      TEXT,
+    end_date        TEXT,
+    initial_balance REAL,
+    created_at      TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS run_params (
+    run_id        TEXT NOT NULL REFERENCES runs(run_id),
+    section       TEXT NOT NULL,
+    name          TEXT NOT NULL,
+    value         TEXT,
+    numeric_value REAL
+);
+CREATE TABLE IF NOT EXISTS run_metrics (
+    run_id        TEXT PRIMARY KEY REFERENCES runs(run_id),
+    total_trades  INTEGER NOT NULL,
+    net_pnl       REAL,
+    final_balance REAL,
+    win_rate      REAL,
+    avg_pnl       REAL,
+    profit_factor REAL,
+    max_drawdown  REAL
+);
+CREATE TABLE IF NOT EXISTS trades (
+    run_id            TEXT NOT NULL REFERENCES runs(run_id),
+    trade_no          INTEGER NOT NULL,
+    direction         TEXT,
+    entry_time        TEXT,
+    exit_time         TEXT,
+    entry_price       REAL,
+    exit_price        REAL,
+    initial_stop_loss REAL,
+    take_profit       REAL,
+    units             REAL,
+    pnl               REAL
+);
+CREATE INDEX IF NOT EXISTS idx_runs_epic_strategy ON runs (epic, strategy);
+CREATE INDEX IF NOT EXISTS idx_params_run ON run_params (run_id);
+CREATE INDEX IF NOT EXISTS idx_params_name_value ON run_params (name, numeric_value);
+CREATE INDEX IF NOT EXISTS idx_metrics_profit_factor ON run_metrics (profit_factor);
+CREATE INDEX IF NOT EXISTS idx_metrics_net_pnl ON run_metrics (net_pnl);
+CREATE INDEX IF NOT EXISTS idx_trades_run ON trades (run_id, trade_no);
+"""
+
+METRIC_COLUMNS = ['total_trades', 'net_pnl', 'final_balance', 'win_rate', 'avg_pnl', 'profit_factor', 'max_drawdown']
+TRADE_COLUMNS = ['direction', 'entry_time', 'exit_time', 'entry_price', 'exit_price',
+                 'initial_stop_loss', 'take_profit', 'units', 'pnl']
+
+
+def calculate_metrics(results_df, initial_balance=0.0):
+    """
+    Calculates the summary metrics stored for every run from its trade log.
+    With initial_balance=None (P&L not in account currency) the balance-based metrics are None.
+    """
+    pnl = results_df['pnl'].to_numpy(dtype=float) if not results_df.empty else np.array([])
+    total_trades = len(pnl)
+    net_pnl = float(pnl.sum())
+    gross_profit = pnl[pnl > 0].sum()
+    gross_loss = abs(pnl[pnl < 0].sum())
+    has_balance = initial_balance is not None
+    equity = (initial_balance or 0.0) + np.cumsum(pnl)
+    peak = np.maximum.accumulate(np.concatenate(([initial_balance or 0.0], equity)))[1:]
+    return {
+        'total_trades': total_trades,
+        'net_pnl': net_pnl,
+        'final_balance': initial_balance + net_pnl if has_balance else None,
+        'win_rate': (pnl > 0).sum() / total_trades * 100 if total_trades else 0.0,
+        'avg_pnl': net_pnl / total_trades if total_trades else 0.0,
+        'profit_factor': gross_profit / gross_loss if gross_loss > 0 else (np.inf if gross_profit > 0 else None),
+        'max_drawdown': (float((peak - equity).max()) if total_trades else 0.0) if has_balance else None,
+    }
+
+
+def _param_value(value):
+    """Returns the (text, numeric) pair stored for a parameter value."""
+    if isinstance(value, (bool, int, float, np.integer, np.floating)):
+        return str(value), float(value)
+    if isinstance(value, datetime):
+        return value.isoformat(), None
+    return str(value), None
+
+
+def _timestamp(value):
+    return value.isoformat() if hasattr(value, 'isoformat') else (None if pd.isna(value) else str(value))
+
+
+class ResultsDatabase:
+    """
+    A local SQLite database of backtest runs, their parameters, summary metrics and trades.
+
+    Runs are buffered in memory and written in one transaction per batch. The database uses
+    WAL mode with a busy timeout, so parallel workers can each open their own connection and
+    record runs into the same file.
+    """
+
+    def __init__(self, path='results.db', batch_size=500):
+        self.path = path
+        self.batch_size = batch_size
+        self.connection = sqlite3.connect(path, timeout=60)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.executescript(SCHEMA)
+        self._pending = {'runs': [], 'run_params': [], 'run_metrics': [], 'trades': []}
+        self._pending_runs = 0
+
+    def add_run(self, strategy, epic, results_df, params=None, initial_balance=0.0,
+                start_date=None, end_date=None):
+        """
+        Queues one run for writing and returns its run_id.
+
+        `params` maps a section name (e.g. 'strategy', 'risk', 'filter:AdxFilter') to a dict
+        of parameter values. `results_df` is the trade log; columns missing from it are stored as NULL.
+        Pass initial_balance=None when the P&L is not in account currency (e.g. price points).
+        """
+        run_id = uuid.uuid4().hex
+        self._pending['runs'].append((run_id, strategy, epic, _timestamp(start_date), _timestamp(end_date),
+                                      initial_balance, datetime.now().isoformat()))
+
+        for section, values in (params or {}).items():
+            for name, value in values.items():
+                self._pending['run_params'].append((run_id, section, name, *_param_value(value)))
+
+        metrics = calculate_metrics(results_df, initial_balance)
+        self._pending['run_metrics'].append((run_id, *[metrics[c] for c in METRIC_COLUMNS]))
+
+        if not results_df.empty:
+            columns = [results_df[c] if c in results_df.columns else pd.Series(None, index=results_df.index)
+                       for c in TRADE_COLUMNS]
+            for trade_no, row in enumerate(zip(*columns)):
+                direction, entry_time, exit_time, *numbers = row
+                self._pending['trades'].append(
+                    (run_id, trade_no, direction, _timestamp(entry_time), _timestamp(exit_time),
+                     *[None if pd.isna(n) else float(n) for n in numbers]))
+
+        self._pending_runs += 1
+        if self._pending_runs >= self.batch_size:
+            self.flush()
+        return run_id
+
+    def add_report(self, report_data):
+        """Queues a run from the same dictionary that `reporting.generate_report` consumes."""
+        backtest_params = report_data['backtest_params']
+        params = {
+            'strategy': {k: v for k, v in report_data['strategy'].items() if k != 'name'},
+            'risk': report_data['risk_params'],
+        }
+        for f in report_data['filters']:
+            params[f"filter:{f['name']}"] = {k: v for k, v in f.items() if k != 'name'}
+        return self.add_run(report_data['strategy']['name'], backtest_params['epic'], report_data['results_df'],
+                            params=params, initial_balance=backtest_params['initial_balance'],
+                            start_date=backtest_params.get('start_date'), end_date=backtest_params.get('end_date'))
+
+    def flush(self):
+        """Writes all queued runs in a single transaction."""
+        if not self._pending_runs:
+            return
+        with self.connection:
+            self.connection.executemany("INSERT INTO runs VALUES (?, ?, ?, ?, ?, ?, ?)", self._pending['runs'])
+            self.connection.executemany("INSERT INTO run_params VALUES (?, ?, ?, ?, ?)", self._pending['run_params'])
+            self.connection.executemany("INSERT INTO run_metrics VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                                        self._pending['run_metrics'])
+            self.connection.executemany("INSERT INTO trades VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                                        self._pending['trades'])
+        self._pending = {table: [] for table in self._pending}
+        self._pending_runs = 0
+
+    def top_runs(self, metric='profit_factor', epic=None, strategy=None, limit=20, min_trades=1):
+        """Returns the best runs by a summary metric, with their parameters as extra columns."""
+        if metric not in METRIC_COLUMNS:
+            raise ValueError(f"Unknown metric '{metric}'. Choose from {METRIC_COLUMNS}.")
+        self.flush()
+
+        query = ("SELECT r.run_id, r.strategy, r.epic, r.start_date, r.end_date, "
+                 + ", ".join(f"m.{c}" for c in METRIC_COLUMNS)
+                 + " FROM run_metrics m JOIN runs r ON r.run_id = m.run_id WHERE m.total_trades >= ?")
+        args = [min_trades]
+        if epic is not None:
+            query += " AND r.epic = ?"
+            args.append(epic)
+        if strategy is not None:
+            query += " AND r.strategy = ?"
+            args.append(strategy)
+        query += f" ORDER BY m.{metric} DESC LIMIT ?"
+        args.append(limit)
+        runs = pd.read_sql_query(query, self.connection, params=args)
+        if runs.empty:
+            return runs
+
+        placeholders = ", ".join("?" * len(runs))
+        params = pd.read_sql_query(
+            f"SELECT run_id, section || '.' || name AS param, value FROM run_params WHERE run_id IN ({placeholders})",
+            self.connection, params=list(runs['run_id']))
+        if not params.empty:
+            runs = runs.merge(params.pivot(index='run_id', columns='param', values='value'),
+                              left_on='run_id', right_index=True, how='left')
+        return runs
+
+    def get_trades(self, run_id):
+        """Returns the trade log recorded for one run."""
+        self.flush()
+        return pd.read_sql_query("SELECT * FROM trades WHERE run_id = ? ORDER BY trade_no",
+                                 self.connection, params=[run_id])
+
+    def close(self):
+        self.flush()
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
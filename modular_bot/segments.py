@@ -0,0 +1,100 @@
+# segments.py
+"""
+Array building blocks for regime logic: runs of a boolean state, level crossings, the
+argmin/argmax of each segment and forward-filled state machines.
+
+Each takes and returns NumPy arrays with one value per bar, so rules such as "the bias turns
+long on a cross above the oversold level" or "the anchor is the lowest low of the setup window"
+run over the whole history without a Python loop.
+"""
+import numpy as np
+
+
+def run_lengths(mask):
+    """Run-length encoding of a boolean array: (starts, lengths, values) of its runs."""
+    mask = np.asarray(mask, dtype=bool)
+    if len(mask) == 0:
+        return np.array([], dtype=np.int64), np.array([], dtype=np.int64), np.array([], dtype=bool)
+    starts = np.flatnonzero(np.r_[True, mask[1:] != mask[:-1]])
+    lengths = np.diff(np.r_[starts, len(mask)])
+    return starts, lengths, mask[starts]
+
+
+def segment_ids(mask):
+    """Numbers the runs of True 0, 1, 2...; every bar gets the number of its run, or -1 where False."""
+    mask = np.asarray(mask, dtype=bool)
+    run_starts = mask & ~np.r_[False, mask[:-1]]
+    return np.where(mask, np.cumsum(run_starts) - 1, -1)
+
+
+def crossed_above(values, level):
+    """True where the previous value is below `level` and this one is at or above it. NaNs never cross."""
+    values = np.asarray(values, dtype=float)
+    previous = np.r_[np.nan, values[:-1]]
+    with np.errstate(invalid='ignore'):
+        return (previous < level) & (values >= level)
+
+
+def crossed_below(values, level):
+    """True where the previous value is above `level` and this one is at or below it. NaNs never cross."""
+    values = np.asarray(values, dtype=float)
+    previous = np.r_[np.nan, values[:-1]]
+    with np.errstate(invalid='ignore'):
+        return (previous > level) & (values <= level)
+
+
+def last_true(mask):
+    """Position of the latest True at or before each bar, -1 before the first one."""
+    mask = np.asarray(mask, dtype=bool)
+    return np.maximum.accumulate(np.where(mask, np.arange(len(mask)), -1)) if len(mask) else np.array([], np.int64)
+
+
+def forward_fill(values, initial=np.nan):
+    """Carries the last non-NaN value forward; bars before the first one get `initial`."""
+    values = np.asarray(values, dtype=float)
+    position = last_true(~np.isnan(values))
+    return np.where(position >= 0, values[np.maximum(position, 0)], initial)
+
+
+def _segment_first_extreme(values, segments, sign):
+    values = np.asarray(values, dtype=float)
+    segments = np.asarray(segments)
+    count = int(segments.max()) + 1 if len(segments) else 0
+    result = np.full(count, -1, dtype=np.int64)
+    positions = np.flatnonzero((segments >= 0) & ~np.isnan(values))
+    if len(positions) == 0:
+        return result
+    # Sorted by segment, then value, then position: the first row of each segment is its first extreme
+    order = np.lexsort((positions, sign * values[positions], segments[positions]))
+    ordered = segments[positions][order]
+    first = np.r_[True, ordered[1:] != ordered[:-1]]
+    result[ordered[first]] = positions[order][first]
+    return result
+
+
+def segment_argmin(values, segments):
+    """
+    For segment ids 0..k-1 (bars with -1 belong to none; a segment need not be contiguous), the
+    position of the first minimum of `values` in each segment. -1 for a segment of only NaNs.
+    """
+    return _segment_first_extreme(values, segments, 1.0)
+
+
+def segment_argmax(values, segments):
+    """Like `segment_argmin`, for the first maximum."""
+    return _segment_first_extreme(values, segments, -1.0)
+
+
+def latch(sets, resets=None, initial=0.0, neutral=0.0):
+    """
+    A forward-filled state machine. `sets` holds the state a bar switches to, NaN for no change.
+    `resets` maps a state to a mask of bars that return it to `neutral` when the machine is in that
+    state (and do nothing otherwise). A set wins over a reset on the same bar. Starts in `initial`.
+    """
+    sets = np.asarray(sets, dtype=float)
+    set_position = last_true(~np.isnan(sets))
+    state = np.where(set_position >= 0, sets[np.maximum(set_position, 0)], initial)
+    for reset_state, mask in (resets or {}).items():
+        reset = (state == reset_state) & (last_true(mask) > set_position)
+        state = np.where(reset, neutral, state)
+    return state
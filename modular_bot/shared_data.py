@@ -0,0 +1,155 @@
+# shared_data.py
+import json
+import struct
+import uuid
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+_HEADER_LENGTH = struct.Struct('<Q')
+_ALIGNMENT = 64
+
+# Datasets already attached in this process, keyed by shared memory name
+_attached = {}
+
+
+def _align(offset):
+    return (offset + _ALIGNMENT - 1) // _ALIGNMENT * _ALIGNMENT
+
+
+class SharedDataset:
+    """
+    A prepared dataset (timestamps plus OHLCV and indicator columns) held once in shared memory.
+
+    The publishing process calls `SharedDataset.publish(df)` and passes `dataset.name` to its
+    workers. Workers call `SharedDataset.attach(name)` (or `get_shared_dataset(name)`) and read
+    zero-copy, read-only NumPy views of each column instead of unpickling their own DataFrame.
+
+    The views (and frames from `to_frame()`) point into the shared block, so `close()` raises a
+    BufferError while any of them is still alive rather than unmapping memory they read.
+    """
+
+    def __init__(self, shm, header, owner):
+        self._shm = shm
+        self._owner = owner
+        self.header = header
+        self.columns = {}
+
+        rows = header['rows']
+        # frombuffer keeps the block exported while a view is alive, which makes closing it fail safely
+        index_ns = np.frombuffer(shm.buf, dtype=np.int64, count=rows, offset=header['index_offset'])
+        index_ns.flags.writeable = False
+        self.index_ns = index_ns
+        for col in header['columns']:
+            array = np.frombuffer(shm.buf, dtype=np.dtype(col['dtype']), count=rows, offset=col['offset'])
+            array.flags.writeable = False
+            self.columns[col['name']] = array
+
+    @classmethod
+    def publish(cls, df, name=None):
+        """Copies a DataFrame with a DatetimeIndex into a new shared memory block."""
+        index = pd.DatetimeIndex(df.index)
+        rows = len(df)
+        columns = []
+        # Offsets are relative to the end of the header until its size is known; the index comes first
+        offset = _align(rows * 8)
+        for col in df.columns:
+            dtype = df[col].to_numpy().dtype
+            if dtype.kind not in 'biuf':
+                raise ValueError(f"Column '{col}' has non-numeric dtype {dtype} and cannot be shared.")
+            columns.append({'name': str(col), 'dtype': dtype.str, 'offset': offset})
+            offset = _align(offset + rows * dtype.itemsize)
+
+        header = {
+            'rows': rows,
+            'tz': str(index.tz) if index.tz is not None else None,
+            'unit': index.unit,
+            'index_name': index.name,
+            'columns': columns,
+        }
+        # The header size depends on the offsets it contains, so reserve generous room for digits
+        header_size = _align(_HEADER_LENGTH.size + len(json.dumps(header)) + 32 * (len(columns) + 1))
+        header['index_offset'] = header_size
+        for col in columns:
+            col['offset'] += header_size
+        header_bytes = json.dumps(header).encode()
+
+        shm = shared_memory.SharedMemory(name=name or f"bt_{uuid.uuid4().hex[:12]}", create=True,
+                                         size=max(header_size + offset, 1))
+        shm.buf[:_HEADER_LENGTH.size] = _HEADER_LENGTH.pack(len(header_bytes))
+        shm.buf[_HEADER_LENGTH.size:_HEADER_LENGTH.size + len(header_bytes)] = header_bytes
+
+        np.ndarray((rows,), dtype=np.int64, buffer=shm.buf,
+                   offset=header['index_offset'])[:] = index.as_unit('ns').asi8
+        for col in columns:
+            np.ndarray((rows,), dtype=np.dtype(col['dtype']), buffer=shm.buf,
+                       offset=col['offset'])[:] = df[col['name']].to_numpy()
+
+        dataset = cls(shm, header, owner=True)
+        print(f"Published {rows} rows x {len(columns)} columns to shared memory '{shm.name}' "
+              f"({shm.size / 1e6:.1f} MB).")
+        return dataset
+
+    @classmethod
+    def attach(cls, name):
+        """Attaches to a dataset published by another process."""
+        shm = shared_memory.SharedMemory(name=name)
+        header_length = _HEADER_LENGTH.unpack(bytes(shm.buf[:_HEADER_LENGTH.size]))[0]
+        header = json.loads(bytes(shm.buf[_HEADER_LENGTH.size:_HEADER_LENGTH.size + header_length]))
+        return cls(shm, header, owner=False)
+
+    @property
+    def name(self):
+        return self._shm.name
+
+    def __len__(self):
+        return self.header['rows']
+
+    def __getitem__(self, column):
+        return self.columns[column]
+
+    @property
+    def index(self):
+        """The timestamps as a DatetimeIndex (a small copy, unlike the columns)."""
+        index = pd.DatetimeIndex(self.index_ns.astype('datetime64[ns]'), name=self.header['index_name'])
+        if self.header['tz'] is not None:
+            index = index.tz_localize('UTC').tz_convert(self.header['tz'])
+        return index.as_unit(self.header['unit'])
+
+    def to_frame(self, columns=None):
+        """Builds a DataFrame over the shared columns without copying the column data."""
+        names = columns if columns is not None else list(self.columns)
+        return pd.DataFrame({c: self.columns[c] for c in names}, index=self.index, copy=False)
+
+    def close(self):
+        """
+        Releases this process's views. The owner also frees the shared memory block.
+        Raises BufferError while columns or frames from this dataset are still alive; close again once
+        they are deleted.
+        """
+        self.columns = {}
+        self.index_ns = None
+        _attached.pop(self._shm.name, None)
+        name = self._shm.name
+        try:
+            self._shm.close()
+        except BufferError:
+            raise BufferError(f"Columns or frames of shared dataset '{name}' are still in use; "
+                              f"delete them before closing it.") from None
+        if self._owner:
+            self._shm.unlink()
+            print(f"Released shared memory '{name}'.")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def get_shared_dataset(name):
+    """Attaches to a shared dataset once per process and reuses the views for later tasks."""
+    if name not in _attached:
+        _attached[name] = SharedDataset.attach(name)
+    return _attached[name]
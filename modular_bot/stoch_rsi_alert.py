@@ -0,0 +1,100 @@
+# stoch_rsi_alert.py
+"""
+Historical evaluation of the stoch RSI alert in the root rsi_alert.py.
+
+The live alert keeps STOCHRSIk_14_14_3_3 of the hourly closes and sends a message while the
+forming candle's value is below 25 or above 75. Here each candle is evaluated once, at its close,
+over the full history: how often the alert fires and what price did 1, 4, 12 and 24 candles later.
+
+The stoch RSI and the forward returns are computed once per epic; every threshold is then one
+row of a boolean matrix, so a grid of thresholds costs little more than a single one.
+"""
+import numpy as np
+import pandas as pd
+
+from modular_bot import indicators
+
+HORIZONS = (1, 4, 12, 24)
+QUANTILES = (0.1, 0.25, 0.5, 0.75, 0.9)
+
+
+def forward_returns(close, horizons=HORIZONS):
+    """Percent return from each close to the close `h` candles later, one row per horizon (NaN past the end)."""
+    close = np.asarray(close, dtype=float)
+    returns = np.full((len(horizons), len(close)), np.nan)
+    for row, horizon in enumerate(horizons):
+        if horizon < len(close):
+            returns[row, :-horizon] = (close[horizon:] / close[:-horizon] - 1) * 100.0
+    return returns
+
+
+def masked_quantiles(values, masks, quantiles=QUANTILES):
+    """
+    Quantiles of `values` over the candles of each row of `masks`, interpolated like np.nanquantile.
+    NaN values are ignored. Returns an array of shape (len(masks), len(quantiles)).
+
+    The values are sorted once; a row's k-th smallest value is where its running count reaches k.
+    """
+    order = np.argsort(values, kind='stable')  # NaNs sort last
+    sorted_values = values[order]
+    running_count = np.cumsum(masks[:, order] & ~np.isnan(sorted_values), axis=1)
+    result = np.full((len(masks), len(quantiles)), np.nan)
+    for row in range(len(masks)):
+        count = running_count[row, -1] if running_count.shape[1] else 0
+        if count == 0:
+            continue
+        position = np.asarray(quantiles) * (count - 1)
+        below, above = np.floor(position), np.ceil(position)
+        lower_value = sorted_values[np.searchsorted(running_count[row], below + 1)]
+        upper_value = sorted_values[np.searchsorted(running_count[row], above + 1)]
+        result[row] = lower_value + (upper_value - lower_value) * (position - below)
+    return result
+
+
+def evaluate_alert(datasets, lower=(25,), upper=(75,), horizons=HORIZONS, quantiles=QUANTILES,
+                   length=14, rsi_length=14, k=3, d=3):
+    """
+    Evaluates the alert rule over the full history of every epic in `datasets` (epic -> DataFrame
+    with a 'close' column), for every threshold in `lower` (oversold: k below it) and `upper`
+    (overbought: k above it).
+
+    Returns a DataFrame with one row per epic, side, threshold and horizon: the number of alert
+    candles and their share of all candles with a stoch RSI value, the number of alert episodes
+    (runs of consecutive alert candles), and the distribution of forward returns after the alert
+    candles. A 'baseline' row per epic and horizon gives the same distribution over every candle.
+    """
+    lower, upper = np.asarray(lower, dtype=float), np.asarray(upper, dtype=float)
+    rows = []
+    for epic, df in datasets.items():
+        close = df['close'].to_numpy(dtype=float)
+        k_line, _ = indicators.stochrsi(close, length, rsi_length, k, d)
+        defined = ~np.isnan(k_line)
+        # NaN compares False, so candles before the warm-up never alert
+        with np.errstate(invalid='ignore'):
+            masks = np.vstack((defined, k_line < lower[:, None], k_line > upper[:, None]))
+        labels = ([('baseline', np.nan)] + [('oversold', threshold) for threshold in lower]
+                  + [('overbought', threshold) for threshold in upper])
+
+        alerts = masks.sum(axis=1)
+        episodes = (masks & ~np.hstack((np.zeros((len(masks), 1), dtype=bool), masks[:, :-1]))).sum(axis=1)
+        returns = forward_returns(close, horizons)
+        weights = masks.astype(float)
+        for horizon, horizon_returns in zip(horizons, returns):
+            known = ~np.isnan(horizon_returns)
+            samples = (masks & known).sum(axis=1)
+            filled = np.where(known, horizon_returns, 0.0)
+            with np.errstate(invalid='ignore', divide='ignore'):
+                mean_return = (weights @ filled) / samples
+                positive_percent = (weights @ (filled > 0)) / samples * 100.0
+            horizon_quantiles = masked_quantiles(horizon_returns, masks, quantiles)
+            for row, (side, threshold) in enumerate(labels):
+                rows.append({
+                    'epic': epic, 'side': side, 'threshold': threshold, 'horizon': horizon,
+                    'alerts': alerts[row], 'alert_percent': alerts[row] / max(defined.sum(), 1) * 100.0,
+                    'episodes': episodes[row], 'samples': samples[row], 'mean_return': mean_return[row],
+                    'positive_percent': positive_percent[row],
+                    **{f"p{round(q * 100)}": value for q, value in zip(quantiles, horizon_quantiles[row])},
+                })
+        print(f"Evaluated the stoch RSI alert on {epic}: {len(close)} candles, "
+              f"{len(lower)} oversold and {len(upper)} overbought thresholds.")
+    return pd.DataFrame(rows)
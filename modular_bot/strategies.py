@@ -1,14 +1,22 @@
+import numpy as np
 import pandas as pd
 from datetime import datetime, time
 # Assuming filters.py is in the same directory
-from filters import BaseFilter
+from modular_bot.filters import BaseFilter, AndFilter
+from modular_bot.indicators import compute_indicators
+from modular_bot.touch_index import TouchIndex, first_of
 
 
 class BaseStrategy:
-    """A blueprint for all strategy modules, now with filter handling."""
+    """
+    A blueprint for all strategy modules, now with filter handling.
+
+    The strategy works on the DataFrame it is given rather than a copy: missing indicator
+    columns are added to it, but existing columns and rows are never changed.
+    """
 
     def __init__(self, df, filters: list[BaseFilter] = None):
-        self.df = df.copy()
+        self.df = df
         self.filters = filters if filters is not None else []
 
     def _generate_raw_signals(self):
@@ -22,18 +30,35 @@ class BaseStrategy:
         """Returns the strategy's parameters as a dictionary for reporting."""
         raise NotImplementedError("You must implement the get_params method!")
 
+    def indicator_columns(self) -> list[str]:
+        """Returns the indicator columns the strategy itself reads. Override in child strategies."""
+        return []
+
+    def required_indicators(self) -> list[str]:
+        """Returns the indicator columns read by the strategy and its filters, without duplicates."""
+        columns = list(self.indicator_columns())
+        for f in self.filters:
+            columns += [c for c in f.required_indicators() if c not in columns]
+        return columns
+
+    def ensure_indicators(self):
+        """Calculates any required indicator column that the data does not have yet."""
+        missing = [c for c in self.required_indicators() if c not in self.df.columns]
+        if missing:
+            print(f"Calculating missing indicators: {', '.join(missing)}...")
+            compute_indicators(self.df, missing)
+
     def generate_signals(self):
         """
         Generates the final signals by applying all filters to the raw signals.
+        Returns a DataFrame with only 'signal' and 'stop_loss_price' columns, sharing the data's index,
+        to pass to `run_backtest` alongside the data rather than joined onto it.
         """
+        self.ensure_indicators()
         raw_signals_df = self._generate_raw_signals()
 
-        # Start with a baseline condition that is always true
-        final_filter = pd.Series(True, index=self.df.index)
-
-        # Apply each filter sequentially
-        for f in self.filters:
-            final_filter &= f.apply(self.df)
+        # AND all filters over their cached packed masks (all True when there are no filters)
+        final_filter = AndFilter(*self.filters).apply(self.df)
 
         # A signal is only valid if it occurs when the final filter is True
         raw_signals_df['signal'] = raw_signals_df['signal'].where(final_filter, 0)
@@ -41,6 +66,18 @@ class BaseStrategy:
         print(f"Generated {len(raw_signals_df[raw_signals_df['signal'] != 0])} final signals after applying filters.")
         return raw_signals_df
 
+    def signal_events(self):
+        """
+        The final signals as a sparse event list: one row per signal candle, indexed by its timestamp,
+        with its 'bar' (position in the data), 'signal' (1 or -1) and 'stop_loss_price'.
+        Pass it to `run_backtest` as `events` instead of the dense `generate_signals()` frame.
+        """
+        signals = self.generate_signals()
+        bars = np.flatnonzero(signals['signal'].to_numpy() != 0)
+        events = signals.iloc[bars]
+        return pd.DataFrame({'bar': bars, 'signal': events['signal'].to_numpy(),
+                             'stop_loss_price': events['stop_loss_price'].to_numpy()}, index=events.index)
+
 
 class MaCrossStrategy(BaseStrategy):
     """A simple Moving Average Crossover strategy with an added long-term trend filter."""
@@ -67,15 +104,14 @@ class MaCrossStrategy(BaseStrategy):
             'atr_multiplier_for_sl': self.atr_multiplier
         }
 
+    def indicator_columns(self) -> list[str]:
+        return [self.fast_ma_col, self.slow_ma_col, self.trend_col, self.atr_col]
+
     def _generate_raw_signals(self):
         """
         Generates buy (1) and sell (-1) signals based on MA crossover.
         This version now also includes the long-term trend direction as a filter.
         """
-        signals_df = pd.DataFrame(index=self.df.index)
-        signals_df['signal'] = 0
-        signals_df['stop_loss_price'] = 0.0
-
         # Raw crossover signals
         crossover = (self.df[self.fast_ma_col] > self.df[self.slow_ma_col]) & \
                     (self.df[self.fast_ma_col].shift(1) <= self.df[self.slow_ma_col].shift(1))
@@ -88,21 +124,24 @@ class MaCrossStrategy(BaseStrategy):
         in_downtrend = self.df['close'] < self.df[self.trend_col]
 
         # Combine raw signals with the trend filter
-        long_condition = crossover & in_uptrend
-        short_condition = crossunder & in_downtrend
+        long_condition = (crossover & in_uptrend).to_numpy()
+        short_condition = (crossunder & in_downtrend).to_numpy()
 
-        for index, row in self.df[long_condition].iterrows():
-            signals_df.loc[index, 'signal'] = 1
-            signals_df.loc[index, 'stop_loss_price'] = row['low'] - (row[self.atr_col] * self.atr_multiplier)
+        # Stop losses sit an ATR multiple beyond the signal candle's low (long) or high (short)
+        atr_distance = self.df[self.atr_col].to_numpy() * self.atr_multiplier
+        long_stop = self.df['low'].to_numpy() - atr_distance
+        short_stop = self.df['high'].to_numpy() + atr_distance
 
-        for index, row in self.df[short_condition].iterrows():
-            signals_df.loc[index, 'signal'] = -1
-            signals_df.loc[index, 'stop_loss_price'] = row['high'] + (row[self.atr_col] * self.atr_multiplier)
+        signals_df = pd.DataFrame({
+            'signal': np.select([short_condition, long_condition], [-1, 1], 0),
+            'stop_loss_price': np.select([short_condition, long_condition], [short_stop, long_stop], 0.0),
+        }, index=self.df.index)
 
         print(f"Generated {len(signals_df[signals_df['signal'] != 0])} raw signals for MA Cross.")
         return signals_df
 
-# --- ORB Strategy remains unchanged as it doesn't use filters yet ---
+
+# --- ORB Strategy: its own daily breakout logic, without filters ---
 class OrbStrategy(BaseStrategy):
     """Opening Range Breakout (ORB) Strategy."""
 
@@ -118,23 +157,26 @@ class OrbStrategy(BaseStrategy):
         }
 
     def _generate_raw_signals(self):
-        signals_df = pd.DataFrame(index=self.df.index)
-        signals_df['signal'] = 0
-        signals_df['stop_loss_price'] = 0.0
+        signal = np.zeros(len(self.df), dtype=np.int64)
+        stop_loss_price = np.zeros(len(self.df))
+        highs, lows = TouchIndex(self.df['high']), TouchIndex(self.df['low'])
         for date, day_candles in self.df.groupby(self.df.index.date):
             opening_candle_time = datetime.combine(date, self.session_open_time).replace(tzinfo=day_candles.index.tz)
             if opening_candle_time not in day_candles.index: continue
             first_candle = day_candles.loc[opening_candle_time]
             range_high, range_low = first_candle['high'], first_candle['low']
             if range_high == range_low: continue
-            for idx, candle in day_candles[day_candles.index > opening_candle_time].iterrows():
-                if candle['high'] > range_high:
-                    signals_df.loc[idx, 'signal'], signals_df.loc[idx, 'stop_loss_price'] = 1, range_low
-                    break
-                elif candle['low'] < range_low:
-                    signals_df.loc[idx, 'signal'], signals_df.loc[idx, 'stop_loss_price'] = -1, range_high
-                    break
-        return signals_df
+            # The first candle after the opening one that breaks out of the range, within the day
+            start = self.df.index.get_loc(opening_candle_time) + 1
+            day_end = self.df.index.searchsorted(day_candles.index[-1], side='right')
+            breakout = first_of(highs.first_at_or_above(start, np.nextafter(range_high, np.inf), day_end),
+                                lows.first_at_or_below(start, np.nextafter(range_low, -np.inf), day_end))
+            if breakout is None: continue
+            if highs.values[breakout] > range_high:
+                signal[breakout], stop_loss_price[breakout] = 1, range_low
+            else:
+                signal[breakout], stop_loss_price[breakout] = -1, range_high
+        return pd.DataFrame({'signal': signal, 'stop_loss_price': stop_loss_price}, index=self.df.index)
 
     def generate_signals(self):
         # ORB has its own daily logic, so we bypass the standard filter application for now
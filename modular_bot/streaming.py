@@ -0,0 +1,366 @@
+# streaming.py
+"""
+Stateful indicators for live bots that update in O(1) per completed bar.
+
+Each indicator takes bars as mappings with 'open', 'high', 'low', 'close' and 'volume'
+keys (only the keys it needs). `push(bar)` adds a completed bar and returns the new value;
+`peek(bar)` returns the value the still-forming bar would give without changing the state.
+Values match the batch kernels in `indicators.py` on the same bars.
+"""
+import copy
+import heapq
+import math
+from collections import deque
+
+NAN = float('nan')
+_EPSILON = 2.220446049250313e-16
+
+
+class StreamingIndicator:
+    value = NAN
+
+    def push(self, bar):
+        raise NotImplementedError
+
+    def peek(self, bar):
+        """Value including a forming bar, leaving the indicator as it was."""
+        return copy.deepcopy(self).push(bar)
+
+    def warm_up(self, df):
+        """Pushes every row of a DataFrame of completed bars and returns the last value."""
+        for bar in df.to_dict('records'):
+            self.push(bar)
+        return self.value
+
+
+class StreamingEwm:
+    """
+    One step of pandas' exponentially weighted mean, so every value equals
+    `Series.ewm(alpha=alpha, adjust=adjust, min_periods=min_periods).mean()`, NaN handling included.
+    """
+
+    def __init__(self, alpha, adjust=False, min_periods=0):
+        self.decay = 1.0 - alpha
+        self.new_weight = 1.0 if adjust else alpha
+        self.adjust = adjust
+        self.min_periods = max(min_periods, 1)
+        self.weighted = NAN
+        self.old_weight = 1.0
+        self.observations = 0
+        self.value = NAN
+
+    def push(self, x):
+        is_observation = x == x
+        self.observations += is_observation
+        if self.weighted == self.weighted:
+            # pandas' ignore_na=False: weights keep decaying over missing values
+            self.old_weight *= self.decay
+            if is_observation:
+                if self.weighted != x:
+                    self.weighted = ((self.old_weight * self.weighted + self.new_weight * x)
+                                     / (self.old_weight + self.new_weight))
+                self.old_weight = self.old_weight + self.new_weight if self.adjust else 1.0
+        elif is_observation:
+            self.weighted = x
+        self.value = self.weighted if self.observations >= self.min_periods else NAN
+        return self.value
+
+
+def _rma(length, ta_compatible):
+    if ta_compatible:
+        return StreamingEwm(1.0 / length, adjust=True, min_periods=length)
+    return StreamingEwm(1.0 / length, adjust=False)
+
+
+class StreamingEma(StreamingIndicator):
+    """EMA of the close, equal to `indicators.ema`."""
+
+    def __init__(self, span):
+        self.ewm = StreamingEwm(2.0 / (span + 1.0), adjust=False)
+
+    def push(self, bar):
+        self.value = self.ewm.push(bar['close'])
+        return self.value
+
+
+class StreamingAtr(StreamingIndicator):
+    """Wilder ATR, equal to `indicators.atr` with the same ta_compatible setting."""
+
+    def __init__(self, length=14, ta_compatible=False):
+        self.ta_compatible = ta_compatible
+        self.rma = _rma(length, ta_compatible)
+        self.prev_close = None
+        self.true_range = NAN
+
+    def _true_range(self, bar):
+        if self.prev_close is None:
+            return NAN if self.ta_compatible else bar['high'] - bar['low']
+        return max(bar['high'] - bar['low'], abs(bar['high'] - self.prev_close), abs(bar['low'] - self.prev_close))
+
+    def push(self, bar):
+        self.true_range = self._true_range(bar)
+        self.prev_close = bar['close']
+        self.value = self.rma.push(self.true_range)
+        return self.value
+
+
+class StreamingAdx(StreamingIndicator):
+    """ADX, equal to `indicators.adx` with the same length and ta_compatible setting."""
+
+    def __init__(self, length=14, ta_compatible=False):
+        self.ta_compatible = ta_compatible
+        self.atr = StreamingAtr(length, ta_compatible)
+        self.plus_rma = _rma(length, ta_compatible)
+        self.minus_rma = _rma(length, ta_compatible)
+        self.dx_rma = _rma(length, ta_compatible)
+        self.prev_high = None
+        self.prev_low = None
+
+    def push(self, bar):
+        if self.prev_high is None:
+            plus_dm = minus_dm = NAN if self.ta_compatible else 0.0
+        else:
+            up, down = bar['high'] - self.prev_high, self.prev_low - bar['low']
+            plus_wins, minus_wins = up > down, down > up
+            if self.ta_compatible:
+                plus_wins, minus_wins = plus_wins and up > 0, minus_wins and down > 0
+            plus_dm, minus_dm = (up if plus_wins else 0.0), (down if minus_wins else 0.0)
+        self.prev_high, self.prev_low = bar['high'], bar['low']
+
+        atr = self.atr.push(bar)
+        plus_smoothed, minus_smoothed = self.plus_rma.push(plus_dm), self.minus_rma.push(minus_dm)
+        # No range or no directional movement yet (e.g. flat bars from the start): DX is undefined
+        if atr == 0 or plus_smoothed + minus_smoothed == 0:
+            dx = NAN
+        else:
+            plus_di, minus_di = 100 * plus_smoothed / atr, 100 * minus_smoothed / atr
+            dx = 100 * abs(plus_di - minus_di) / (plus_di + minus_di)
+        self.value = self.dx_rma.push(dx if math.isfinite(dx) else NAN)
+        return self.value
+
+
+class StreamingRsi(StreamingIndicator):
+    """RSI of the close, equal to `indicators.rsi` (pandas_ta's formula)."""
+
+    def __init__(self, length=14):
+        self.gains = _rma(length, ta_compatible=True)
+        self.losses = _rma(length, ta_compatible=True)
+        self.prev_close = None
+
+    def push(self, bar):
+        change = NAN if self.prev_close is None else bar['close'] - self.prev_close
+        self.prev_close = bar['close']
+        gain_avg = self.gains.push(0.0 if change < 0 else change)
+        loss_avg = abs(self.losses.push(0.0 if change > 0 else change))
+        try:
+            self.value = 100 * gain_avg / (gain_avg + loss_avg)
+        except ZeroDivisionError:
+            self.value = NAN
+        return self.value
+
+
+class _RollingWindow:
+    """Rolling min and max over the last `window` values using monotonic deques."""
+
+    def __init__(self, window):
+        self.window = window
+        self.count = 0
+        self.last_nan = -1
+        self.maxima = deque()
+        self.minima = deque()
+
+    def push(self, x):
+        i = self.count
+        self.count += 1
+        if x != x:
+            self.last_nan = i
+        else:
+            while self.maxima and self.maxima[-1][1] <= x:
+                self.maxima.pop()
+            while self.minima and self.minima[-1][1] >= x:
+                self.minima.pop()
+            self.maxima.append((i, x))
+            self.minima.append((i, x))
+        start = i - self.window + 1
+        while self.maxima and self.maxima[0][0] < start:
+            self.maxima.popleft()
+        while self.minima and self.minima[0][0] < start:
+            self.minima.popleft()
+        # Like pandas, a window is NaN until it is full or while it contains a NaN
+        if start < 0 or self.last_nan >= start:
+            return NAN, NAN
+        return self.minima[0][1], self.maxima[0][1]
+
+
+class _RollingMean:
+    """Mean of the last `length` values, summed in the same order as `indicators.sma`."""
+
+    def __init__(self, length):
+        self.values = deque(maxlen=length)
+
+    def push(self, x):
+        self.values.append(x)
+        if len(self.values) < self.values.maxlen:
+            return NAN
+        total = 0.0
+        for v in self.values:
+            total += v
+        return total / self.values.maxlen
+
+
+class StreamingStochRsi(StreamingIndicator):
+    """
+    Stochastic RSI equal to `indicators.stochrsi`. `value` is the k line and `d` the d line.
+
+    pandas_ta nudges the whole series by machine epsilon when any RSI range is zero; a stream
+    can only apply that to the bars that have a zero range, which changes values by ~1e-14 at most.
+    In a flat market the RSI range itself shrinks to rounding level and both versions return noise.
+    """
+
+    def __init__(self, length=14, rsi_length=14, k=3, d=3):
+        self.rsi = StreamingRsi(rsi_length)
+        self.window = _RollingWindow(length)
+        self.k_mean = _RollingMean(k)
+        self.d_mean = _RollingMean(d)
+        self.d = NAN
+
+    def push(self, bar):
+        rsi = self.rsi.push(bar)
+        lowest, highest = self.window.push(rsi)
+        rsi_range = highest - lowest
+        stoch = 100 * (rsi - lowest) / (rsi_range if rsi_range != 0 else _EPSILON)
+        self.value = self.k_mean.push(stoch)
+        self.d = self.d_mean.push(self.value)
+        return self.value
+
+
+def _price(bar, price):
+    if price == 'ohlc4':
+        return (bar['open'] + bar['high'] + bar['low'] + bar['close']) / 4
+    if price == 'hlc3':
+        return (bar['high'] + bar['low'] + bar['close']) / 3
+    return bar[price]
+
+
+class StreamingVwap(StreamingIndicator):
+    """
+    Cumulative VWAP since the first bar (or the last `reset()`), as in main.py:
+    cumsum(price * volume) / cumsum(volume). `price` is 'ohlc4', 'hlc3' or a bar key.
+    """
+
+    def __init__(self, price='ohlc4'):
+        self.price = price
+        self.reset()
+
+    def reset(self):
+        self.price_volume = 0.0
+        self.volume = 0.0
+        self.value = NAN
+
+    def push(self, bar):
+        self.price_volume += _price(bar, self.price) * bar['volume']
+        self.volume += bar['volume']
+        self.value = self.price_volume / self.volume if self.volume else NAN
+        return self.value
+
+
+class StreamingAnchoredVwap(StreamingVwap):
+    """VWAP from an anchor time onwards. Bars need a 'time' key; bars before the anchor are skipped."""
+
+    def __init__(self, anchor, price='ohlc4'):
+        super().__init__(price)
+        self.anchor = anchor
+
+    def push(self, bar):
+        if bar['time'] < self.anchor:
+            return self.value
+        return super().push(bar)
+
+
+class RollingQuantile:
+    """
+    Quantile of the last `window` values, equal to `Series.rolling(window).quantile(quantile)`
+    (linear interpolation; NaN until the window is full or while it holds a NaN).
+
+    The window is split between a max-heap of the lowest values and a min-heap of the rest, sized
+    so the interpolated order statistics sit on the two heap tops. Values leaving the window are
+    deleted lazily when they surface, so each push is O(log window).
+    """
+
+    def __init__(self, window, quantile):
+        if not 0 <= quantile <= 1:
+            raise ValueError(f"quantile must be between 0 and 1, got {quantile}.")
+        self.window = window
+        self.quantile = quantile
+        self.values = deque()
+        self.count = 0
+        self.nans = 0
+        self.low = []
+        self.high = []
+        self.low_size = 0
+        self.high_size = 0
+        self.expired = set()
+        self.value = NAN
+
+    def _in_low(self, item):
+        return bool(self.low) and (-self.low[0][0], -self.low[0][1]) >= item
+
+    def _prune(self):
+        for heap in (self.low, self.high):
+            while heap and abs(heap[0][1]) in self.expired:
+                self.expired.discard(abs(heap[0][1]))
+                heapq.heappop(heap)
+            if len(heap) > 2 * self.window + 16:
+                # Rebuild when buried expired entries start to dominate, keeping pushes amortised O(log w)
+                live = [entry for entry in heap if abs(entry[1]) not in self.expired]
+                self.expired.difference_update(abs(entry[1]) for entry in heap if abs(entry[1]) in self.expired)
+                heap[:] = live
+                heapq.heapify(heap)
+
+    def push(self, x):
+        # Sequence numbers start at 1 so the max-heap can store them negated
+        self.count += 1
+        item = (x, self.count)
+        self.values.append(item)
+        if x != x:
+            self.nans += 1
+        elif self._in_low(item):
+            heapq.heappush(self.low, (-x, -self.count))
+            self.low_size += 1
+        else:
+            heapq.heappush(self.high, item)
+            self.high_size += 1
+
+        if len(self.values) > self.window:
+            old = self.values.popleft()
+            if old[0] != old[0]:
+                self.nans -= 1
+            else:
+                if self._in_low(old):
+                    self.low_size -= 1
+                else:
+                    self.high_size -= 1
+                self.expired.add(old[1])
+                self._prune()
+
+        observations = self.low_size + self.high_size
+        target = int(math.floor(self.quantile * (observations - 1))) + 1 if observations else 0
+        while self.low_size > target:
+            value, seq = heapq.heappop(self.low)
+            heapq.heappush(self.high, (-value, -seq))
+            self.low_size, self.high_size = self.low_size - 1, self.high_size + 1
+            self._prune()
+        while self.low_size < target:
+            value, seq = heapq.heappop(self.high)
+            heapq.heappush(self.low, (-value, -seq))
+            self.low_size, self.high_size = self.low_size + 1, self.high_size - 1
+            self._prune()
+
+        if len(self.values) < self.window or self.nans:
+            self.value = NAN
+            return self.value
+        position = self.quantile * (observations - 1)
+        lower = -self.low[0][0]
+        fraction = position - (target - 1)
+        self.value = lower if fraction == 0 else lower + (self.high[0][0] - lower) * fraction
+        return self.value
@@ -0,0 +1,174 @@
+import numpy as np
+import pandas as pd
+import pytest
+from modular_bot.backtester import Position, run_backtest, run_backtest_batch, run_backtest_sharded, complete_rows
+from modular_bot.strategies import MaCrossStrategy
+
+
+@pytest.fixture
+def candles():
+    """Two 15-minute candles: a long signal, then a candle that reaches both the stop (99) and the target (101)."""
+    index = pd.to_datetime(['2025-01-02 10:00', '2025-01-02 10:15'])
+    return pd.DataFrame({'high': [100.2, 101.5], 'low': [99.8, 98.5], 'close': [100.0, 100.0],
+                         'ATRr_14': [1.0, 1.0], 'signal': [1, 0], 'stop_loss_price': [99.0, 0.0]}, index=index)
+
+
+def _one_minute_bars(start, lows, highs):
+    index = pd.date_range(start, periods=len(lows), freq='1min')
+    return pd.DataFrame({'high': highs, 'low': lows}, index=index)
+
+
+def _exit_price(candles, intrabar_df=None):
+    trades = run_backtest(candles, 'TEST', 10000.0, risk_reward_ratio=1.0, trailing_stop_atr_multiplier=999,
+                          intrabar_df=intrabar_df)
+    return trades[0]['exit_price']
+
+
+def test_intrabar_data_settles_ambiguous_candles(candles):
+    """A candle that reaches both exits is settled by whichever level the 1m bars reached first."""
+    # Arrange
+    stop_first = _one_minute_bars('2025-01-02 10:15', lows=[99.5, 98.5, 99.9], highs=[100.1, 100.0, 101.5])
+    target_first = _one_minute_bars('2025-01-02 10:15', lows=[99.5, 99.9, 98.5], highs=[100.1, 101.5, 100.0])
+    # A 1m bar after the candle reaches the stop first; it must not be looked at
+    target_first = pd.concat([_one_minute_bars('2025-01-02 10:00', lows=[99.9], highs=[100.1]), target_first,
+                              _one_minute_bars('2025-01-02 10:30', lows=[90.0], highs=[100.0])])
+
+    # Act / Assert
+    assert _exit_price(candles) == 101.0
+    assert _exit_price(candles, stop_first) == 99.0
+    assert _exit_price(candles, target_first) == 101.0
+    # Without 1m bars inside the candle the candle-level order is kept
+    assert _exit_price(candles, _one_minute_bars('2025-01-03 10:00', lows=[98.0], highs=[102.0])) == 101.0
+    with pytest.raises(ValueError):
+        _exit_price(candles, stop_first.iloc[::-1])
+
+
+def test_batch_backtest_matches_separate_runs():
+    """Every combination of a batched grid gives the same trades as its own run_backtest call."""
+    # Arrange
+    rng = np.random.default_rng(5)
+    close = 100 + np.cumsum(rng.normal(0, 0.5, 3000))
+    df = pd.DataFrame({'open': close, 'high': close + rng.uniform(0, 1, 3000), 'low': close - rng.uniform(0, 1, 3000),
+                       'close': close}, index=pd.date_range('2025-01-01', periods=3000, freq='15min'))
+    strategy = MaCrossStrategy(df, fast_ma=5, slow_ma=20, trend_period=50)
+    signals = strategy.generate_signals()
+    rows = complete_rows(df)
+    grid = {'risk_reward_ratio': [1.0, 2.5], 'trailing_stop_atr_multiplier': [1.5, 999], 'atr_multiplier': [1, 3]}
+
+    # Act
+    results, ledgers = run_backtest_batch(df.iloc[rows], 'TEST', 10000.0, grid, signals=signals.iloc[rows])
+
+    # Assert
+    assert len(results) == 8 and results['trades'].gt(0).all()
+    for combination, ledger in zip(results.itertuples(), ledgers):
+        strategy.atr_multiplier = combination.atr_multiplier
+        expected = run_backtest(df.iloc[rows], 'TEST', 10000.0, risk_reward_ratio=combination.risk_reward_ratio,
+                                trailing_stop_atr_multiplier=combination.trailing_stop_atr_multiplier,
+                                signals=strategy.generate_signals().iloc[rows])
+        assert ledger == expected
+        assert combination.final_balance == pytest.approx(10000.0 + sum(t['pnl'] for t in expected))
+
+
+def test_skipping_candles_inside_trades_matches_stepping_every_candle():
+    """run_backtest jumps to the candles where a trade can exit or trail; the trades are the same as stepping."""
+    # Arrange
+    rng = np.random.default_rng(9)
+    close = 100 + np.cumsum(rng.normal(0, 0.3, 5000))
+    signal = np.where(rng.uniform(size=5000) < 0.02, rng.choice([-1, 1], 5000), 0)
+    df = pd.DataFrame({'high': close + rng.uniform(0, 0.5, 5000), 'low': close - rng.uniform(0, 0.5, 5000),
+                       'close': close, 'ATRr_14': rng.uniform(0.2, 0.8, 5000), 'signal': signal},
+                      index=pd.date_range('2025-01-01', periods=5000, freq='15min'))
+    df['stop_loss_price'] = np.where(signal == 1, df['low'] - 1, np.where(signal == -1, df['high'] + 1, 0.0))
+
+    for risk_reward_ratio, trailing_stop_atr_multiplier in ((1.5, 2.5), (10, 999)):
+        # Act
+        trades = run_backtest(df, 'TEST', 10000.0, 2.0, risk_reward_ratio, trailing_stop_atr_multiplier)
+
+        # Assert
+        position = Position('TEST', 10000.0, 2.0, risk_reward_ratio, trailing_stop_atr_multiplier, verbose=False)
+        columns = df[['high', 'low', 'close', 'ATRr_14', 'signal', 'stop_loss_price']].to_numpy()
+        for timestamp, row in zip(df.index, columns):
+            position.update(timestamp, *row)
+        assert trades == position.trades
+
+
+def test_sharded_backtest_matches_the_serial_run():
+    """Shards replayed from flat and stitched at their boundaries give the serial run's trades and balances."""
+    # Arrange
+    rng = np.random.default_rng(4)
+    close = 100 + np.cumsum(rng.normal(0, 0.3, 5000))
+    signal = np.where(rng.uniform(size=5000) < 0.02, rng.choice([-1, 1], 5000), 0)
+    df = pd.DataFrame({'high': close + rng.uniform(0, 0.5, 5000), 'low': close - rng.uniform(0, 0.5, 5000),
+                       'close': close, 'ATRr_14': rng.uniform(0.2, 0.8, 5000), 'signal': signal},
+                      index=pd.date_range('2025-01-01', periods=5000, freq='15min'))
+    df['stop_loss_price'] = np.where(signal == 1, df['low'] - 1, np.where(signal == -1, df['high'] + 1, 0.0))
+
+    for risk_reward_ratio, trailing_stop_atr_multiplier, warmup_bars in ((1.5, 2.5, 50), (20, 999, 0)):
+        # Act
+        trades = run_backtest_sharded(df, 'TEST', 10000.0, 2.0, risk_reward_ratio, trailing_stop_atr_multiplier,
+                                      shard='D', warmup_bars=warmup_bars, processes=1)
+
+        # Assert
+        expected = run_backtest(df, 'TEST', 10000.0, 2.0, risk_reward_ratio, trailing_stop_atr_multiplier)
+        assert len(trades) == len(expected)
+        for trade, expected_trade in zip(trades, expected):
+            assert {key: trade[key] for key in trade if key not in ('units', 'pnl')} == \
+                   {key: expected_trade[key] for key in expected_trade if key not in ('units', 'pnl')}
+            assert trade['units'] == pytest.approx(expected_trade['units'])
+            assert trade['pnl'] == pytest.approx(expected_trade['pnl'])
+
+
+def test_signals_on_other_rows_are_rejected(candles):
+    """Signals are read by position, so a signals frame that does not share the data's index is an error."""
+    # Arrange
+    signals = candles[['signal', 'stop_loss_price']]
+
+    # Act / Assert
+    for misaligned in (signals.iloc[::-1], signals.iloc[:1], signals.shift(1, freq='15min')):
+        with pytest.raises(ValueError):
+            run_backtest(candles, 'TEST', 10000.0, signals=misaligned)
+    assert len(run_backtest(candles, 'TEST', 10000.0, signals=signals)) == 1
+
+
+def test_resuming_from_a_checkpoint_gives_the_full_run(tmp_path):
+    """A run over the first candles, checkpointed and resumed over all of them, returns the full run's trades."""
+    # Arrange
+    rng = np.random.default_rng(11)
+    close = 100 + np.cumsum(rng.normal(0, 0.3, 3000))
+    signal = np.where(rng.uniform(size=3000) < 0.02, rng.choice([-1, 1], 3000), 0)
+    df = pd.DataFrame({'high': close + rng.uniform(0, 0.5, 3000), 'low': close - rng.uniform(0, 0.5, 3000),
+                       'close': close, 'ATRr_14': rng.uniform(0.2, 0.8, 3000), 'signal': signal},
+                      index=pd.date_range('2025-01-01', periods=3000, freq='15min'))
+    df['stop_loss_price'] = np.where(signal == 1, df['low'] - 1, np.where(signal == -1, df['high'] + 1, 0.0))
+    full_run = run_backtest(df, 'TEST', 10000.0, 2.0, 3.0, 2.5)
+    # Also cut right after the entry candle of a few trades, so the checkpoint holds an open trade
+    entries = [df.index.get_loc(t['entry_time']) + 1 for t in full_run[::10]]
+    open_trades = 0
+
+    for cut in (1, 700, 2999, *entries):
+        checkpoint = str(tmp_path / f'{cut}.checkpoint.pkl')
+        run_backtest(df.iloc[:cut], 'TEST', 10000.0, 2.0, 3.0, 2.5, checkpoint=checkpoint)
+
+        # Act
+        resumed_run = run_backtest(df, 'TEST', 10000.0, 2.0, 3.0, 2.5, checkpoint=checkpoint)
+        other_params = run_backtest(df.iloc[:cut], 'TEST', 10000.0, 2.0, 1.5, 2.5, checkpoint=checkpoint)
+
+        # Assert
+        assert resumed_run == full_run
+        assert other_params == run_backtest(df.iloc[:cut], 'TEST', 10000.0, 2.0, 1.5, 2.5)
+        open_trades += any(t['entry_time'] < df.index[cut] <= t['exit_time'] for t in full_run)
+    assert open_trades > 0
+
+
+def test_checkpoint_of_other_signals_is_not_resumed(tmp_path, candles):
+    """A checkpoint is only resumed when the signal candles it has seen are unchanged."""
+    # Arrange
+    checkpoint = str(tmp_path / 'test.checkpoint.pkl')
+    run_backtest(candles.iloc[:1], 'TEST', 10000.0, checkpoint=checkpoint)
+    no_signals = candles.assign(signal=0)
+
+    # Act
+    trades = run_backtest(no_signals, 'TEST', 10000.0, checkpoint=checkpoint)
+
+    # Assert
+    assert trades == []
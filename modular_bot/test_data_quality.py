@@ -0,0 +1,55 @@
+import numpy as np
+import pandas as pd
+import pytest
+from modular_bot.data_quality import scan_data_quality
+
+
+@pytest.fixture
+def clean_candles():
+    """Creates ten clean 1-minute candles with volume."""
+    close = np.linspace(100, 101, 10)
+    df = pd.DataFrame({
+        'open': close - 0.1,
+        'high': close + 0.2,
+        'low': close - 0.2,
+        'close': close,
+        'volume': np.full(10, 50.0)
+    }, index=pd.date_range('2025-01-01 10:00', periods=10, freq='1min'))
+    return df
+
+
+def test_clean_data_has_no_anomalies(clean_candles):
+    report = scan_data_quality(clean_candles)
+    assert report.empty
+
+
+def test_detects_gap_zero_range_and_missing_volume(clean_candles):
+    # Arrange: drop two bars, flatten one bar and remove the volume column
+    df = clean_candles.drop(clean_candles.index[[4, 5]]).drop(columns='volume')
+    df.iloc[1, df.columns.get_loc('high')] = df.iloc[1]['low']
+    df.iloc[1, df.columns.get_loc('open')] = df.iloc[1]['low']
+    df.iloc[1, df.columns.get_loc('close')] = df.iloc[1]['low']
+
+    # Act
+    report = scan_data_quality(df, bar_interval='1min')
+
+    # Assert
+    issues = report.set_index('issue')
+    assert issues.loc['gap', 'bars'] == 2
+    assert issues.loc['gap', 'start'] == pd.Timestamp('2025-01-01 10:03')
+    assert issues.loc['zero_range', 'start'] == pd.Timestamp('2025-01-01 10:01')
+    assert 'missing_column:volume' in issues.index
+
+
+def test_groups_consecutive_out_of_order_and_duplicate_rows(clean_candles):
+    # Arrange: repeat two rows at the end so they are both duplicated and out of order
+    df = pd.concat([clean_candles, clean_candles.iloc[[2, 3]]])
+
+    # Act
+    report = scan_data_quality(df)
+
+    # Assert
+    duplicates = report[report['issue'] == 'duplicate_timestamp']
+    assert len(duplicates) == 1
+    assert duplicates.iloc[0]['bars'] == 2
+    assert (report['issue'] == 'out_of_order').sum() == 1
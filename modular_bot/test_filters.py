@@ -0,0 +1,125 @@
+import numpy as np
+import pandas as pd
+import pytest
+from modular_bot.filters import (AdxFilter, TimeOfDayFilter, TrendFilter, VolatilityFilter, AndFilter, pack_mask,
+                                 unpack_mask)
+
+
+@pytest.fixture
+def market_data():
+    """Eleven 15-minute bars from 07:30 with made-up ADX, ATR and EMA columns."""
+    index = pd.date_range('2025-01-02 07:30', periods=11, freq='15min')
+    return pd.DataFrame({
+        'close': [100, 101, 102, 103, 104, 105, 104, 103, 102, 101, 100],
+        'EMA_200': [102] * 11,
+        'ATRr_14': [1, 1, 2, 2, 3, 3, 2, 2, 1, 1, 1],
+        'ADX_14': [10, 20, 30, 40, 30, 20, 10, 20, 30, 40, 50],
+    }, index=index, dtype=float)
+
+
+class CountingFilter(AdxFilter):
+    """An ADX filter that counts how often its mask is actually computed."""
+
+    calls = 0
+
+    def apply(self, df):
+        CountingFilter.calls += 1
+        return super().apply(df)
+
+
+def test_filter_algebra_matches_boolean_series(market_data):
+    """&, | and ~ over packed masks give the same result as combining the boolean Series."""
+    # Arrange
+    adx = AdxFilter(adx_threshold=25)
+    session = TimeOfDayFilter('08:00', '09:30')
+    trend = TrendFilter(ema_period=200, direction='up')
+    volatility = VolatilityFilter(min_atr_percent=1.5)
+
+    # Act
+    combined = ((adx & session) | ~trend) & volatility
+
+    # Assert
+    expected = ((adx.apply(market_data) & session.apply(market_data)) | ~trend.apply(market_data)) \
+        & volatility.apply(market_data)
+    pd.testing.assert_series_equal(combined.apply(market_data), expected, check_names=False)
+    assert combined.required_indicators() == ['ADX_14', 'EMA_200', 'ATRr_14']
+    assert unpack_mask((~adx).mask(market_data), len(market_data)).sum() == 5
+    assert not (~AndFilter()).mask(market_data).any()
+
+
+def test_masks_are_cached_per_parameters_and_dataset(market_data):
+    """Re-creating a filter with the same parameters reuses its mask; new parameters or data do not."""
+    # Arrange
+    CountingFilter.calls = 0
+    session = TimeOfDayFilter('08:00', '10:00')
+
+    # Act
+    for threshold in (25, 35, 25, 35):
+        (CountingFilter(adx_threshold=threshold) & session).apply(market_data)
+    CountingFilter(adx_threshold=25).apply(market_data.copy())
+
+    # Assert
+    assert CountingFilter.calls == 3
+
+
+def test_and_filter_short_circuits_when_all_false(market_data):
+    """Once the combined mask is all False the remaining filters are not evaluated."""
+    # Arrange
+    CountingFilter.calls = 0
+    never = TimeOfDayFilter('20:00', '21:00')
+
+    # Act
+    passes = (never & CountingFilter(adx_threshold=25)).apply(market_data)
+
+    # Assert
+    assert not passes.any()
+    assert CountingFilter.calls == 0
+    np.testing.assert_array_equal(unpack_mask(pack_mask([True, False, True]), 3), [True, False, True])
+
+
+def test_cached_masks_follow_changes_to_the_data(market_data):
+    """Replacing a column a filter reads, or appending bars, recomputes its mask; other columns do not."""
+    # Arrange
+    CountingFilter.calls = 0
+    adx = CountingFilter(adx_threshold=25)
+    first = unpack_mask(adx.mask(market_data), len(market_data))
+
+    # Act
+    market_data['EMA_50'] = market_data['close']
+    unchanged = unpack_mask(adx.mask(market_data), len(market_data))
+    market_data['ADX_14'] = 60.0
+    replaced = unpack_mask(adx.mask(market_data), len(market_data))
+    market_data.loc[market_data.index[-1] + pd.Timedelta('15min')] = [99.0, 102.0, 1.0, 10.0, 99.0]
+    appended = unpack_mask(adx.mask(market_data), len(market_data))
+
+    # Assert
+    assert CountingFilter.calls == 3
+    np.testing.assert_array_equal(unchanged, first)
+    assert replaced.all() and not first.all()
+    assert len(appended) == 12 and not appended[-1]
+
+
+def test_time_of_day_filters_differing_in_seconds_have_their_own_masks(market_data):
+    """The cache key keeps the seconds of the session bounds, like `apply` does."""
+    # Act
+    to_the_minute = TimeOfDayFilter('08:00', '09:00').mask(market_data)
+    to_the_second = TimeOfDayFilter('08:00:01', '09:00').mask(market_data)
+
+    # Assert
+    assert unpack_mask(to_the_minute, 11).sum() == 4 and unpack_mask(to_the_second, 11).sum() == 3
+
+
+def test_cached_masks_follow_a_replaced_index(market_data):
+    """A new index with the same length and last timestamp still recomputes the time-of-day mask."""
+    # Arrange
+    session = TimeOfDayFilter('08:00', '09:00')
+    before = unpack_mask(session.mask(market_data), 11)
+
+    # Act
+    market_data.index = pd.date_range(end=market_data.index[-1], periods=11, freq='5min')
+    after = unpack_mask(session.mask(market_data), 11)
+
+    # Assert
+    assert before.sum() == 4
+    np.testing.assert_array_equal(after, session.apply(market_data).to_numpy())
+    assert after.sum() == 0
@@ -0,0 +1,192 @@
+import numpy as np
+import pandas as pd
+import pytest
+from modular_bot import indicators
+
+
+@pytest.fixture
+def candles():
+    """A random walk of 2,000 one-minute candles."""
+    rng = np.random.default_rng(7)
+    close = 100 + np.cumsum(rng.normal(0, 0.5, 2000))
+    high = close + rng.uniform(0, 1, 2000)
+    low = close - rng.uniform(0, 1, 2000)
+    index = pd.date_range('2025-01-01', periods=2000, freq='1min')
+    return pd.DataFrame({'high': high, 'low': low, 'close': close}, index=index)
+
+
+def test_backtester_formulas_match_pandas(candles):
+    """EMA, ATR and ADX match the pandas ewm/shift/where chain the backtester used to build."""
+    # Arrange
+    high, low, close = candles['high'], candles['low'], candles['close']
+    tr = pd.concat([high - low, (high - close.shift()).abs(), (low - close.shift()).abs()], axis=1).max(axis=1)
+    expected_atr = tr.ewm(alpha=1 / 14, adjust=False).mean()
+    up, down = high - high.shift(), low.shift() - low
+    plus_di = 100 * (up.where(up > down, 0).ewm(alpha=1 / 14, adjust=False).mean() / expected_atr)
+    minus_di = 100 * (down.where(down > up, 0).ewm(alpha=1 / 14, adjust=False).mean() / expected_atr)
+    expected_adx = (100 * (plus_di - minus_di).abs() / (plus_di + minus_di)).ewm(alpha=1 / 14, adjust=False).mean()
+
+    # Act
+    atr_values = indicators.atr(high, low, close, length=14)
+    adx_values = indicators.adx(high, low, close, length=14)
+
+    # Assert
+    np.testing.assert_allclose(indicators.ema(close, 200), close.ewm(span=200, adjust=False).mean(), atol=1e-9)
+    np.testing.assert_allclose(atr_values, expected_atr, atol=1e-9)
+    np.testing.assert_allclose(adx_values, expected_adx, atol=1e-9)
+
+
+def test_stochrsi_matches_pandas_ta_formula(candles):
+    """RSI and StochRSI follow pandas_ta: RMA with min_periods, rolling min/max, then two SMAs."""
+    # Arrange
+    close = candles['close']
+    change = close.diff()
+    gains = change.clip(lower=0).ewm(alpha=1 / 14, min_periods=14).mean()
+    losses = change.clip(upper=0).abs().ewm(alpha=1 / 14, min_periods=14).mean()
+    expected_rsi = 100 * gains / (gains + losses)
+    lowest, highest = expected_rsi.rolling(14).min(), expected_rsi.rolling(14).max()
+    expected_k = (100 * (expected_rsi - lowest) / (highest - lowest)).rolling(3).mean()
+    expected_d = expected_k.rolling(3).mean()
+
+    # Act
+    k_line, d_line = indicators.stochrsi(close, length=14, rsi_length=14, k=3, d=3)
+
+    # Assert
+    np.testing.assert_allclose(indicators.rsi(close, 14), expected_rsi, atol=1e-9)
+    np.testing.assert_allclose(k_line, expected_k, atol=1e-9)
+    np.testing.assert_allclose(d_line, expected_d, atol=1e-9)
+
+
+def test_kernels_match_pandas_ta(candles):
+    """With ta_compatible=True (and always for RSI/StochRSI) the kernels give pandas_ta's own values."""
+    ta = pytest.importorskip('pandas_ta')
+    # Arrange
+    high, low, close = candles['high'], candles['low'], candles['close']
+    expected_stochrsi = ta.stochrsi(close, length=14, rsi_length=14, k=3, d=3)
+    expected_adx = ta.adx(high, low, close, length=14)
+
+    # Act
+    k_line, d_line = indicators.stochrsi(close, length=14, rsi_length=14, k=3, d=3)
+
+    # Assert
+    np.testing.assert_allclose(indicators.rsi(close, 14), ta.rsi(close, length=14, talib=False), atol=1e-8)
+    np.testing.assert_allclose(k_line, expected_stochrsi['STOCHRSIk_14_14_3_3'], atol=1e-8)
+    np.testing.assert_allclose(d_line, expected_stochrsi['STOCHRSId_14_14_3_3'], atol=1e-8)
+    np.testing.assert_allclose(indicators.atr(high, low, close, 14, ta_compatible=True),
+                               ta.atr(high, low, close, length=14, talib=False), atol=1e-8)
+    np.testing.assert_allclose(indicators.adx(high, low, close, 14, ta_compatible=True),
+                               expected_adx['ADX_14'], atol=1e-8)
+
+
+@pytest.mark.parametrize('window', [1, 2, 3, 7, 14, 16, 33])
+def test_rolling_extremes_match_pandas_for_any_window(window):
+    """The doubling spans cover every window length exactly, NaN windows included."""
+    # Arrange
+    rng = np.random.default_rng(window)
+    values = pd.Series(rng.normal(size=500))
+    values[rng.choice(500, 5, replace=False)] = np.nan
+
+    # Act / Assert
+    np.testing.assert_array_equal(indicators.rolling_max(values, window), values.rolling(window).max())
+    np.testing.assert_array_equal(indicators.rolling_min(values, window), values.rolling(window).min())
+
+
+def test_rsi_with_leading_and_interior_nans_matches_the_formula(candles):
+    """Leading NaNs shift the RSI's start; interior NaNs are skipped by the RMAs like pandas' ewm."""
+    # Arrange
+    close = candles['close'].copy()
+    close.iloc[:5] = np.nan
+    gapped = close.copy()
+    gapped.iloc[700] = np.nan
+
+    for series in (close, gapped):
+        change = series.diff()
+        gains = change.clip(lower=0).ewm(alpha=1 / 14, min_periods=14).mean()
+        losses = change.clip(upper=0).abs().ewm(alpha=1 / 14, min_periods=14).mean()
+
+        # Act / Assert
+        np.testing.assert_allclose(indicators.rsi(series, 14), 100 * gains / (gains + losses), atol=1e-9)
+
+
+def test_rolling_extremes_and_interior_nans():
+    """Rolling min/max treat NaN windows like pandas, and EWMs with gaps fall back to pandas."""
+    # Arrange
+    values = pd.Series([3.0, 1.0, np.nan, 4.0, 1.0, 5.0, 9.0, 2.0, 6.0])
+
+    # Act / Assert
+    np.testing.assert_array_equal(indicators.rolling_max(values, 3), values.rolling(3).max())
+    np.testing.assert_array_equal(indicators.rolling_min(values, 3), values.rolling(3).min())
+    np.testing.assert_allclose(indicators.ewm_mean(values, 0.3, adjust=True),
+                               values.ewm(alpha=0.3).mean(), atol=1e-12)
+
+
+def test_compute_indicators_only_computes_requested_columns(candles):
+    """The graph adds only the requested columns, shares sub-results and reuses existing columns."""
+    # Arrange
+    df = candles.copy()
+    df['EMA_20'] = 1.0
+
+    # Act
+    indicators.compute_indicators(df, ['ADX_14', 'ATRr_14', 'EMA_20', 'STOCHRSIk_14_14_3_3'])
+
+    # Assert
+    assert list(df.columns) == ['high', 'low', 'close', 'EMA_20', 'ADX_14', 'ATRr_14', 'STOCHRSIk_14_14_3_3']
+    assert (df['EMA_20'] == 1.0).all()
+    np.testing.assert_allclose(df['ADX_14'], indicators.adx(df['high'], df['low'], df['close'], 14))
+    assert indicators.required_sub_results(['ADX_14', 'ATRr_14']) == ['TR', 'ATRr_14', 'DM', 'DMs_14', 'ADX_14']
+    with pytest.raises(ValueError):
+        indicators.compute_indicators(df, ['MACD_12_26'])
+
+
+@pytest.fixture
+def minute_candles():
+    """Three weeks of one-minute candles with volume, in London time (across the March clock change)."""
+    rng = np.random.default_rng(3)
+    index = pd.date_range('2025-03-17', '2025-04-07', freq='1min', tz='Europe/London', inclusive='left')
+    close = 1.25 + np.cumsum(rng.normal(0, 1e-4, len(index)))
+    return pd.DataFrame({'open': close, 'high': close + 2e-4, 'low': close - 2e-4, 'close': close,
+                         'volume': rng.integers(0, 50, len(index)).astype(float)}, index=index)
+
+
+def test_daily_and_weekly_vwap_match_grouped_cumsums(minute_candles):
+    """Daily and weekly VWAPs restart at local midnight and on Mondays, like a grouped pandas cumsum."""
+    # Arrange
+    df = minute_candles
+    price_volume = indicators.typical_price(df) * df['volume']
+    local = df.index.tz_localize(None)
+
+    for anchor, keys in (('D', local.date), ('W', local.to_period('W-SUN'))):
+        expected = price_volume.groupby(keys).cumsum() / df['volume'].groupby(keys).cumsum()
+
+        # Act
+        result = indicators.vwap(df, anchor=anchor)
+
+        # Assert
+        np.testing.assert_allclose(result, expected, atol=1e-12)
+
+
+def test_session_event_vwap_and_bands(minute_candles):
+    """Session VWAPs are NaN outside the session, event VWAPs start at the event, and bands use the weighted std."""
+    # Arrange
+    df = minute_candles
+    event = pd.Timestamp('2025-03-31 10:30', tz='Europe/London')
+
+    # Act
+    session = indicators.vwap_bands(df, anchor='08:00', session_end='16:30', num_std=(2,))
+    anchored = indicators.vwap(df, anchor=[event])
+
+    # Assert
+    day = session.loc['2025-04-01']
+    assert day.loc[:'2025-04-01 07:59'].isna().all().all()
+    assert day.loc['2025-04-01 16:30':].isna().all().all()
+    bars = df.loc['2025-04-01 08:00':'2025-04-01 16:29']
+    price, volume = indicators.typical_price(bars), bars['volume'].to_numpy()
+    mean = (price * volume).sum() / volume.sum()
+    std = np.sqrt((volume * (price - mean) ** 2).sum() / volume.sum())
+    assert day.loc['2025-04-01 16:29', 'VWAP'] == pytest.approx(mean, abs=1e-12)
+    assert day.loc['2025-04-01 16:29', 'VWAP_upper_2'] == pytest.approx(mean + 2 * std, abs=1e-12)
+
+    since = df.loc[event:]
+    assert np.isnan(anchored[:df.index.get_loc(event)]).all()
+    assert anchored[-1] == pytest.approx(
+        (indicators.typical_price(since) * since['volume']).sum() / since['volume'].sum(), abs=1e-12)
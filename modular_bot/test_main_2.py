@@ -0,0 +1,161 @@
+import numpy as np
+import pandas as pd
+import pytest
+import main_2
+
+PARAMS = {'os_level': 20, 'ob_level': 80, 'sl_multiplier': 1.0, 'tp_multiplier': 5.0, 'breakeven_trigger_R': 1.0,
+          'adx_threshold': 20}
+
+
+@pytest.fixture
+def master_data():
+    """1500 1-minute bars of the merged data main_2 backtests, with slow and fast stoch RSI cycles."""
+    rng = np.random.default_rng(0)
+    n = 1500
+    close = 100 + np.cumsum(rng.normal(0, 0.2, n))
+    bars = np.arange(n)
+    return pd.DataFrame({
+        'open': close, 'high': close + rng.uniform(0, 0.3, n), 'low': close - rng.uniform(0, 0.3, n),
+        'close': close, 'volume': rng.uniform(1, 10, n),
+        'trend_srsi_k': np.clip(50 + 55 * np.sin(bars / 150) + rng.normal(0, 5, n), 0, 100),
+        'short_srsi_k': np.clip(50 + 55 * np.sin(bars / 17) + rng.normal(0, 8, n), 0, 100),
+        'adx': rng.uniform(10, 40, n), 'atr': rng.uniform(0.1, 0.4, n),
+    }, index=pd.date_range('2025-01-01', periods=n, freq='1min', tz='UTC'))
+
+
+def test_resuming_from_a_checkpoint_gives_the_full_run(master_data, tmp_path):
+    """A run cut partway, checkpointed and resumed over the full data returns the trades of one full run."""
+    # Arrange
+    checkpoint = str(tmp_path / 'data_1m.checkpoint.pkl')
+    data_file = str(tmp_path / 'data_1m.csv')
+    full_run = main_2.run_backtest_loop(master_data, PARAMS)
+
+    for cut in (1, 400, 777, 1499):
+        state = main_2.new_loop_state()
+        main_2.run_backtest_loop(master_data.iloc[:cut], PARAMS, state)
+        main_2.save_checkpoint(checkpoint, state, PARAMS, 'J225', data_file)
+
+        # Act
+        resumed_state = main_2.load_checkpoint(checkpoint, PARAMS, master_data, 'J225', data_file)
+        resumed_run = main_2.run_backtest_loop(master_data, PARAMS, resumed_state)
+
+        # Assert
+        assert resumed_state['last_timestamp'] == master_data.index[-1]
+        assert resumed_run == full_run
+    assert len(full_run) > 10
+
+
+def test_checkpoint_of_another_epic_or_data_file_is_not_resumed(master_data, tmp_path):
+    """Only the parameters, epic and data file the checkpoint was made with resume it."""
+    # Arrange
+    checkpoint = str(tmp_path / 'data_1m.checkpoint.pkl')
+    data_file = str(tmp_path / 'data_1m.csv')
+    state = main_2.new_loop_state()
+    main_2.run_backtest_loop(master_data.iloc[:500], PARAMS, state)
+    main_2.save_checkpoint(checkpoint, state, PARAMS, 'J225', data_file)
+
+    # Act
+    same = main_2.load_checkpoint(checkpoint, PARAMS, master_data, 'J225', data_file)
+    other_epic = main_2.load_checkpoint(checkpoint, PARAMS, master_data, 'US500', data_file)
+    other_file = main_2.load_checkpoint(checkpoint, PARAMS, master_data, 'J225', str(tmp_path / 'other.csv'))
+    other_params = main_2.load_checkpoint(checkpoint, {**PARAMS, 'tp_multiplier': 3.0}, master_data, 'J225',
+                                          data_file)
+
+    # Assert
+    assert same['last_timestamp'] == master_data.index[499]
+    assert other_epic['last_timestamp'] is None and other_file['last_timestamp'] is None
+    assert other_params['last_timestamp'] is None
+
+
+def test_exit_sweep_matches_separate_runs(master_data):
+    """Every exit parameter combination of the sweep gives the trades of its own full backtest loop."""
+    # Arrange
+    exit_grid = {'sl_multiplier': [0.5, 2.0], 'tp_multiplier': [1.5, 20.0], 'breakeven_trigger_R': [0.5, 3.0]}
+
+    # Act
+    results, all_trades = main_2.run_exit_sweep(master_data, PARAMS, exit_grid)
+
+    # Assert
+    assert len(results) == 8
+    for combination, trades in zip(results.itertuples(), all_trades):
+        params = {**PARAMS, 'sl_multiplier': combination.sl_multiplier, 'tp_multiplier': combination.tp_multiplier,
+                  'breakeven_trigger_R': combination.breakeven_trigger_R}
+        expected = main_2.run_backtest_loop(master_data, params)
+        assert trades == expected
+        assert combination.trades == len(expected)
+
+
+def _bar_by_bar_regimes(df, params):
+    """The bias and confirmed anchors on every bar, tracked one bar at a time from a fresh state."""
+    os_level, ob_level = params['os_level'], params['ob_level']
+    trade_bias, lowest, highest = 0, float('inf'), float('-inf')
+    temp_low = temp_high = anchor_low = anchor_high = None
+    biases, anchor_lows, anchor_highs = [], [], []
+    prev = None
+    for row in df.itertuples():
+        if prev is not None:
+            if prev.trend_srsi_k < os_level <= row.trend_srsi_k and row.adx > params['adx_threshold']:
+                trade_bias = 1
+            elif prev.trend_srsi_k < ob_level <= row.trend_srsi_k and trade_bias == 1:
+                trade_bias = 0
+            if prev.trend_srsi_k > ob_level >= row.trend_srsi_k and row.adx > params['adx_threshold']:
+                trade_bias = -1
+            elif prev.trend_srsi_k > os_level >= row.trend_srsi_k and trade_bias == -1:
+                trade_bias = 0
+
+        is_long_setup = trade_bias == 1 and row.short_srsi_k < os_level
+        is_short_setup = trade_bias == -1 and row.short_srsi_k > ob_level
+        if is_long_setup and prev is not None and prev.short_srsi_k >= os_level:
+            lowest, temp_low = row.low, row.Index
+        if is_short_setup and prev is not None and prev.short_srsi_k <= ob_level:
+            highest, temp_high = row.high, row.Index
+        if is_long_setup and row.low < lowest:
+            lowest, temp_low = row.low, row.Index
+        if is_short_setup and row.high > highest:
+            highest, temp_high = row.high, row.Index
+
+        if prev is not None and prev.short_srsi_k < os_level <= row.short_srsi_k and trade_bias == 1 and temp_low:
+            anchor_low, lowest = temp_low, float('inf')
+        if prev is not None and prev.short_srsi_k > ob_level >= row.short_srsi_k and trade_bias == -1 and temp_high:
+            anchor_high, highest = temp_high, float('-inf')
+
+        biases.append(trade_bias)
+        anchor_lows.append(anchor_low)
+        anchor_highs.append(anchor_high)
+        prev = row
+    return biases, pd.DatetimeIndex(anchor_lows), pd.DatetimeIndex(anchor_highs)
+
+
+@pytest.mark.parametrize('seed', [0, 1, 2])
+def test_regime_columns_match_bar_by_bar_tracking(master_data, seed):
+    """The bias and confirmed anchors the loop reads are those of tracking the strategy one bar at a time."""
+    # Arrange
+    rng = np.random.default_rng(seed)
+    df = master_data.copy()
+    df['short_srsi_k'] = np.clip(df['short_srsi_k'] + rng.normal(0, 10, len(df)), 0, 100)
+    df['low'] = df['low'] - rng.uniform(0, 0.3, len(df))
+    expected_bias, expected_lows, expected_highs = _bar_by_bar_regimes(df, PARAMS)
+
+    # Act
+    regimes = main_2.regime_columns(df, PARAMS)
+
+    # Assert
+    assert regimes['trade_bias'].tolist() == expected_bias
+    assert pd.DatetimeIndex(regimes['anchor_low_timestamp']).equals(expected_lows)
+    assert pd.DatetimeIndex(regimes['anchor_high_timestamp']).equals(expected_highs)
+    assert expected_lows.notna().any() and expected_highs.notna().any()
+
+
+def test_trades_keep_the_stop_they_were_entered_with(master_data):
+    """The last field of a trade is its initial stop, one stop distance from the entry, even after breakeven."""
+    # Act
+    trades = main_2.run_backtest_loop(master_data, PARAMS)
+
+    # Assert
+    breakeven_exits = 0
+    for direction, entry_time, _, entry_price, _, stop_loss, *_, initial_stop_loss in trades:
+        stop_distance = master_data.at[entry_time, 'atr'] * PARAMS['sl_multiplier']
+        sign = 1 if direction == 'Long' else -1
+        assert initial_stop_loss == pytest.approx(entry_price - sign * stop_distance)
+        breakeven_exits += stop_loss == entry_price
+    assert breakeven_exits > 0
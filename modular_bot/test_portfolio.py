@@ -0,0 +1,72 @@
+import functools
+
+import numpy as np
+import pandas as pd
+from modular_bot.backtester import run_backtest, complete_rows
+from modular_bot.portfolio import run_portfolio_backtest
+from modular_bot.strategies import MaCrossStrategy
+
+make_strategy = functools.partial(MaCrossStrategy, fast_ma=5, slow_ma=20, trend_period=50)
+
+
+def _random_walk(seed, periods=2000):
+    rng = np.random.default_rng(seed)
+    close = 100 + np.cumsum(rng.normal(0, 0.5, periods))
+    return pd.DataFrame({'open': close, 'high': close + rng.uniform(0, 1, periods),
+                         'low': close - rng.uniform(0, 1, periods), 'close': close},
+                        index=pd.date_range('2025-01-01', periods=periods, freq='1min'))
+
+
+def test_single_epic_portfolio_matches_run_backtest():
+    """With one epic and no limits the portfolio trades exactly like run_backtest."""
+    # Arrange
+    df = _random_walk(1)
+    strategy = make_strategy(df.copy())
+    signals = strategy.generate_signals()
+    rows = complete_rows(strategy.df)
+    expected = run_backtest(strategy.df.iloc[rows], 'A', 10000.0, signals=signals.iloc[rows])
+
+    # Act
+    trades = run_portfolio_backtest({'A': df}, make_strategy, 10000.0, processes=1)
+
+    # Assert
+    assert len(expected) > 10
+    assert trades == expected
+
+
+def test_limits_and_shared_balance_across_epics():
+    """Epics share one balance, and a one-position limit lets only one epic trade at a time."""
+    # Arrange
+    datasets = {'A': _random_walk(1), 'B': _random_walk(1), 'C': _random_walk(2)}
+
+    # Act
+    unlimited = run_portfolio_backtest(datasets, make_strategy, 10000.0, processes=2)
+    limited = run_portfolio_backtest(datasets, make_strategy, 10000.0, max_open_positions=1, processes=1)
+    capped = run_portfolio_backtest(datasets, make_strategy, 10000.0, max_epic_exposure_percent=50, processes=1)
+
+    # Assert
+    # A and B have identical candles, so without limits B trades alongside A; with one position it never can
+    assert [t['entry_time'] for t in unlimited if t['epic'] == 'A'] == \
+           [t['entry_time'] for t in unlimited if t['epic'] == 'B']
+    assert not any(t['epic'] == 'B' for t in limited)
+    assert all(t['exit_time'] <= u['entry_time'] for t, u in zip(limited, limited[1:]))
+    assert [t['exit_time'] for t in unlimited] == sorted(t['exit_time'] for t in unlimited)
+    for trade in capped:
+        # Sized against the balance after every trade that closed before it opened; candles at the same
+        # time are processed in epic order
+        balance = 10000.0 + sum(t['pnl'] for t in capped if (t['exit_time'], t['epic']) <= (trade['entry_time'],
+                                                                                           trade['epic']))
+        assert trade['units'] * trade['entry_price'] <= balance * 0.5 + 1e-6
+
+
+def test_in_process_run_leaves_the_callers_data_unchanged():
+    """Generating signals in this process adds no columns to the caller's DataFrames, like the worker pool."""
+    # Arrange
+    df = _random_walk(3)
+    columns = list(df.columns)
+
+    # Act
+    run_portfolio_backtest({'A': df}, make_strategy, 10000.0, processes=1)
+
+    # Assert
+    assert list(df.columns) == columns
@@ -0,0 +1,67 @@
+import pandas as pd
+import pytest
+from modular_bot.results_db import ResultsDatabase
+
+
+def _trades(pnls):
+    """Builds a minimal trade log with the given P&L values."""
+    times = pd.date_range('2025-01-01 10:00', periods=len(pnls), freq='15min')
+    return pd.DataFrame({
+        'direction': ['LONG'] * len(pnls),
+        'entry_time': times,
+        'exit_time': times + pd.Timedelta(minutes=5),
+        'entry_price': 100.0,
+        'exit_price': [100.0 + p for p in pnls],
+        'units': 1.0,
+        'pnl': pnls
+    })
+
+
+@pytest.fixture
+def results_db(tmp_path):
+    with ResultsDatabase(str(tmp_path / 'results.db'), batch_size=10) as db:
+        yield db
+
+
+def test_top_runs_ranks_by_profit_factor_for_an_epic(results_db):
+    # Arrange
+    results_db.add_run('MaCrossStrategy', 'SPY', _trades([10, -10]), params={'strategy': {'fast_ma': 10}})
+    best = results_db.add_run('MaCrossStrategy', 'SPY', _trades([30, -10]), params={'strategy': {'fast_ma': 20}})
+    results_db.add_run('MaCrossStrategy', 'J225', _trades([50, -1]), params={'strategy': {'fast_ma': 30}})
+
+    # Act
+    top = results_db.top_runs('profit_factor', epic='SPY', limit=20)
+
+    # Assert
+    assert list(top['epic']) == ['SPY', 'SPY']
+    assert top.iloc[0]['run_id'] == best
+    assert top.iloc[0]['profit_factor'] == pytest.approx(3.0)
+    assert top.iloc[0]['strategy.fast_ma'] == '20'
+
+
+def test_runs_are_batched_and_trades_round_trip(results_db, tmp_path):
+    run_id = results_db.add_run('OrbStrategy', 'SPY', _trades([5, -2, 7]))
+
+    # Nothing is written until the batch is flushed
+    with ResultsDatabase(str(tmp_path / 'results.db')) as reader:
+        assert reader.top_runs().empty
+        results_db.flush()
+        trades = reader.get_trades(run_id)
+
+    assert list(trades['pnl']) == [5, -2, 7]
+    assert trades['entry_time'].iloc[0] == '2025-01-01T10:00:00'
+
+
+def test_runs_in_price_points_leave_the_balance_metrics_empty(results_db):
+    """A run recorded without an initial balance keeps its P&L metrics but no balance or drawdown."""
+    # Act
+    results_db.add_run('AvwapStochRsi', 'J225', _trades([5, -2, 7]), initial_balance=None)
+    results_db.add_run('AvwapStochRsi', 'J225', _trades([5, -2, 7]), initial_balance=1000.0)
+    results_db.flush()
+    top = results_db.top_runs('net_pnl', epic='J225')
+
+    # Assert
+    assert list(top['net_pnl']) == [10, 10]
+    assert top['final_balance'].isna().sum() == 1 and top['max_drawdown'].isna().sum() == 1
+    assert set(top['final_balance'].dropna()) == {1010.0}
+    assert set(top['max_drawdown'].dropna()) == {2.0}
@@ -0,0 +1,47 @@
+import numpy as np
+from modular_bot.segments import (run_lengths, segment_ids, crossed_above, crossed_below, last_true,
+                                  forward_fill, segment_argmin, segment_argmax, latch)
+
+
+def test_runs_crossings_and_forward_fill():
+    """Runs, run ids, crossings (NaNs never cross) and forward fills on small hand-checked arrays."""
+    # Arrange
+    mask = np.array([False, True, True, False, True])
+    values = np.array([np.nan, 10.0, 25.0, 20.0, 15.0, 30.0])
+
+    # Act
+    starts, lengths, states = run_lengths(mask)
+
+    # Assert
+    assert starts.tolist() == [0, 1, 3, 4] and lengths.tolist() == [1, 2, 1, 1]
+    assert states.tolist() == [False, True, False, True]
+    assert segment_ids(mask).tolist() == [-1, 0, 0, -1, 1]
+    assert crossed_above(values, 20).tolist() == [False, False, True, False, False, True]
+    assert crossed_below(values, 20).tolist() == [False, False, False, True, False, False]
+    assert last_true(mask).tolist() == [-1, 1, 2, 2, 4]
+    np.testing.assert_array_equal(forward_fill([np.nan, 1.0, np.nan, 3.0], initial=0.0), [0.0, 1.0, 1.0, 3.0])
+
+
+def test_segment_extremes_take_the_first_occurrence():
+    """Ties go to the earliest bar; segments may be split by other bars; an all-NaN segment gives -1."""
+    # Arrange
+    values = np.array([5.0, 2.0, 9.0, 2.0, 7.0, 9.0, np.nan])
+    segments = np.array([0, 0, -1, 0, 1, 1, 2])
+
+    # Act / Assert
+    assert segment_argmin(values, segments).tolist() == [1, 4, -1]
+    assert segment_argmax(values, segments).tolist() == [0, 5, -1]
+
+
+def test_latch_resets_only_the_state_it_belongs_to():
+    """A reset returns its own state to neutral and does nothing in another state; a set wins on its bar."""
+    # Arrange
+    sets = np.array([np.nan, 1, np.nan, np.nan, -1, np.nan, np.nan, 1])
+    reset_long = np.array([True, False, False, True, False, True, False, True])
+    reset_short = np.array([False, False, True, False, False, False, True, False])
+
+    # Act
+    state = latch(sets, {1: reset_long, -1: reset_short}, initial=-1)
+
+    # Assert
+    assert state.tolist() == [-1, 1, 1, 0, -1, -1, 0, 1]
@@ -0,0 +1,61 @@
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+import pytest
+from modular_bot.shared_data import SharedDataset, get_shared_dataset
+
+
+def _column_sum(args):
+    """Worker task: attaches to the shared dataset by name and sums one column."""
+    name, column = args
+    dataset = get_shared_dataset(name)
+    return float(dataset[column].sum()), dataset[column].flags.writeable
+
+
+@pytest.fixture
+def prepared_data():
+    index = pd.date_range('2025-01-01', periods=1000, freq='1min', tz='UTC')
+    return pd.DataFrame({
+        'close': np.arange(1000, dtype=float),
+        'volume': np.ones(1000, dtype=np.int64),
+        'EMA_20': np.linspace(0, 1, 1000)
+    }, index=index)
+
+
+def test_round_trip_preserves_index_and_columns(prepared_data):
+    with SharedDataset.publish(prepared_data) as published:
+        attached = SharedDataset.attach(published.name)
+        frame = attached.to_frame()
+        pd.testing.assert_frame_equal(frame, prepared_data, check_freq=False)
+        assert not attached['close'].flags.writeable
+        del frame
+        attached.close()
+
+
+def test_workers_read_the_published_copy(prepared_data):
+    with SharedDataset.publish(prepared_data) as published:
+        with ProcessPoolExecutor(max_workers=2) as pool:
+            results = list(pool.map(_column_sum, [(published.name, 'close'), (published.name, 'volume')]))
+
+    assert results[0] == (prepared_data['close'].sum(), False)
+    assert results[1] == (1000.0, False)
+
+
+def test_closing_under_live_views_is_refused(prepared_data):
+    """Closing while a frame or column still points into the block raises instead of unmapping it."""
+    # Arrange
+    published = SharedDataset.publish(prepared_data)
+    frame = published.to_frame()
+    column = published['close'][10:]
+
+    # Act / Assert
+    with pytest.raises(BufferError):
+        published.close()
+    assert frame['close'].sum() == prepared_data['close'].sum()
+    del frame
+    with pytest.raises(BufferError):
+        published.close()
+    assert column[0] == 10.0
+    del column
+    published.close()
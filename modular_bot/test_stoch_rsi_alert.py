@@ -0,0 +1,48 @@
+import numpy as np
+import pandas as pd
+import pytest
+from modular_bot import indicators
+from modular_bot.stoch_rsi_alert import evaluate_alert, forward_returns, masked_quantiles
+
+
+@pytest.fixture
+def gold():
+    """A random walk of 2,000 hourly closes."""
+    rng = np.random.default_rng(5)
+    close = 2000 + np.cumsum(rng.normal(0, 3, 2000))
+    return pd.DataFrame({'close': close}, index=pd.date_range('2025-01-01', periods=2000, freq='1h'))
+
+
+def test_evaluation_matches_the_alert_candles_one_by_one(gold):
+    """Every threshold's counts and return statistics equal those of its alert candles taken directly."""
+    # Arrange
+    k_line, _ = indicators.stochrsi(gold['close'])
+    returns = forward_returns(gold['close'], (4,))[0]
+
+    # Act
+    results = evaluate_alert({'GOLD': gold}, lower=(20, 25), upper=(75,), horizons=(1, 4))
+
+    # Assert
+    assert len(results) == 2 * 4
+    for threshold, alerting in ((20, k_line < 20), (25, k_line < 25)):
+        row = results.query("side == 'oversold' and threshold == @threshold and horizon == 4").iloc[0]
+        after = returns[alerting & ~np.isnan(returns)]
+        assert row['alerts'] == alerting.sum()
+        assert row['episodes'] == np.sum(alerting[1:] & ~alerting[:-1]) + alerting[0]
+        assert row['mean_return'] == pytest.approx(after.mean())
+        assert row['positive_percent'] == pytest.approx((after > 0).mean() * 100)
+        assert [row['p10'], row['p50'], row['p90']] == pytest.approx(np.quantile(after, [0.1, 0.5, 0.9]))
+
+
+def test_masked_quantiles_ignore_nans_and_empty_rows():
+    """Quantiles per mask row equal np.nanquantile; a row without values gives NaN."""
+    # Arrange
+    values = np.array([3.0, np.nan, 1.0, 4.0, 1.0, 5.0])
+    masks = np.array([[True, True, True, False, False, True], [False, True, False, False, False, False]])
+
+    # Act
+    quantiles = masked_quantiles(values, masks, (0.25, 0.5))
+
+    # Assert
+    np.testing.assert_allclose(quantiles[0], np.nanquantile([3.0, np.nan, 1.0, 5.0], (0.25, 0.5)))
+    assert np.isnan(quantiles[1]).all()
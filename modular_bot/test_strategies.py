@@ -1,7 +1,9 @@
+import numpy as np
 import pandas as pd
 import pytest
-from strategies import MaCrossStrategy
-from filters import AdxFilter
+from modular_bot.backtester import complete_rows, run_backtest, run_multi_backtest
+from modular_bot.strategies import MaCrossStrategy
+from modular_bot.filters import AdxFilter
 
 
 @pytest.fixture
@@ -98,4 +100,97 @@ def test_ma_cross_signal_blocked_by_adx_filter(sample_market_data):
 
     # Assert
     # At '10:45', crossover and trend are fine, but ADX(26) is NOT > 27. Signal should be 0.
-    assert signals_df.loc['2025-01-01 10:45:00']['signal'] == 0
\ No newline at end of file
+    assert signals_df.loc['2025-01-01 10:45:00']['signal'] == 0
+
+
+def test_strategy_calculates_only_missing_indicators(sample_market_data):
+    """Indicators declared by the strategy and its filters are calculated only when missing."""
+    # Arrange
+    df = sample_market_data.drop(columns=['ADX_14'])
+    strategy = MaCrossStrategy(df, fast_ma=5, slow_ma=10, trend_period=20, filters=[AdxFilter()])
+
+    # Act
+    strategy.generate_signals()
+
+    # Assert
+    assert strategy.required_indicators() == ['EMA_5', 'EMA_10', 'EMA_20', 'ATRr_14', 'ADX_14']
+    assert 'ADX_14' in strategy.df.columns
+    assert (strategy.df['EMA_5'] == sample_market_data['EMA_5']).all()
+
+
+def test_adx_filter_with_percentile_threshold(sample_market_data):
+    """An adaptive ADX filter passes only when ADX beats its percentile over the previous bars."""
+    # Arrange
+    adx_filter = AdxFilter(threshold_percentile=50, percentile_window=3)
+
+    # Act
+    passes = adx_filter.apply(sample_market_data)
+
+    # Assert
+    # ADX is 20, 22, 24, 26, 28, 20: the median of the three bars before is 22 at 10:45 and 24 at 11:00
+    assert passes.tolist() == [False, False, False, True, True, False]
+    assert adx_filter.get_params()['threshold_percentile'] == 50
+
+
+def test_pipeline_shares_data_instead_of_copying(sample_market_data):
+    """Strategy, warm-up trimming and backtest read the caller's data; signals are a separate frame."""
+    # Arrange
+    df = sample_market_data.astype(float)
+    df.iloc[0, df.columns.get_loc('ATRr_14')] = float('nan')
+    strategy = MaCrossStrategy(df, fast_ma=5, slow_ma=10, trend_period=20, filters=[AdxFilter(adx_threshold=25)])
+
+    # Act
+    signals = strategy.generate_signals()
+    rows = complete_rows(strategy.df)
+    trades = run_backtest(strategy.df.iloc[rows], 'TEST', 10000.0, risk_reward_ratio=1.0,
+                          signals=signals.iloc[rows])
+
+    # Assert
+    assert strategy.df is df
+    assert rows == slice(1, None)
+    assert np.shares_memory(strategy.df.iloc[rows]['close'].to_numpy(), df['close'].to_numpy())
+    assert list(signals.columns) == ['signal', 'stop_loss_price']
+    joined = run_backtest(df.iloc[1:].join(signals), 'TEST', 10000.0, risk_reward_ratio=1.0)
+    assert trades == joined
+    assert trades[0]['entry_time'] == pd.Timestamp('2025-01-01 10:45') and trades[0]['exit_price'] == 104
+
+
+def test_multi_backtest_matches_separate_runs(sample_market_data):
+    """One pass over shared data gives each strategy the ledger it gets when run on its own."""
+    # Arrange
+    df = sample_market_data.astype(float)
+    risk_params = [{'risk_reward_ratio': 1.0}, {'risk_reward_ratio': 5.0, 'risk_per_trade_percent': 1.0}]
+    strategies = [MaCrossStrategy(df, fast_ma=5, slow_ma=10, trend_period=20),
+                  MaCrossStrategy(df, fast_ma=5, slow_ma=10, trend_period=20, filters=[AdxFilter(adx_threshold=27)])]
+
+    # Act
+    ledgers = run_multi_backtest(df, 'TEST', 10000.0, list(zip(strategies, risk_params)))
+
+    # Assert
+    for strategy, params, ledger in zip(strategies, risk_params, ledgers):
+        assert ledger == run_backtest(df, 'TEST', 10000.0, signals=strategy.generate_signals(), **params)
+    assert [len(ledger) for ledger in ledgers] == [1, 0]
+    with pytest.raises(ValueError):
+        run_multi_backtest(df, 'TEST', 10000.0, [(MaCrossStrategy(df.copy()), {})])
+
+
+def test_sparse_signal_events_give_the_same_backtest(sample_market_data):
+    """signal_events lists only the signal candles; backtesting them gives the dense signals' trades."""
+    # Arrange
+    df = sample_market_data.astype(float)
+    df.iloc[0, df.columns.get_loc('ATRr_14')] = float('nan')
+    strategy = MaCrossStrategy(df, fast_ma=5, slow_ma=10, trend_period=20, filters=[AdxFilter(adx_threshold=25)])
+    rows = complete_rows(strategy.df)
+
+    # Act
+    events = strategy.signal_events()
+    trades = run_backtest(strategy.df.iloc[rows], 'TEST', 10000.0, risk_reward_ratio=1.0, events=events)
+
+    # Assert
+    assert list(events.columns) == ['bar', 'signal', 'stop_loss_price']
+    assert list(events.index) == [pd.Timestamp('2025-01-01 10:45')]
+    assert events['bar'].tolist() == [3] and events['signal'].tolist() == [1]
+    signals = strategy.generate_signals()
+    assert trades == run_backtest(strategy.df.iloc[rows], 'TEST', 10000.0, risk_reward_ratio=1.0,
+                                  signals=signals.iloc[rows])
+    assert len(trades) == 1
@@ -0,0 +1,123 @@
+import numpy as np
+import pandas as pd
+import pytest
+from modular_bot import indicators
+from modular_bot.streaming import (StreamingEma, StreamingAtr, StreamingAdx, StreamingRsi, StreamingStochRsi,
+                                   StreamingVwap, StreamingAnchoredVwap, RollingQuantile)
+
+
+@pytest.fixture
+def candles():
+    """A random walk of 1,000 candles with volume."""
+    rng = np.random.default_rng(11)
+    close = 100 + np.cumsum(rng.normal(0, 0.5, 1000))
+    return pd.DataFrame({
+        'open': close + rng.normal(0, 0.2, 1000),
+        'high': close + rng.uniform(0, 1, 1000),
+        'low': close - rng.uniform(0, 1, 1000),
+        'close': close,
+        'volume': rng.integers(0, 100, 1000).astype(float),
+        'time': pd.date_range('2025-01-01', periods=1000, freq='1h'),
+    })
+
+
+def _stream(indicator, candles, attribute='value'):
+    values = []
+    for bar in candles.to_dict('records'):
+        indicator.push(bar)
+        values.append(getattr(indicator, attribute))
+    return np.array(values)
+
+
+def test_streaming_values_match_batch_kernels(candles):
+    """Every pushed value equals the batch kernel's value for the same bar."""
+    # Arrange
+    high, low, close = candles['high'], candles['low'], candles['close']
+    k_line, d_line = indicators.stochrsi(close, 14, 14, 3, 3)
+    typical_price = (candles['open'] + high + low + close) / 4
+
+    # Act
+    stoch_rsi = StreamingStochRsi(14, 14, 3, 3)
+    streamed_k = _stream(stoch_rsi, candles)
+
+    # Assert
+    np.testing.assert_allclose(_stream(StreamingEma(20), candles), indicators.ema(close, 20), atol=1e-9)
+    np.testing.assert_allclose(_stream(StreamingRsi(14), candles), indicators.rsi(close, 14), atol=1e-9)
+    np.testing.assert_allclose(streamed_k, k_line, atol=1e-9)
+    np.testing.assert_allclose(stoch_rsi.d, d_line[-1], atol=1e-9)
+    np.testing.assert_allclose(_stream(StreamingVwap(), candles),
+                               (typical_price * candles['volume']).cumsum() / candles['volume'].cumsum(), atol=1e-9)
+    for ta_compatible in (False, True):
+        np.testing.assert_allclose(_stream(StreamingAtr(14, ta_compatible), candles),
+                                   indicators.atr(high, low, close, 14, ta_compatible), atol=1e-9)
+        np.testing.assert_allclose(_stream(StreamingAdx(14, ta_compatible), candles),
+                                   indicators.adx(high, low, close, 14, ta_compatible), atol=1e-9)
+
+
+def test_adx_matches_batch_through_flat_bars(candles):
+    """Flat bars give an undefined DX; the stream smooths over it the way pandas does."""
+    # Arrange
+    candles.loc[500:520, ['high', 'low', 'close']] = candles.loc[499, ['high', 'low', 'close']].to_numpy()
+
+    # Act
+    streamed = _stream(StreamingAdx(14), candles)
+
+    # Assert
+    expected = indicators.adx(candles['high'], candles['low'], candles['close'], 14)
+    np.testing.assert_allclose(streamed, expected, atol=1e-9)
+
+
+@pytest.mark.filterwarnings('error')
+@pytest.mark.parametrize('ta_compatible', [False, True])
+def test_adx_starting_on_flat_bars_is_nan_without_warnings(candles, ta_compatible):
+    """Flat opening bars have no range and no directional movement; their DX is NaN, not a 0/0 warning."""
+    # Arrange
+    candles.loc[:30, ['high', 'low', 'close']] = 100.0
+    adx = StreamingAdx(14, ta_compatible)
+
+    # Act: NumPy scalars, as read from arrays, warn on 0/0 where Python floats raise
+    streamed = np.array([adx.push({'high': high, 'low': low, 'close': close})
+                         for high, low, close in candles[['high', 'low', 'close']].to_numpy()])
+
+    # Assert
+    expected = indicators.adx(candles['high'], candles['low'], candles['close'], 14, ta_compatible=ta_compatible)
+    assert np.isnan(streamed[:30]).all()
+    np.testing.assert_allclose(streamed, expected, atol=1e-9)
+
+
+def test_peek_leaves_state_unchanged_and_anchor_skips_earlier_bars(candles):
+    """peek() gives the forming bar's value without pushing it; anchored VWAP starts at its anchor."""
+    # Arrange
+    bars = candles.to_dict('records')
+    stoch_rsi = StreamingStochRsi()
+    stoch_rsi.warm_up(candles.iloc[:-1])
+    anchored = StreamingAnchoredVwap(anchor=candles['time'].iloc[900])
+
+    # Act
+    peeked = stoch_rsi.peek(bars[-1])
+    pushed = stoch_rsi.push(bars[-1])
+    anchored.warm_up(candles)
+
+    # Assert
+    assert peeked == pushed
+    tail = candles.iloc[900:]
+    typical_price = (tail['open'] + tail['high'] + tail['low'] + tail['close']) / 4
+    assert anchored.value == pytest.approx((typical_price * tail['volume']).sum() / tail['volume'].sum())
+
+
+@pytest.mark.parametrize('window, quantile', [(1, 0.5), (14, 0.0), (50, 0.7), (60, 1.0), (33, 0.25)])
+def test_rolling_quantile_matches_pandas(window, quantile):
+    """The two-heap rolling quantile matches pandas' linear interpolation, with ties and NaNs."""
+    # Arrange
+    rng = np.random.default_rng(window)
+    values = rng.integers(0, 25, 3000).astype(float)
+    values[rng.uniform(size=3000) < 0.01] = np.nan
+    rolling_quantile = RollingQuantile(window, quantile)
+
+    # Act
+    streamed = [rolling_quantile.push(v) for v in values]
+
+    # Assert
+    expected = indicators.rolling_quantile(values, window, quantile)
+    np.testing.assert_allclose(streamed, expected, atol=1e-12)
+    assert len(rolling_quantile.low) + len(rolling_quantile.high) <= 4 * window + 32
@@ -0,0 +1,76 @@
+from decimal import Decimal
+
+import numpy as np
+import pandas as pd
+import pytest
+from modular_bot.tick_storage import encode_ticks, decode_ticks, save_ticks, load_ticks, load_candles, save_candles
+
+
+@pytest.fixture
+def gbpusd_candles():
+    """Creates three days of 1-hour GBPUSD candles on the 0.00001 tick grid."""
+    rng = np.random.default_rng(7)
+    close = np.round(1.27 + np.cumsum(rng.integers(-30, 31, 72)) * 0.00001, 5)
+    index = pd.date_range('2025-03-03', periods=72, freq='1h', tz='UTC', name='datetime')
+    return pd.DataFrame({
+        'open': np.round(close - 0.00012, 5),
+        'high': np.round(close + 0.00025, 5),
+        'low': np.round(close - 0.00031, 5),
+        'close': close,
+        'volume': rng.integers(1, 500, 72)
+    }, index=index)
+
+
+def test_round_trip_is_exact_across_partitions(gbpusd_candles, tmp_path):
+    # Act
+    save_ticks(gbpusd_candles, str(tmp_path / 'gbpusd.npz'), epic='GBPUSD')
+    decoded = load_ticks(str(tmp_path / 'gbpusd.npz'))
+
+    # Assert: prices compare equal as floats, not just approximately
+    assert (decoded[['open', 'high', 'low', 'close']].to_numpy() ==
+            gbpusd_candles[['open', 'high', 'low', 'close']].to_numpy()).all()
+    assert decoded.index.equals(gbpusd_candles.index)
+    assert (decoded['volume'] == gbpusd_candles['volume']).all()
+
+
+def test_prices_are_stored_as_int32_deltas_per_partition(gbpusd_candles):
+    encoded = encode_ticks(gbpusd_candles, 0.00001)
+
+    assert len(encoded['partition_starts']) == 3
+    assert encoded['close'].dtype == np.int32
+    ticks = decode_ticks(encoded, as_ticks=True)
+    assert ticks['high'].iloc[0] - ticks['close'].iloc[0] == 25
+
+
+def test_off_grid_prices_are_rejected(gbpusd_candles):
+    gbpusd_candles.iloc[5, gbpusd_candles.columns.get_loc('close')] += 0.000004
+    with pytest.raises(ValueError):
+        encode_ticks(gbpusd_candles, 0.00001)
+
+
+@pytest.mark.parametrize('tick_size', [0.25, 0.5, 0.0005])
+def test_round_trip_is_exact_for_ticks_that_are_not_powers_of_ten(tick_size):
+    """Decoding rounds to the tick's own decimals, so 100.25 on a 0.25 grid does not come back as 100.2."""
+    # Arrange
+    ticks = 400 + np.arange(12)
+    index = pd.date_range('2025-03-03', periods=12, freq='1h', tz='UTC', name='datetime')
+    prices = [float(t * Decimal(str(tick_size))) for t in ticks]
+    candles = pd.DataFrame({'open': prices, 'high': prices, 'low': prices, 'close': prices}, index=index)
+
+    # Act
+    decoded = decode_ticks(encode_ticks(candles, tick_size))
+
+    # Assert
+    assert (decoded.to_numpy() == candles.to_numpy()).all()
+
+
+def test_candles_load_from_either_format(gbpusd_candles, tmp_path):
+    """save_candles/load_candles pick the tick encoding for .npz paths and CSV otherwise."""
+    for name in ('gbpusd.npz', 'gbpusd.csv'):
+        # Act
+        save_candles(gbpusd_candles, str(tmp_path / name), epic='GBPUSD')
+        loaded = load_candles(str(tmp_path / name))
+
+        # Assert
+        assert (loaded['close'].to_numpy() == gbpusd_candles['close'].to_numpy()).all()
+        assert len(loaded) == len(gbpusd_candles)
@@ -0,0 +1,31 @@
+import numpy as np
+import pytest
+from modular_bot.touch_index import TouchIndex, first_of
+
+
+def _brute_first(values, start, stop, hits):
+    found = np.flatnonzero(hits(values[start:stop]))
+    return start + int(found[0]) if len(found) else None
+
+
+@pytest.mark.parametrize('block', [1, 4, 64])
+def test_queries_match_a_linear_scan(block):
+    """First-touch and range max/min agree with scanning the values, across block edges and NaNs."""
+    # Arrange
+    rng = np.random.default_rng(block)
+    values = np.cumsum(rng.normal(size=1000))
+    values[rng.uniform(size=1000) < 0.05] = np.nan
+    index = TouchIndex(values, block)
+
+    # Act / Assert
+    for _ in range(500):
+        start, stop = sorted(rng.integers(0, 1002, 2))
+        level = values[min(start, 999)] + rng.normal() * 5 if not np.isnan(values[min(start, 999)]) else 0.0
+        assert index.first_at_or_above(start, level, stop) == _brute_first(values, start, stop, lambda v: v >= level)
+        assert index.first_at_or_below(start, level, stop) == _brute_first(values, start, stop, lambda v: v <= level)
+        window = values[start:stop]
+        if (~np.isnan(window)).any():
+            assert index.max(start, stop) == np.nanmax(window)
+            assert index.min(start, stop) == np.nanmin(window)
+    assert index.first_at_or_above(0, np.inf) is None
+    assert first_of(None, 7, 3) == 3 and first_of(None) is None
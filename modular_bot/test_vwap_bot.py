@@ -0,0 +1,79 @@
+import numpy as np
+import pandas as pd
+from modular_bot.vwap_bot import anchored_vwaps, backtest_vwap_bot, entry_signals, intrabar_entry_signals
+
+
+def _candles(closes, start='2025-01-13', volume=1.0):
+    """Flat hourly candles at the given closes, so every candle's ohlc4 is its close."""
+    index = pd.date_range(start, periods=len(closes), freq='1h', tz='UTC')
+    closes = np.asarray(closes, dtype=float)
+    return pd.DataFrame({'open': closes, 'high': closes, 'low': closes, 'close': closes, 'volume': volume},
+                        index=index)
+
+
+def test_vwap_restarts_at_the_monday_of_the_previous_week():
+    """Candles from the 13th are anchored on the 6th; from Monday the 20th on, the anchor is the 13th."""
+    # Arrange
+    df = pd.concat([_candles([1.0, 3.0]), _candles([5.0, 7.0], start='2025-01-20')])
+
+    # Act
+    vwap, previous_vwap = anchored_vwaps(df)
+
+    # Assert
+    np.testing.assert_allclose(vwap, [1.0, 2.0, 3.0, 4.0])
+    np.testing.assert_allclose(previous_vwap, [np.nan, 1.0, 2.0, 3.0])
+
+
+def test_entry_signals_follow_the_live_rules():
+    """A BUY needs two closes above the last completed VWAP and the forming close within 0.05% of its VWAP."""
+    # Arrange
+    near = _candles([1.0, 1.0, 1.0, 1.2, 1.2, 1.08])
+    far = _candles([1.0, 1.0, 1.0, 1.2, 1.2, 1.0])
+    below = _candles([1.2, 1.2, 1.2, 1.0, 1.0, 1.12])
+
+    # Act
+    signals = [entry_signals(df).tolist() for df in (near, far, below)]
+
+    # Assert
+    assert signals == [[0, 0, 0, 0, 0, 1], [0] * 6, [0, 0, 0, 0, 0, -1]]
+
+
+def test_one_position_at_a_time_closed_at_the_guaranteed_stop(monkeypatch):
+    """Signals while a trade is open are ignored; the stop candle's own signal opens the next trade."""
+    # Arrange
+    df = _candles([1.0] * 8)
+    df.iloc[3, df.columns.get_loc('low')] = 0.99
+    monkeypatch.setattr('modular_bot.vwap_bot.entry_signals',
+                        lambda df, proximity_percent: np.array([0, 1, 1, -1, 0, 0, 0, 0]))
+
+    # Act
+    trades = backtest_vwap_bot(df, stop_percent=0.35, size=100000)
+
+    # Assert
+    assert trades['direction'].tolist() == ['BUY', 'SELL']
+    assert trades['exit_time'].iloc[0] == df.index[3]
+    assert np.isclose(trades['pnl'].iloc[0], -350.0)
+    assert pd.isna(trades['exit_time'].iloc[1]) and trades['pnl'].iloc[1] == 0.0
+
+
+def test_intrabar_touch_is_taken_at_the_minute_and_fills_at_the_ask():
+    """A touch of the VWAP inside the hour, gone by its close, is a signal on the minute data only."""
+    # Arrange: flat hours, then an hour that passes 1.086 (within 0.05% of its VWAP) on its 31st minute
+    closes = np.r_[np.repeat([1.0, 1.0, 1.0, 1.2, 1.2], 60), [1.2] * 30, 1.086, [1.0] * 29]
+    index = pd.date_range('2025-01-13', periods=len(closes), freq='1min', tz='UTC')
+    minutes = pd.DataFrame({'open': closes, 'high': closes, 'low': closes, 'close': closes, 'volume': 1 / 60,
+                            'ask_close': closes + 0.0002, 'ask_high': closes + 0.0002}, index=index)
+    hours = minutes.resample('1h').agg({'open': 'first', 'high': 'max', 'low': 'min', 'close': 'last',
+                                        'volume': 'sum'})
+
+    # Act
+    signals = intrabar_entry_signals(hours, minutes)
+    trades = backtest_vwap_bot(hours, intrabar_df=minutes)
+
+    # Assert
+    assert not entry_signals(hours).any()
+    assert np.flatnonzero(signals).tolist() == [330] and signals[330] == 1
+    assert trades['entry_time'].tolist() == [index[330]]
+    assert np.isclose(trades['entry_price'].iloc[0], 1.0862)
+    assert np.isclose(trades['stop_price'].iloc[0], 1.0862 * (1 - 0.0035))
+    assert trades['exit_time'].iloc[0] == index[331]
@@ -0,0 +1,52 @@
+import numpy as np
+import pandas as pd
+import pytest
+import vwap_sweeper
+
+
+@pytest.fixture
+def two_days():
+    """
+    Four hourly candles on Monday 13 January 2025 and four on Tuesday, one unit of volume each.
+    Monday opens LONG on its first candle, which straddles the VWAP, and exits on the third. Tuesday
+    opens SHORT on its second candle, whose high is just under the VWAP, and holds to the day's end.
+    """
+    index = pd.to_datetime(['2025-01-13 00:00', '2025-01-13 01:00', '2025-01-13 02:00', '2025-01-13 03:00',
+                            '2025-01-14 00:00', '2025-01-14 01:00', '2025-01-14 02:00', '2025-01-14 03:00'])
+    return pd.DataFrame({
+        'open': [1.00, 1.03, 1.05, 1.02, 1.05, 1.02, 0.99, 0.99],
+        'high': [1.02, 1.06, 1.05, 1.03, 1.06, 1.0295, 1.005, 1.00],
+        'low': [1.00, 1.03, 1.01, 1.02, 1.05, 1.00, 0.98, 0.97],
+        'close': [1.02, 1.05, 1.02, 1.03, 1.06, 1.00, 0.99, 0.98],
+        'volume': 1.0,
+    }, index=index)
+
+
+def test_sweep_days_finds_each_days_trade(two_days):
+    """Entry, exit, peak and drawdown of a LONG that exits on a signal and a SHORT held to the day's end."""
+    # Act
+    results = vwap_sweeper.sweep_days(two_days)
+
+    # Assert
+    assert results['direction'].tolist() == ['LONG', 'SHORT']
+    assert results['entry_time'].tolist() == [two_days.index[0], two_days.index[5]]
+    assert results['exit_time'].tolist() == [two_days.index[2], two_days.index[7]]
+    np.testing.assert_allclose(results['entry_price'], [1.02, 1.00])
+    np.testing.assert_allclose(results['exit_price'], [1.02, 0.98])
+    np.testing.assert_allclose(results['peak_price'], [1.06, 0.97])
+    np.testing.assert_allclose(results['drawdown_percent'], [(1.02 - 1.01) / 1.02 * 100, 0.5])
+    np.testing.assert_allclose(results['return_percent'], [0.0, 2.0], atol=1e-12)
+
+
+def test_do_the_thing_reads_a_local_file(two_days, tmp_path):
+    """With a data file the range is read from it, not the API, and trades before start_date are dropped."""
+    # Arrange
+    data_file = str(tmp_path / 'gbpusd_hour.csv')
+    two_days.rename_axis('datetime').to_csv(data_file)
+
+    # Act
+    results = vwap_sweeper.do_the_thing(pd.Timestamp('2025-01-14').to_pydatetime(),
+                                        pd.Timestamp('2025-01-15').to_pydatetime(), data_filepath=data_file)
+
+    # Assert
+    assert results['entry_time'].tolist() == [two_days.index[5]]
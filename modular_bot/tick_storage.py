@@ -0,0 +1,154 @@
+# tick_storage.py
+import sys
+from decimal import Decimal
+
+import numpy as np
+import pandas as pd
+
+# Price increments quoted by Capital.com for the epics we trade
+TICK_SIZES = {
+    'J225': 0.1,
+    'SPY': 0.01,
+    'GOLD': 0.01,
+    'GBPUSD': 0.00001,
+}
+
+PRICE_COLUMNS = ['open', 'high', 'low', 'close']
+_INT32 = np.iinfo(np.int32)
+
+
+def _decimals(tick_size):
+    """Number of decimal places of the tick size itself, so 0.25 needs 2 and 0.00001 needs 5."""
+    return max(0, -Decimal(str(tick_size)).as_tuple().exponent)
+
+
+def to_ticks(prices, tick_size):
+    """Converts prices to integer tick counts, refusing prices that are not on the tick grid."""
+    prices = np.asarray(prices, dtype=float)
+    ticks = np.rint(prices / tick_size)
+    off_grid = ~np.isfinite(prices) | (np.abs(ticks * tick_size - prices) > tick_size * 1e-6)
+    if off_grid.any():
+        raise ValueError(f"{off_grid.sum()} prices are NaN or not multiples of the tick size {tick_size}, "
+                         f"e.g. {prices[off_grid][0]}.")
+    return ticks.astype(np.int64)
+
+
+def from_ticks(ticks, tick_size):
+    """Converts tick counts back to float prices, rounded to the tick's decimal places."""
+    return np.round(np.asarray(ticks, dtype=np.int64) * tick_size, _decimals(tick_size))
+
+
+def _partition_bounds(timestamps_ns, partition):
+    """Returns the start row and length of each time partition (e.g. one per day)."""
+    period = pd.Timedelta(partition).value
+    partition_ids = timestamps_ns // period
+    starts = np.flatnonzero(np.concatenate(([True], partition_ids[1:] != partition_ids[:-1])))
+    lengths = np.diff(np.append(starts, len(timestamps_ns)))
+    return starts, lengths
+
+
+def encode_ticks(df, tick_size, partition='1D'):
+    """
+    Encodes OHLC prices as int32 tick deltas.
+
+    Within each partition every price is stored as a tick count relative to the
+    partition's base (its first close), and each column is then delta-encoded
+    across bars, so quiet markets compress to long runs of small integers.
+    Timestamps are delta-encoded as int64 nanoseconds. Returns a dict of arrays.
+    """
+    index = pd.DatetimeIndex(df.index)
+    if not index.is_monotonic_increasing:
+        raise ValueError("Timestamps must be sorted before tick encoding. Run the data-quality scan first.")
+    timestamps = index.as_unit('ns').asi8
+    starts, lengths = _partition_bounds(timestamps, partition)
+
+    close_ticks = to_ticks(df['close'], tick_size)
+    base = close_ticks[starts]
+    row_base = np.repeat(base, lengths)
+    first_row = np.zeros(len(df), dtype=bool)
+    first_row[starts] = True
+
+    encoded = {
+        'tick_size': np.float64(tick_size),
+        'tz': np.str_(str(index.tz) if index.tz is not None else ''),
+        'partition_starts': starts,
+        'partition_base': base,
+        'timestamps': np.diff(timestamps, prepend=0),
+    }
+    for col in PRICE_COLUMNS:
+        relative = (close_ticks if col == 'close' else to_ticks(df[col], tick_size)) - row_base
+        deltas = np.where(first_row, relative, np.diff(relative, prepend=0))
+        if deltas.min(initial=0) < _INT32.min or deltas.max(initial=0) > _INT32.max:
+            raise ValueError(f"'{col}' moves too far within a partition for int32 ticks. Use a shorter partition.")
+        encoded[col] = deltas.astype(np.int32)
+    if 'volume' in df.columns:
+        encoded['volume'] = df['volume'].to_numpy()
+    return encoded
+
+
+def decode_ticks(encoded, as_ticks=False):
+    """
+    Decodes arrays from `encode_ticks` into an OHLC(V) DataFrame.
+
+    With as_ticks=True the OHLC columns are returned as int64 tick counts, which makes
+    SL/TP hit checks exact integer comparisons.
+    """
+    starts = encoded['partition_starts']
+    rows = len(encoded['timestamps'])
+    lengths = np.diff(np.append(starts, rows))
+
+    index = pd.DatetimeIndex(np.cumsum(encoded['timestamps']).astype('datetime64[ns]'), name='datetime')
+    tz = str(encoded['tz'])
+    if tz:
+        index = index.tz_localize('UTC').tz_convert(tz)
+
+    row_base = np.repeat(encoded['partition_base'], lengths)
+    tick_size = float(encoded['tick_size'])
+    data = {}
+    for col in PRICE_COLUMNS:
+        running = np.cumsum(encoded[col], dtype=np.int64)
+        # Undo the cumulative sum carried over from earlier partitions
+        carried = np.concatenate(([0], running[starts[1:] - 1]))
+        ticks = running - np.repeat(carried, lengths) + row_base
+        data[col] = ticks if as_ticks else from_ticks(ticks, tick_size)
+    if 'volume' in encoded:
+        data['volume'] = encoded['volume']
+    return pd.DataFrame(data, index=index)
+
+
+def save_ticks(df, file_path, tick_size=None, epic=None, partition='1D'):
+    """Saves candles to a compressed .npz file in the tick encoding."""
+    if tick_size is None:
+        if epic not in TICK_SIZES:
+            raise ValueError(f"No tick size known for epic '{epic}'. Pass tick_size explicitly.")
+        tick_size = TICK_SIZES[epic]
+    np.savez_compressed(file_path, **encode_ticks(df, tick_size, partition=partition))
+    print(f"Saved {len(df)} candles to {file_path} (tick size {tick_size}).")
+
+
+def load_ticks(file_path, as_ticks=False):
+    """Loads candles saved by `save_ticks`."""
+    with np.load(file_path) as archive:
+        return decode_ticks({key: archive[key] for key in archive.files}, as_ticks=as_ticks)
+
+
+def load_candles(file_path):
+    """Loads candles from a tick-encoded .npz file, or from a CSV with a 'datetime' index column."""
+    if file_path.endswith('.npz'):
+        return load_ticks(file_path)
+    return pd.read_csv(file_path, index_col='datetime', parse_dates=True)
+
+
+def save_candles(df, file_path, epic=None):
+    """Saves candles in the format of the file name: the tick encoding for .npz, else CSV."""
+    if file_path.endswith('.npz'):
+        save_ticks(df, file_path, epic=epic)
+    else:
+        df.to_csv(file_path)
+
+
+if __name__ == "__main__":
+    # Usage: python tick_storage.py <candles.csv> <EPIC>
+    csv_path, epic_name = sys.argv[1], sys.argv[2]
+    candles = pd.read_csv(csv_path, index_col='datetime', parse_dates=True)
+    save_ticks(candles, csv_path.rsplit('.', 1)[0] + '.npz', epic=epic_name)
@@ -0,0 +1,98 @@
+# touch_index.py
+"""
+Range max/min and first-touch queries over a price array, e.g. "the first bar from t on whose
+high is >= the take profit".
+
+The values are grouped in blocks of `block` bars. A sparse table over the block maxima and
+minima answers any run of whole blocks in O(1), so a first-touch query costs O(log n) table
+lookups plus a scan of at most two partial blocks, however far away the touch is.
+"""
+import numpy as np
+
+
+class TouchIndex:
+    """First-touch and range max/min queries over one array (highs, lows, trailing stop levels...)."""
+
+    def __init__(self, values, block=64):
+        self.values = np.asarray(values, dtype=float)
+        self.block = block
+        starts = np.arange(0, len(self.values), block)
+        # fmax/fmin skip NaNs, which never touch any level
+        self._max = self._sparse_table(np.fmax.reduceat(self.values, starts) if len(starts) else starts, np.fmax)
+        self._min = self._sparse_table(np.fmin.reduceat(self.values, starts) if len(starts) else starts, np.fmin)
+
+    @staticmethod
+    def _sparse_table(block_values, combine):
+        """Level j holds the combined value of the 2**j blocks starting at each block."""
+        table = [block_values]
+        width = 1
+        while 2 * width <= len(block_values):
+            previous = table[-1]
+            table.append(combine(previous[:-width], previous[width:]))
+            width *= 2
+        return table
+
+    def _first(self, start, stop, level, above):
+        stop = len(self.values) if stop is None else min(int(stop), len(self.values))
+        start = max(int(start), 0)
+        if start >= stop:
+            return None
+        touches = (lambda v: v >= level) if above else (lambda v: v <= level)
+
+        # The rest of the block `start` is in
+        head_end = min((start // self.block + 1) * self.block, stop)
+        hits = touches(self.values[start:head_end])
+        if hits.any():
+            return start + int(hits.argmax())
+        if head_end == stop:
+            return None
+
+        # Whole blocks: skip the longest runs that do not touch, halving the run length each time
+        table = self._max if above else self._min
+        first_block, end_block = head_end // self.block, -(-stop // self.block)
+        block = first_block
+        for level_index in range(len(table) - 1, -1, -1):
+            width = 1 << level_index
+            if block + width <= end_block and not touches(table[level_index][block]):
+                block += width
+        if block >= end_block:
+            return None
+        offset = block * self.block
+        hits = touches(self.values[offset:min(offset + self.block, stop)])
+        return offset + int(hits.argmax()) if hits.any() else None
+
+    def first_at_or_above(self, start, level, stop=None):
+        """The first position in [start, stop) whose value is >= `level`, or None."""
+        return self._first(start, stop, level, above=True)
+
+    def first_at_or_below(self, start, level, stop=None):
+        """The first position in [start, stop) whose value is <= `level`, or None."""
+        return self._first(start, stop, level, above=False)
+
+    def _range(self, start, stop, table, combine):
+        start, stop = max(int(start), 0), min(int(stop), len(self.values))
+        if start >= stop:
+            return np.nan
+        first_block, end_block = -(-start // self.block), stop // self.block
+        if first_block >= end_block:
+            return combine.reduce(self.values[start:stop])
+        result = combine.reduce(self.values[start:first_block * self.block], initial=np.nan)
+        result = combine(result, combine.reduce(self.values[end_block * self.block:stop], initial=np.nan))
+        # Two overlapping power-of-two runs cover the whole blocks
+        level_index = (end_block - first_block).bit_length() - 1
+        width = 1 << level_index
+        return combine(result, combine(table[level_index][first_block], table[level_index][end_block - width]))
+
+    def max(self, start, stop):
+        """The largest value in [start, stop), ignoring NaNs."""
+        return self._range(start, stop, self._max, np.fmax)
+
+    def min(self, start, stop):
+        """The smallest value in [start, stop), ignoring NaNs."""
+        return self._range(start, stop, self._min, np.fmin)
+
+
+def first_of(*positions):
+    """The earliest of several first-touch results, ignoring the Nones; None if there are none."""
+    found = [position for position in positions if position is not None]
+    return min(found) if found else None
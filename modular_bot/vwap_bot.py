@@ -0,0 +1,197 @@
+# vwap_bot.py
+"""
+Historical backtest of the live GBPUSD VWAP bot in the root main.py.
+
+Every 30 seconds, while no GBPUSD position is open, the live bot loads the hourly candles since
+the Monday of the previous week and computes their VWAP (ohlc4, cumulative from that Monday). It then
+reads the last three candles: two completed ones and the one still forming. It BUYs when the forming
+candle's close is within 0.05% of its VWAP and both completed closes are above the VWAP of the last
+completed candle (`price_close_to_vwap` and `price_above_vwap`), and SELLs likewise below. Every trade
+has a guaranteed stop 0.35% from the ask price and no take profit.
+
+On hourly data alone each candle is evaluated once, as the forming candle at its close, and trades
+fill at the bid close: touches of the VWAP inside the hour are missed. With 1-minute data
+(`intrabar_df`) the forming candle is rebuilt minute by minute and evaluated at every minute's close,
+and BUYs fill at the ask when the data has it. That is as close as candle history gets: the live
+bot's 30-second polls inside a minute, and the forming candle's volume at those moments, are not
+recorded anywhere, so a touch that lasts less than a minute can still be missed.
+
+The rules are evaluated for all candles at once; only the stop-loss searches run per trade, as
+first-touch queries.
+"""
+import numpy as np
+import pandas as pd
+
+from modular_bot.touch_index import TouchIndex
+
+
+def vwap_anchors(index):
+    """The anchor of each candle: midnight on the Monday of the previous week, as `MO(-2)` gives it."""
+    days = index.normalize()
+    return days - pd.to_timedelta(days.dayofweek + 7, unit='D')
+
+
+def _window_sums(df):
+    """
+    The ohlc4 x volume and the volume of every candle, and their sums over the earlier candles of
+    its VWAP window (0 for the first candle of a window).
+    """
+    price = (df['open'].to_numpy() + df['high'].to_numpy() + df['low'].to_numpy() + df['close'].to_numpy()) / 4
+    volume = df['volume'].to_numpy(dtype=float)
+    price_volume = price * volume
+    anchors = vwap_anchors(df.index)
+    price_volume_before = np.zeros(len(df))
+    volume_before = np.zeros(len(df))
+
+    # Candles sharing an anchor are consecutive; each group's window starts at its anchor
+    group_starts = np.flatnonzero(np.r_[True, anchors[1:] != anchors[:-1]])
+    group_ends = np.r_[group_starts[1:], len(df)]
+    window_starts = df.index.searchsorted(anchors[group_starts])
+    for window_start, first, end in zip(window_starts, group_starts, group_ends):
+        offset = first - window_start
+        price_volume_before[first:end] = np.r_[0.0, np.cumsum(price_volume[window_start:end])[:-1]][offset:]
+        volume_before[first:end] = np.r_[0.0, np.cumsum(volume[window_start:end])[:-1]][offset:]
+    return price_volume, volume, price_volume_before, volume_before
+
+
+def anchored_vwaps(df):
+    """
+    For every candle, the VWAP the live bot sees when that candle is forming, and the VWAP of the
+    candle before it under the same anchor (NaN when that candle is before the anchor).
+
+    Each anchor's VWAP is a running sum from its first candle, in the same order as `StreamingVwap`,
+    so the values equal the live bot's exactly.
+    """
+    price_volume, volume, price_volume_before, volume_before = _window_sums(df)
+    cumulative_volume = volume_before + volume
+    with np.errstate(divide='ignore', invalid='ignore'):
+        vwap = np.where(cumulative_volume != 0, (price_volume_before + price_volume) / cumulative_volume, np.nan)
+        previous_vwap = np.where(volume_before != 0, price_volume_before / volume_before, np.nan)
+    return vwap, previous_vwap
+
+
+def _completed_candle_rules(df):
+    """
+    The parts of the rules that only read completed candles, for each candle as the forming one:
+    whether the bot has its three candles, and whether both completed closes are above or below the
+    last completed candle's VWAP.
+    """
+    close = df['close'].to_numpy(dtype=float)
+    _, previous_vwap = anchored_vwaps(df)
+    close_1 = np.r_[np.nan, close[:-1]]
+    close_2 = np.r_[np.nan, np.nan, close[:-2]]
+    # The bot reads the last three candles of its window, so the one two back must be at or after the anchor
+    has_window = np.arange(len(df)) - 2 >= df.index.searchsorted(vwap_anchors(df.index))
+    with np.errstate(invalid='ignore'):
+        above = (close_2 > previous_vwap) & (close_1 > previous_vwap)
+        below = (close_2 < previous_vwap) & (close_1 < previous_vwap)
+    return has_window, above, below
+
+
+def _signals(has_window, close_to_vwap, above, below):
+    signals = np.zeros(len(has_window), dtype=np.int8)
+    signals[has_window & close_to_vwap & above] = 1
+    signals[has_window & close_to_vwap & below & ~above] = -1
+    return signals
+
+
+def entry_signals(df, proximity_percent=0.05):
+    """
+    The live bot's decision on every candle, evaluated at its close: 1 (BUY), -1 (SELL) or 0,
+    ignoring open positions. Candles without two earlier candles in their VWAP window are 0, like
+    the bot cannot decide there.
+    """
+    close = df['close'].to_numpy(dtype=float)
+    vwap, _ = anchored_vwaps(df)
+    has_window, above, below = _completed_candle_rules(df)
+    with np.errstate(invalid='ignore'):
+        close_to_vwap = np.abs(close - vwap) / close * 100.0 <= proximity_percent
+    return _signals(has_window, close_to_vwap, above, below)
+
+
+def intrabar_entry_signals(df, intrabar_df, proximity_percent=0.05):
+    """
+    The live bot's decision at the close of every 1-minute bar of `intrabar_df`, with the hourly
+    candle in `df` that the minute belongs to as the forming candle. Its open, high, low, close and
+    volume are those of the minutes so far. Minutes whose hour is not in `df` are 0.
+    """
+    hours = intrabar_df.index.floor('h')
+    candle = df.index.get_indexer(hours)
+    has_window, above, below = _completed_candle_rules(df)
+    _, _, price_volume_before, volume_before = _window_sums(df)
+
+    # The forming candle so far: a running open, high, low and volume within each hour
+    groups = intrabar_df.groupby(hours)
+    forming_open = groups['open'].transform('first').to_numpy(dtype=float)
+    forming_high = groups['high'].cummax().to_numpy(dtype=float)
+    forming_low = groups['low'].cummin().to_numpy(dtype=float)
+    close = intrabar_df['close'].to_numpy(dtype=float)
+    forming_volume = groups['volume'].cumsum().to_numpy(dtype=float)
+
+    known = candle >= 0
+    position = np.maximum(candle, 0)
+    cumulative_volume = volume_before[position] + forming_volume
+    forming_price_volume = (forming_open + forming_high + forming_low + close) / 4 * forming_volume
+    with np.errstate(divide='ignore', invalid='ignore'):
+        vwap = np.where(cumulative_volume != 0,
+                        (price_volume_before[position] + forming_price_volume) / cumulative_volume, np.nan)
+        close_to_vwap = np.abs(close - vwap) / close * 100.0 <= proximity_percent
+    return _signals(known & has_window[position], close_to_vwap, above[position], below[position])
+
+
+def backtest_vwap_bot(df, stop_percent=0.35, size=100000, proximity_percent=0.05, intrabar_df=None):
+    """
+    Replays the live bot over hourly candles (open, high, low, close and volume with a UTC DatetimeIndex).
+
+    One position at a time: it enters at a signal with a guaranteed stop `stop_percent` from the ask,
+    and is closed exactly at the stop, which is checked from the next bar on. While a position is open
+    no signal is taken; after a stop-out the stop bar's own signal counts.
+
+    Without `intrabar_df`, signals are taken at the hourly closes and fill at the (bid) close. With
+    `intrabar_df`, 1-minute bid candles of the same epic (and optionally 'ask_close' and 'ask_high'
+    columns), signals are taken at every minute's close: BUYs fill at the ask, SELLs at the bid, a long
+    stops out on the bid low and a short on the ask high. Without ask columns the bid is used.
+
+    Returns a DataFrame of the trades with the P&L for `size` units, and prints a summary. A position
+    still open at the end has no exit time and is valued at the last close.
+    """
+    if intrabar_df is None:
+        bars, signals = df, entry_signals(df, proximity_percent)
+        ask_close, ask_high = df['close'].to_numpy(dtype=float), df['high']
+    else:
+        bars, signals = intrabar_df, intrabar_entry_signals(df, intrabar_df, proximity_percent)
+        ask_close = intrabar_df.get('ask_close', intrabar_df['close']).to_numpy(dtype=float)
+        ask_high = intrabar_df.get('ask_high', intrabar_df['high'])
+    signal_bars = np.flatnonzero(signals)
+    close = bars['close'].to_numpy(dtype=float)
+    highs, lows = TouchIndex(ask_high), TouchIndex(bars['low'])
+
+    trades = []
+    next_signal = 0
+    while next_signal < len(signal_bars):
+        i = signal_bars[next_signal]
+        direction = int(signals[i])
+        entry_price = ask_close[i] if direction == 1 else close[i]
+        # The live bot sets the stop from the ask price for both directions
+        stop_distance = (stop_percent / 100) * ask_close[i]
+        stop_price = ask_close[i] - stop_distance if direction == 1 else ask_close[i] + stop_distance
+        exit_bar = (lows.first_at_or_below(i + 1, stop_price) if direction == 1
+                    else highs.first_at_or_above(i + 1, stop_price))
+        # A position that is never stopped out stays open; it is valued at the last close
+        exit_price = stop_price if exit_bar is not None else (close[-1] if direction == 1 else ask_close[-1])
+        trades.append({
+            'direction': 'BUY' if direction == 1 else 'SELL', 'entry_time': bars.index[i], 'entry_price': entry_price,
+            'stop_price': stop_price, 'exit_time': bars.index[exit_bar] if exit_bar is not None else pd.NaT,
+            'exit_price': exit_price, 'pnl': (exit_price - entry_price) * direction * size,
+        })
+        if exit_bar is None:
+            break
+        next_signal = np.searchsorted(signal_bars, exit_bar, side='left')
+
+    trades = pd.DataFrame(trades, columns=['direction', 'entry_time', 'entry_price', 'stop_price', 'exit_time',
+                                           'exit_price', 'pnl'])
+    still_open = trades['exit_time'].isna()
+    print(f"VWAP bot backtest: {len(signal_bars)} signal {'minutes' if intrabar_df is not None else 'candles'}, "
+          f"{(~still_open).sum()} stopped-out trades (P&L {trades.loc[~still_open, 'pnl'].sum():,.2f}), "
+          f"{still_open.sum()} still open (P&L at the last close {trades.loc[still_open, 'pnl'].sum():,.2f})")
+    return trades
@@ -1,8 +1,8 @@
 import json
 import socket
-from datetime import date
+import sys
+from datetime import date, datetime
 
-import pandas_ta as ta
 import pandas as pd
 from time import sleep
 from dateutil.relativedelta import relativedelta, MO
@@ -10,9 +10,17 @@ from dateutil.relativedelta import relativedelta, MO
 import requests
 
 import config_demo
+from modular_bot.streaming import StreamingStochRsi
+from modular_bot.market_data_client import get_cached_prices
+from modular_bot.api_client import fetch_all_data
+from modular_bot.backtester import prepare_data
+from modular_bot.stoch_rsi_alert import evaluate_alert
 
 xst = ""
 cst = ""
+# Stoch RSI over completed candles, kept between polls so only new candles are pushed
+stoch_rsi = StreamingStochRsi(length=14, rsi_length=14, k=3, d=3)
+last_completed_candle = None
 
 
 def internet():
@@ -80,6 +88,9 @@ def get_k_lines_and_map_to_df():
     today = date.today()
     last_monday = str(today + relativedelta(weekday=MO(-2)))
     print("getting data beginning from " + last_monday)
+    cached_prices = get_cached_prices("GOLD", "HOUR", last_monday + "T00:00:00", 500)
+    if cached_prices:
+        return pd.json_normalize(cached_prices)
     gold = config_demo.gold_url + last_monday + "T00:00:00&max=500"
 
     headers = {
@@ -97,19 +108,42 @@ def get_k_lines_and_map_to_df():
         get_k_lines_and_map_to_df()
 
 
+def to_bar(row):
+    return {'close': row['closePrice.bid']}
+
+
 def do_the_thing():
+    global last_completed_candle
     start_session()
     df_obj = get_k_lines_and_map_to_df()
-    df_obj['rsi'] = ta.rsi(close=df_obj['closePrice.bid'], length=14)
-    df_obj1 = ta.stochrsi(close=df_obj['closePrice.bid'], length=14, rsi_length=14, k=3, d=3)
-    df_final = df_obj1.tail(2)
-    if df_final['STOCHRSIk_14_14_3_3'].iloc[1] < 25 or df_final['STOCHRSIk_14_14_3_3'].iloc[1] > 75:
-        message = str(df_final['STOCHRSIk_14_14_3_3'].iloc[1])+" is the value of the stoch RSI signalling entry for gold"
+    # Every row but the last is a completed candle; the last one is still forming
+    completed = df_obj.iloc[:-1]
+    if last_completed_candle is not None:
+        completed = completed[completed['snapshotTimeUTC'] > last_completed_candle]
+    for _, row in completed.iterrows():
+        stoch_rsi.push(to_bar(row))
+    if not completed.empty:
+        last_completed_candle = completed['snapshotTimeUTC'].iloc[-1]
+    stoch_rsi_k = stoch_rsi.peek(to_bar(df_obj.iloc[-1]))
+    if stoch_rsi_k < 25 or stoch_rsi_k > 75:
+        message = str(stoch_rsi_k)+" is the value of the stoch RSI signalling entry for gold"
         send_telegram_message(message)
     end_session()
 
 
+def evaluate_history(epics=("GOLD",), start_date=datetime(2020, 1, 1), end_date=None, lower=(25,), upper=(75,)):
+    """Offline mode: runs the alert rule over the hourly history of each epic and prints how it did."""
+    end_date = end_date or datetime.now()
+    datasets = {epic: prepare_data(fetch_all_data(epic, start_date, end_date, resolution="HOUR")) for epic in epics}
+    results = evaluate_alert(datasets, lower=lower, upper=upper)
+    print(results.to_string(index=False, float_format="{:.3f}".format))
+    return results
+
+
 if __name__ == '__main__':
+    if '--evaluate' in sys.argv:
+        evaluate_history()
+        sys.exit()
     while True:
         if internet():
             do_the_thing()
@@ -1,10 +1,12 @@
 import json
 from datetime import time, datetime, timedelta
 
+import numpy as np
 import pandas as pd
 import plotly.graph_objects as go
 import requests
 import config_demo
+from modular_bot.touch_index import TouchIndex, first_of
 
 API_BASE_URL = "https://demo-api-capital.backend-capital.com"  # Demo API URL
 API_HEADERS = {
@@ -184,6 +186,8 @@ def run_orb_backtest(df, epic, session_open_time, risk_reward_ratio, initial_bal
     """
     all_trades_summary = []
     current_balance = initial_balance
+    highs = TouchIndex(df['highPrice'].apply(lambda p: p['bid']))
+    lows = TouchIndex(df['lowPrice'].apply(lambda p: p['bid']))
 
     # Group candles by day
     for date, day_candles in df.groupby(df.index.date):
@@ -205,89 +209,70 @@ def run_orb_backtest(df, epic, session_open_time, risk_reward_ratio, initial_bal
         risk = range_high - range_low
         take_profit_dist = risk * risk_reward_ratio
 
-        trade_initiated = False
+        # 2. Look for a breakout on subsequent candles: the first one whose high or low leaves the range
+        start = df.index.get_loc(opening_candle_time) + 1
+        day_end = df.index.searchsorted(day_candles.index[-1], side='right')
+        entry_bar = first_of(highs.first_at_or_above(start, np.nextafter(range_high, np.inf), day_end),
+                             lows.first_at_or_below(start, np.nextafter(range_low, -np.inf), day_end))
 
-        # 2. Look for a breakout on subsequent candles
-        for entry_index, entry_candle in day_candles[day_candles.index > opening_candle_time].iterrows():
-
-            # If a trade is already open for the day, break this loop and move to the next day
-            if trade_initiated:
-                break
-
-            direction = None
-            entry_price = 0
-            stop_loss = 0
-            take_profit = 0
+        if entry_bar is not None:
+            entry_index = df.index[entry_bar]
 
             # Check for Long Breakout
-            if entry_candle['highPrice']['bid'] > range_high:
+            if highs.values[entry_bar] > range_high:
                 direction = 'LONG'
                 entry_price = range_high
                 stop_loss = range_low
                 take_profit = range_high + take_profit_dist
 
             # Check for Short Breakout
-            elif entry_candle['lowPrice']['bid'] < range_low:
+            else:
                 direction = 'SHORT'
                 entry_price = range_low
                 stop_loss = range_high
                 take_profit = range_low - take_profit_dist
 
-            # If a breakout occurred, manage the trade
-            if direction:
-                trade_initiated = True
-                exit_time = None
-                result = 'INCONCLUSIVE'  # Default result
-                pnl = 0
-
-                # 3. Monitor the trade on candles following the entry
-                for exit_index, exit_candle in day_candles[day_candles.index > entry_index].iterrows():
-
-                    # Long trade exit conditions
-                    if direction == 'LONG':
-                        if exit_candle['lowPrice']['bid'] <= stop_loss:
-                            result = 'LOSS'
-                            exit_time = exit_index
-                            break  # Exit found, stop checking candles
-                        elif exit_candle['highPrice']['bid'] >= take_profit:
-                            result = 'WIN'
-                            exit_time = exit_index
-                            break  # Exit found, stop checking candles
-
-                    # Short trade exit conditions
-                    elif direction == 'SHORT':
-                        if exit_candle['highPrice']['bid'] >= stop_loss:
-                            result = 'LOSS'
-                            exit_time = exit_index
-                            break  # Exit found, stop checking candles
-                        elif exit_candle['lowPrice']['bid'] <= take_profit:
-                            result = 'WIN'
-                            exit_time = exit_index
-                            break  # Exit found, stop checking candles
-
-                # 4. If a result was determined (WIN/LOSS), calculate P&L and store details
-                if result in ['WIN', 'LOSS']:
-                    stop_distance = abs(entry_price - stop_loss)
-                    trade_risk_percent = (stop_distance / entry_price) * 100
-                    monetary_loss = position_size * (trade_risk_percent / 100.0)
-
-                    if result == 'WIN':
-                        pnl = monetary_loss * risk_reward_ratio
-                    else:  # LOSS
-                        pnl = -monetary_loss
-
-                    current_balance += pnl
-
-                    trade_details = {
-                        'epic': epic, 'date': date, 'entry_time': entry_index, 'direction': direction,
-                        'result': result, 'range_high': range_high, 'range_low': range_low, 'pnl': pnl,
-                        'position_size': position_size, 'exit_time': exit_time,
-                        'trade_risk_percent': trade_risk_percent,
-                        'stop_loss': stop_loss, 'take_profit': take_profit, 'entry_price': entry_price,
-                        'range_time': opening_candle_time,
-                    }
-                    all_trades_summary.append(trade_details)
-                    print_trade_summary(trade_details)
+            # Manage the trade
+            exit_time = None
+            result = 'INCONCLUSIVE'  # Default result
+            pnl = 0
+
+            # 3. Jump to the first candle after the entry that reaches the stop loss or the take profit
+            if direction == 'LONG':
+                stop_bar = lows.first_at_or_below(entry_bar + 1, stop_loss, day_end)
+                target_bar = highs.first_at_or_above(entry_bar + 1, take_profit, day_end)
+            else:
+                stop_bar = highs.first_at_or_above(entry_bar + 1, stop_loss, day_end)
+                target_bar = lows.first_at_or_below(entry_bar + 1, take_profit, day_end)
+            exit_bar = first_of(stop_bar, target_bar)
+            if exit_bar is not None:
+                # The stop loss is checked first when a candle reaches both
+                result = 'LOSS' if exit_bar == stop_bar else 'WIN'
+                exit_time = df.index[exit_bar]
+
+            # 4. If a result was determined (WIN/LOSS), calculate P&L and store details
+            if result in ['WIN', 'LOSS']:
+                stop_distance = abs(entry_price - stop_loss)
+                trade_risk_percent = (stop_distance / entry_price) * 100
+                monetary_loss = position_size * (trade_risk_percent / 100.0)
+
+                if result == 'WIN':
+                    pnl = monetary_loss * risk_reward_ratio
+                else:  # LOSS
+                    pnl = -monetary_loss
+
+                current_balance += pnl
+
+                trade_details = {
+                    'epic': epic, 'date': date, 'entry_time': entry_index, 'direction': direction,
+                    'result': result, 'range_high': range_high, 'range_low': range_low, 'pnl': pnl,
+                    'position_size': position_size, 'exit_time': exit_time,
+                    'trade_risk_percent': trade_risk_percent,
+                    'stop_loss': stop_loss, 'take_profit': take_profit, 'entry_price': entry_price,
+                    'range_time': opening_candle_time,
+                }
+                all_trades_summary.append(trade_details)
+                print_trade_summary(trade_details)
 
     return all_trades_summary
 
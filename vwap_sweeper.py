@@ -1,18 +1,15 @@
 import json
 import socket
 import datetime
-import plotly.graph_objects as go
-import pandas_ta as ta
-import pandas as pd
-from time import sleep
-from dateutil.relativedelta import relativedelta, MO
 
+import numpy as np
+import pandas as pd
 import requests
 
-import config_demo
-
-xst = ""
-cst = ""
+from modular_bot import indicators
+from modular_bot.api_client import fetch_all_data
+from modular_bot.backtester import prepare_data
+from modular_bot.tick_storage import load_ticks
 
 
 def internet():
@@ -39,150 +36,119 @@ def send_telegram_message(text):
     print(response.text)
 
 
-def start_session():
-    global xst, cst
-
-    payload1 = json.dumps({
-        "identifier": config_demo.identifier,
-        "password": config_demo.password
+def price_close_to_or_has_been_above_vwap(df, vwap, percent=0.05):
+    """Mask of the candles that are within `percent` of the VWAP or have traded through it from above."""
+    open_, high, low, close = (df[c].to_numpy(dtype=float) for c in ('open', 'high', 'low', 'close'))
+    return (((np.abs(close - vwap) / close) * 100.0 <= percent)
+            | ((np.abs(low - vwap) / low) * 100.0 <= percent)
+            | ((low < vwap) & (vwap < high))
+            | ((close < vwap) & (vwap < open_)))
+
+
+def price_close_to_or_has_been_below_vwap(df, vwap, percent=0.05):
+    """Mask of the candles that are within `percent` of the VWAP or have traded through it from below."""
+    open_, high, low, close = (df[c].to_numpy(dtype=float) for c in ('open', 'high', 'low', 'close'))
+    return (((np.abs(open_ - vwap) / open_) * 100.0 <= percent)
+            | ((open_ < vwap) & (vwap < close))
+            | ((np.abs(high - vwap) / high) * 100.0 <= percent)
+            | ((high < vwap) & (vwap < low)))
+
+
+def _next_true(positions, after, before):
+    """For each row, the first of the sorted `positions` that is > `after` and < `before`, else -1."""
+    found = np.searchsorted(positions, after, side='right')
+    candidate = np.append(positions, -1)[found]
+    return np.where((candidate >= 0) & (candidate < before), candidate, -1)
+
+
+def sweep_days(df, percent=0.05):
+    """
+    Runs the sweep over every day of `df` (hourly candles with open, high, low, close, volume and a
+    UTC DatetimeIndex) at once. The VWAP is anchored on each week's Monday.
+
+    Each day's first candle matching a predicate opens a trade at its close, LONG when it is close to
+    or has been above the VWAP, else SHORT. The trade ends on the next candle of the day that matches
+    the same predicate again, or at the day's last candle. Returns one row per day with a trade: the
+    peak price reached (highest high for a LONG, lowest low for a SHORT), the worst drawdown from
+    the entry and the move to the exit close, both in percent of the entry.
+    """
+    vwap = indicators.vwap(df, anchor='W')
+    above = price_close_to_or_has_been_above_vwap(df, vwap, percent)
+    below = price_close_to_or_has_been_below_vwap(df, vwap, percent)
+    high, low, close = (df[c].to_numpy(dtype=float) for c in ('high', 'low', 'close'))
+
+    days = indicators.period_segments(df.index, 'D')
+    day_starts = np.flatnonzero(np.r_[True, days[1:] != days[:-1]])
+    day_ends = np.r_[day_starts[1:], len(df)]
+
+    # The first signal of each day; LONG wins when both predicates match, as it is checked first
+    entry = _next_true(np.flatnonzero(above | below), day_starts - 1, day_ends)
+    traded = entry >= 0
+    entry, day_ends = entry[traded], day_ends[traded]
+    is_long = above[entry]
+    exit_long = _next_true(np.flatnonzero(above), entry, day_ends)
+    exit_short = _next_true(np.flatnonzero(below), entry, day_ends)
+    exit_bar = np.where(is_long, exit_long, exit_short)
+    exit_bar = np.where(exit_bar >= 0, exit_bar, day_ends - 1)
+
+    # Extremes over the candles after the entry up to the exit; reduceat needs a sentinel past the end
+    window_start = np.minimum(entry + 1, exit_bar)
+    bounds = np.ravel(np.column_stack((window_start, exit_bar + 1)))
+    highest = np.maximum.reduceat(np.append(high, np.nan), bounds)[::2]
+    lowest = np.minimum.reduceat(np.append(low, np.nan), bounds)[::2]
+    entry_price = close[entry]
+    after_entry = exit_bar > entry
+    peak_price = np.where(after_entry, np.where(is_long, highest, lowest), entry_price)
+    worst_price = np.where(after_entry, np.where(is_long, lowest, highest), entry_price)
+    direction = np.where(is_long, 1.0, -1.0)
+
+    results = pd.DataFrame({
+        'date': df.index[entry].date,
+        'direction': np.where(is_long, 'LONG', 'SHORT'),
+        'entry_time': df.index[entry],
+        'entry_price': entry_price,
+        'exit_time': df.index[exit_bar],
+        'exit_price': close[exit_bar],
+        'peak_price': peak_price,
+        'drawdown_percent': np.maximum((entry_price - worst_price) * direction / entry_price * 100.0, 0.0),
+        'return_percent': (close[exit_bar] - entry_price) * direction / entry_price * 100.0,
     })
-    headers1 = {
-        'X-CAP-API-KEY': config_demo.api_key,
-        'Content-Type': 'application/json'
-    }
-    response1 = requests.request("POST", config_demo.session_url, headers=headers1, data=payload1)
-
-    if response1.status_code == 200:
-        xst = response1.headers['X-SECURITY-TOKEN']
-        cst = response1.headers['CST']
-    else:
-
-        text = str(response1.status_code) + " returned from method: start_session" + "\ntrying again..."
-        print(text)
-        send_telegram_message(text)
-        start_session()
-
-
-def end_session():
-    headers = {
-        'X-SECURITY-TOKEN': xst,
-        'CST': cst
-    }
-    response1 = requests.request("DELETE", config_demo.session_url, headers=headers, data={})
-    if response1.status_code != 200:
-        text = str(response1.status_code) + " returned from method: end_session" + "\ntrying again..."
-        print(text)
-        send_telegram_message(text)
-        end_session()
-
-
-def get_k_lines_and_map_to_df(the_date):
-    last_monday = str(the_date + relativedelta(weekday=MO(-1)))
-    print("getting data beginning from " + last_monday)
-    gold = config_demo.gbpusd_url + last_monday + "T00:00:00&max=240"
-
-    headers = {
-        'X-SECURITY-TOKEN': xst,
-        'CST': cst
-    }
-    response = requests.request("GET", gold, headers=headers)
-    if response.status_code == 200:
-        data = response.json()
-        return pd.json_normalize(data["prices"])
+    print(f"Swept {len(day_starts)} days: {len(results)} trades "
+          f"({is_long.sum()} LONG, {len(results) - is_long.sum()} SHORT).")
+    return results
+
+
+def load_candles(data_filepath):
+    """
+    Hourly candles from a local CSV (with a 'datetime' index column, as main_2 writes), parquet or
+    tick-encoded .npz (see `tick_storage`) file.
+    """
+    if data_filepath.endswith('.parquet'):
+        return pd.read_parquet(data_filepath)
+    if data_filepath.endswith('.npz'):
+        return load_ticks(data_filepath)
+    return pd.read_csv(data_filepath, index_col='datetime', parse_dates=True)
+
+
+def do_the_thing(start_date=datetime.datetime(2022, 1, 1), end_date=datetime.datetime(2022, 2, 1), epic="GBPUSD",
+                 data_filepath=None):
+    """
+    Sweeps every day from start_date to end_date. The candles come from `data_filepath` when given,
+    else from the API (or the local market data cache) in one request for the whole range.
+    """
+    # Load from the Monday of the first week, so the first days get their full week's VWAP
+    monday = start_date - datetime.timedelta(days=start_date.weekday())
+    if data_filepath is not None:
+        df = load_candles(data_filepath)
+        first, end = pd.Timestamp(monday, tz=df.index.tz), pd.Timestamp(end_date, tz=df.index.tz)
+        df = df[(df.index >= first) & (df.index < end)]
     else:
-        text = str(response.status_code), " error returned from method: get_k_lines_and_map_to_df" + "\ntrying again..."
-        print(text)
-        send_telegram_message(text)
-        get_k_lines_and_map_to_df(the_date)
-
-
-def print_chart(calculate):
-    fig = go.Figure(data=[
-        go.Candlestick(x=calculate['snapshotTime'],
-                       open=calculate['openPrice.bid'],
-                       high=calculate['highPrice.bid'],
-                       low=calculate['lowPrice.bid'],
-                       close=calculate['closePrice.bid']),
-        go.Scatter(x=calculate['snapshotTime'], y=calculate['vwap'], line=dict(color='orange', width=1))])
-    fig.show()
-
-
-def is_price_close_to_or_has_been_above_vwap(row):
-    return ((abs(row['closePrice.bid'] - row['vwap']) / row['closePrice.bid']) * 100.0 <= 0.05
-            or (abs(row['lowPrice.bid'] - row['vwap']) / row['lowPrice.bid']) * 100.0 <= 0.05
-        or row['lowPrice.bid'] < row['vwap'] < row['highPrice.bid']
-        or row['closePrice.bid'] < row['vwap'] < row['openPrice.bid'])
-
-
-def is_price_close_to_or_has_been_below_vwap(row):
-    return ((abs(row['openPrice.bid'] - row['vwap']) / row['openPrice.bid']) * 100.0 <= 0.05
-     or row['openPrice.bid'] < row['vwap'] < row['closePrice.bid']
-     or (abs(row['highPrice.bid'] - row['vwap']) / row['highPrice.bid']) * 100.0 <= 0.05
-     or row['highPrice.bid'] < row['vwap'] < row['lowPrice.bid'])
-
-
-def collect_results(peak_price, peak_drawdown):
-    pass
-
-
-def do_the_thing():
-    sometime = datetime.datetime.strptime('01012022', "%d%m%Y").date()
-    for x in range(1):
-        start_session()
-
-        df_obj = get_k_lines_and_map_to_df(sometime)
-        if df_obj.empty:
-            df_obj = get_k_lines_and_map_to_df(sometime)
-        tp = (df_obj['openPrice.bid'] + df_obj['highPrice.bid'] + df_obj['lowPrice.bid'] + df_obj[
-            'closePrice.bid']) / 4
-        tp = tp * df_obj['lastTradedVolume']
-        df_obj['vwap'] = tp.cumsum() / df_obj['lastTradedVolume'].cumsum()
-        df_to_calculate = df_obj.tail(120)
-        print(df_obj)
-        sometime += datetime.timedelta(days=1)
-        # print(df_to_calculate.iloc[0])
-        # if price_close_to_vwap(df_to_calculate) and price_above_vwap(df_to_calculate):
-        #     make_trade("BUY")
-        # elif price_close_to_vwap(df_to_calculate) and price_below_vwap(df_to_calculate):
-        #     make_trade("SELL")
-        x = 1
-        print_chart(df_to_calculate)
-        in_long_trade = False
-        in_short_trade = False
-        peak_price = 0
-        peak_drawdown = 0
-        for index, row in df_to_calculate.iterrows():
-
-            if in_long_trade is True:
-                if row['closePrice.bid'] > peak_price:
-                    peak_price = row['closePrice.bid']
-                if row['highPrice.bid'] > peak_price:
-                    peak_price = row['highPrice.bid']
-                if is_price_close_to_or_has_been_above_vwap(row):
-                    collect_results(peak_price, peak_drawdown)
-                    in_long_trade = False
-                if row['closePrice.bid'] > peak_price:
-                    peak_price = row['closePrice.bid']
-                if row['highPrice.bid'] > peak_price:
-                    peak_price = row['highPrice.bid']
-
-            if in_short_trade is True:
-                continue
-
-            if is_price_close_to_or_has_been_above_vwap(row):
-                print("a LONG trade should have been made ", row['snapshotTime'])
-                in_long_trade = True
-
-            if is_price_close_to_or_has_been_below_vwap(row):
-                print("a SHORT trade should have been made ", row['snapshotTime'])
-                in_short_trade = True
-
-        end_session()
+        df = prepare_data(fetch_all_data(epic, monday, end_date, resolution="HOUR"))
+    results = sweep_days(df)
+    results = results[results['entry_time'] >= pd.Timestamp(start_date, tz=df.index.tz)]
+    print(results.to_string(index=False))
+    return results
 
 
 if __name__ == '__main__':
-    # while True:
-    #     if internet():
-    #         do_the_thing()
-    #     sleep(30)
     do_the_thing()